@@ -0,0 +1,126 @@
+# api/backtest.py
+import numpy as np
+from django.db.models import Count
+
+from .models import Transaction
+from .fx import BASE_AMOUNT
+from .fraud_detection import (
+    load_ml_model, calculate_ml_scores,
+    IP_VELOCITY_THRESHOLD, SUBNET_VELOCITY_THRESHOLD,
+)
+
+# Default search grid: 21 rule weights x 21 thresholds = 441 combinations
+DEFAULT_RULE_WEIGHTS = np.round(np.linspace(0, 1, 21), 2)
+DEFAULT_THRESHOLDS = np.arange(0, 101, 5, dtype=float)
+
+
+def _velocity_counts(user_qs, column):
+    """One GROUP BY for global transaction counts per IP (or subnet) seen in this user's rows"""
+    rows = Transaction.objects.filter(
+        **{f"{column}__in": user_qs.filter(**{f"{column}__isnull": False}).values(column)}
+    ).values(column).annotate(count=Count('pk'))
+    return {row[column]: row['count'] for row in rows}
+
+
+def load_backtest_data(user):
+    """
+    Load a user's history into columnar arrays (one pass, no per-row queries)
+    Labels: is_fraud or a 'rejected' review decision counts as fraud
+    """
+    user_qs = Transaction.objects.filter(user=user)
+    columns = ['country', 'device_id', 'ip_int', 'ip_subnet', 'is_fraud', 'status']
+    # Base-currency amount first, as in calculate_rule_score
+    rows = list(user_qs.order_by('id').values_list(BASE_AMOUNT, *columns).iterator(chunk_size=5000))
+
+    ip_counts = _velocity_counts(user_qs, 'ip_int')
+    subnet_counts = _velocity_counts(user_qs, 'ip_subnet')
+
+    n = len(rows)
+    data = {
+        "amount": np.fromiter((float(r[0] or 0) for r in rows), dtype=float, count=n),
+        "foreign": np.fromiter((bool(r[1]) and r[1] != "US" for r in rows), dtype=bool, count=n),
+        "new_device": np.fromiter(("new" in str(r[2]).lower() for r in rows), dtype=bool, count=n),
+        "has_ip": np.fromiter((r[3] is not None for r in rows), dtype=bool, count=n),
+        "ip_count": np.fromiter((ip_counts.get(r[3], 0) if r[3] is not None else 0 for r in rows),
+                                dtype=float, count=n),
+        "subnet_count": np.fromiter((subnet_counts.get(r[4], 0) if r[4] is not None else 0 for r in rows),
+                                    dtype=float, count=n),
+        "label": np.fromiter((bool(r[5]) or r[6] == 'rejected' for r in rows), dtype=bool, count=n),
+    }
+    data["rule_score"] = rule_scores(data)
+    data["ml_score"] = ml_scores(data)
+    return data
+
+
+def rule_scores(data):
+    """Vectorized equivalent of calculate_rule_score (keep the two in sync)"""
+    high_ip = data["has_ip"] & (data["ip_count"] > IP_VELOCITY_THRESHOLD)
+    high_subnet = data["has_ip"] & ~high_ip & (data["subnet_count"] > SUBNET_VELOCITY_THRESHOLD)
+    new_ip = data["has_ip"] & (data["ip_count"] <= 1)
+
+    return (
+        30 * (data["amount"] > 5000)
+        + 25 * data["foreign"]
+        + 20 * high_ip
+        + 10 * high_subnet
+        + 15 * data["new_device"]
+        + 10 * new_ip
+    ).astype(float)
+
+
+def ml_scores(data, model=None):
+    """ML scores from the same features as prepare_ml_features, or zeros without a model"""
+    model = model or load_ml_model()
+    n = len(data["amount"])
+    if model is None or n == 0:
+        return np.zeros(n)
+    features = np.column_stack([
+        data["amount"],
+        data["amount"] > 5000,
+        data["foreign"],
+        data["new_device"],
+        np.where(data["has_ip"], data["ip_count"], 1),
+    ]).astype(float)
+    return calculate_ml_scores(model, features)
+
+
+def run_backtest(data, rule_weights=None, thresholds=None):
+    """
+    Evaluate every (rule weight, threshold) combination in memory
+    ML weight is 1 - rule weight. Each weight costs one sort; all thresholds
+    for that weight are answered with a single searchsorted.
+    """
+    rule_weights = DEFAULT_RULE_WEIGHTS if rule_weights is None else np.asarray(rule_weights, dtype=float)
+    thresholds = DEFAULT_THRESHOLDS if thresholds is None else np.asarray(thresholds, dtype=float)
+
+    labels = data["label"]
+    n = len(labels)
+    total_positive = int(labels.sum())
+    results = []
+
+    for weight in rule_weights:
+        final = np.minimum(100, data["rule_score"] * weight + data["ml_score"] * (1 - weight))
+        order = np.argsort(final, kind='stable')
+        sorted_scores = final[order]
+        # positives_below[i] = fraud labels among the i lowest scores
+        positives_below = np.concatenate(([0], np.cumsum(labels[order])))
+
+        cut = np.searchsorted(sorted_scores, thresholds, side='left')
+        flagged = n - cut
+        true_positive = total_positive - positives_below[cut]
+
+        precision = np.divide(true_positive, flagged, out=np.zeros(len(thresholds)), where=flagged > 0)
+        recall = true_positive / total_positive if total_positive else np.zeros(len(thresholds))
+
+        for i, threshold in enumerate(thresholds):
+            results.append({
+                "rule_weight": round(float(weight), 4),
+                "ml_weight": round(float(1 - weight), 4),
+                "threshold": float(threshold),
+                "flagged": int(flagged[i]),
+                "true_positives": int(true_positive[i]),
+                "precision": round(float(precision[i]), 4),
+                "recall": round(float(recall[i]), 4),
+            })
+
+    return results
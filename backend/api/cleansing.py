@@ -1,34 +1,517 @@
 # api/cleansing.py
+import os
+import tempfile
+from collections import defaultdict
+from datetime import timedelta
+import numpy as np
 import pandas as pd
+from django.conf import settings
+from django.db.models import Case, Count, F, Q, Max, Min, Value, When, Window
+from django.db.models.functions import Coalesce, Greatest, Round, RowNumber, Substr, Trim, Upper
+from django.db.models.lookups import Exact
+from django.utils import timezone
 
+from .models import Transaction, AuditLog, CleansingState
+from .merchants import canonicalize_merchant
+from .stats_cache import bump_stats_version
+from .report_jobs import mark_summaries_stale
 
-def cleanse_data(df: pd.DataFrame) -> pd.DataFrame:
+# Upload header aliases and fallback columns (first non-empty value wins)
+COLUMN_ALIASES = {'txn_id': 'transaction_id', 'txn_date': 'date'}
+MERCHANT_COLUMNS = ['merchant', 'description', 'merchant_name', 'vendor', 'store']
+CARD_COLUMNS = ['card_number', 'card', 'card_num', 'card_id']
+IP_COLUMNS = ['ip_address', 'ip']
+NULL_STRINGS = {'nan', 'none', 'null', ''}
+
+# Trailing UTC offset or Z on an ISO timestamp (values without one are local time)
+_UTC_OFFSET = r'(?:Z|[+-]\d{2}:?\d{2})$'
+
+# Rows per chunk when streaming uploads through CleansingStage
+CHUNK_SIZE = 10000
+
+# Partition files used by ExternalDedupe for uploads too large to dedupe in memory
+SPILL_PARTITIONS = 64
+SPILL_ROW_COLUMN = '__row'
+
+# Rows deleted per duplicate-removal statement (bounds lock time per batch)
+DEDUPE_BATCH_SIZE = 5000
+
+# Width of each id range updated by in-database normalization
+NORMALIZE_BATCH_SIZE = 10000
+
+# Distinct merchant strings mapped per canonicalization UPDATE
+CANONICALIZE_BATCH_SIZE = 500
+
+# Near-duplicates: same card, amount and merchant within this many seconds
+NEAR_DUPLICATE_WINDOW_SECONDS = 120
+
+# Normalized value of each column, as SQL expressions
+NORMALIZED_FIELDS = {
+    'country': Substr(Upper(Trim('country')), 1, 2),
+    'currency': Substr(Upper(Trim('currency')), 1, 3),
+    'amount': Round('amount', 2),
+    'merchant': Substr(Trim('merchant'), 1, 200),
+}
+
+
+def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Lowercase/underscore header names and map known aliases (txn_id, txn_date)"""
+    df.columns = [str(col).lower().strip().replace(' ', '_') for col in df.columns]
+    return df.rename(columns=COLUMN_ALIASES)
+
+
+def coalesce_columns(df: pd.DataFrame, candidates) -> pd.Series:
+    """Per row, the first non-empty value among the candidate columns ('' if none)"""
+    result = pd.Series('', index=df.index, dtype=object)
+    for col_name in candidates:
+        if col_name not in df.columns:
+            continue
+        values = df[col_name].fillna('').astype(str).str.strip()
+        usable = ~values.str.lower().isin(NULL_STRINGS)
+        fill = (result == '') & usable
+        result[fill] = values[fill]
+    return result
+
+
+def hash_ids(ids: pd.Series) -> np.ndarray:
+    """64-bit hashes of transaction ids"""
+    return pd.util.hash_pandas_object(ids, index=False).to_numpy()
+
+
+class IdDeduper:
+    """
+    Keeps the first row for each transaction_id across successive chunks
+    State is a set of 64-bit id hashes, so memory grows with 8-byte keys
+    rather than whole rows or id strings. Rows with an empty id are never dropped.
+    """
+
+    def __init__(self):
+        self.seen_ids = set()
+        self.duplicates_removed = 0
+
+    def filter(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        ids = chunk['transaction_id'].fillna('').astype(str).str.strip()
+        keyed = (ids != '').to_numpy()
+        hashes = hash_ids(ids)
+
+        repeat_in_chunk = pd.Series(hashes).duplicated().to_numpy()
+        seen_before = np.fromiter((h in self.seen_ids for h in hashes.tolist()), dtype=bool, count=len(hashes))
+        drop = keyed & (repeat_in_chunk | seen_before)
+
+        self.seen_ids.update(hashes[keyed & ~drop].tolist())
+        self.duplicates_removed += int(drop.sum())
+        return chunk[~drop]
+
+
+def parse_timestamps(values: pd.Series) -> pd.Series:
+    """
+    Parse CSV timestamps to a UTC Series (unparseable values become NaT)
+    Values may carry different UTC offsets (exports crossing DST) or none; naive
+    values are taken to be in the default time zone.
     """
-    ATC-02: Data Cleansing
-    - Remove duplicates by transaction_id
-    - Normalize timestamps to YYYY-MM-DD HH:MM:SS
-    - Normalize currency amounts to 2 decimals
-    - Normalize country and currency codes
+    parsed = pd.to_datetime(values, errors='coerce', format='mixed', utc=True)
+    local_zone = timezone.get_default_timezone_name()
+    if local_zone != 'UTC' and len(values):
+        naive = ~values.fillna('').astype(str).str.strip().str.contains(_UTC_OFFSET, regex=True)
+        if naive.any():
+            local = pd.to_datetime(values[naive], errors='coerce', format='mixed')
+            parsed[naive] = local.dt.tz_localize(
+                local_zone, ambiguous='NaT', nonexistent='shift_forward'
+            ).dt.tz_convert('UTC')
+    return parsed
+
+
+class CleansingStage:
+    """
+    ATC-02: Chunk-at-a-time data cleansing
+    - Remove duplicates by transaction_id, across chunks (unless dedupe=False,
+      e.g. when ExternalDedupe has already removed them)
+    - Normalize timestamps, amounts (2 decimals), country and currency codes
+    """
+
+    def __init__(self, dedupe=True):
+        self.deduper = IdDeduper() if dedupe else None
+        self.rows_in = 0
+
+    @property
+    def duplicates_removed(self):
+        return self.deduper.duplicates_removed if self.deduper else 0
+
+    def process(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        chunk = normalize_columns(chunk.copy())
+        self.rows_in += len(chunk)
+
+        # Remove duplicates
+        if self.deduper and 'transaction_id' in chunk.columns:
+            chunk = self.deduper.filter(chunk)
+
+        # Normalize timestamps (unparseable values become NaT)
+        if 'date' in chunk.columns:
+            chunk['date'] = parse_timestamps(chunk['date'])
+
+        # Normalize currency amounts: strip symbols, separators and whitespace
+        if 'amount' in chunk.columns:
+            amounts = chunk['amount'].fillna('').astype(str).str.replace(r'[$,\s]', '', regex=True)
+            chunk['amount'] = pd.to_numeric(amounts, errors='coerce').round(2)
+
+        # Normalize country and currency codes
+        for col_name in ('country', 'currency'):
+            if col_name in chunk.columns:
+                chunk[col_name] = chunk[col_name].fillna('').astype(str).str.upper().str.strip()
+
+        return chunk
+
+
+class ExternalDedupe:
+    """
+    ATC-02: Spill-to-disk dedupe for uploads larger than RAM
+    Rows are hash-partitioned by transaction_id into temporary CSV files, then
+    each partition is deduped on its own. Every copy of an id lands in the same
+    partition in file order, so the rows kept are exactly those an in-memory
+    keep-first dedupe would keep; only the output order changes (by partition).
+    Memory is one chunk plus the id hashes of one partition.
     """
-    # Remove duplicates
-    df = df.drop_duplicates(subset=['transaction_id'], keep='first')
 
-    # Normalize timestamps
+    def __init__(self, num_partitions=SPILL_PARTITIONS, chunk_size=CHUNK_SIZE, temp_dir=None):
+        self.num_partitions = num_partitions
+        self.chunk_size = chunk_size
+        self._tmp = tempfile.TemporaryDirectory(prefix='securepath-dedupe-', dir=temp_dir)
+        self._written = set()
+        self.rows_in = 0
+        self.duplicates_removed = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._tmp.cleanup()
+
+    def _path(self, partition):
+        return os.path.join(self._tmp.name, f"part-{partition:04d}.csv")
+
+    def add(self, chunk: pd.DataFrame):
+        """Spill one chunk (index = row number in the file) to its partitions"""
+        chunk = normalize_columns(chunk.copy())
+        self.rows_in += len(chunk)
+        if 'transaction_id' in chunk.columns:
+            ids = chunk['transaction_id'].fillna('').astype(str).str.strip()
+            partitions = hash_ids(ids) % self.num_partitions
+        else:
+            partitions = np.zeros(len(chunk), dtype=np.uint64)
+
+        for partition, rows in chunk.groupby(partitions, sort=False):
+            path = self._path(int(partition))
+            rows.to_csv(path, mode='a', header=path not in self._written, index_label=SPILL_ROW_COLUMN)
+            self._written.add(path)
+
+    def unique_chunks(self):
+        """Yield deduped chunks, one partition at a time"""
+        for partition in range(self.num_partitions):
+            path = self._path(partition)
+            if path not in self._written:
+                continue
+            deduper = IdDeduper()
+            for chunk in pd.read_csv(path, dtype=str, keep_default_na=False,
+                                     index_col=SPILL_ROW_COLUMN, chunksize=self.chunk_size):
+                chunk.index = chunk.index.astype(int)
+                if 'transaction_id' in chunk.columns:
+                    chunk = deduper.filter(chunk)
+                yield chunk
+            self.duplicates_removed += deduper.duplicates_removed
+
+
+def cleanse_data(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    ATC-02: Data Cleansing for a whole DataFrame
+    Single-chunk run of CleansingStage; timestamps formatted as YYYY-MM-DD HH:MM:SS
+    """
+    df = CleansingStage().process(df)
     if 'date' in df.columns:
-        df['date'] = pd.to_datetime(df['date'], errors='coerce')
-        df['date'] = df['date'].dt.strftime('%Y-%m-%d %H:%M:%S')
+        df['date'] = df['date'].dt.tz_convert(timezone.get_default_timezone_name()).dt.strftime('%Y-%m-%d %H:%M:%S')
+    return df
+
+
+def remove_duplicate_transactions(transactions, batch_size=DEDUPE_BATCH_SIZE):
+    """
+    ATC-02: Set-based duplicate removal
+    Keeps the earliest row of each (user, transaction_id) group using
+    ROW_NUMBER() OVER (PARTITION BY user_id, transaction_id ORDER BY created_at)
+    and deletes the rest, one DELETE ... WHERE id IN (window query) per batch.
+    Returns the number of rows deleted.
+    """
+    duplicates = transactions.annotate(
+        row_number=Window(
+            expression=RowNumber(),
+            partition_by=[F('user_id'), F('transaction_id')],
+            order_by=[F('created_at').asc(), F('id').asc()],
+        )
+    ).filter(row_number__gt=1).order_by().values('id')
+
+    mark_summaries_stale(Transaction.objects.filter(id__in=duplicates))
+    removed = 0
+    while True:
+        deleted, _ = Transaction.objects.filter(id__in=duplicates[:batch_size]).delete()
+        removed += deleted
+        if deleted < batch_size:
+            return removed
+
+
+def normalize_transactions(transactions, batch_size=NORMALIZE_BATCH_SIZE, stamp=None):
+    """
+    ATC-02: In-database normalization
+    Uppercases/trims country and currency, rounds amount to 2 decimals and trims
+    merchant with UPDATE statements over id ranges, touching only rows whose
+    stored value differs from its normalized form. Rewritten rows get updated_at=stamp
+    (default: now). Returns the exact number of rows normalized.
+    """
+    bounds = transactions.aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return 0
+
+    needs_change = Q()
+    for field, expression in NORMALIZED_FIELDS.items():
+        needs_change |= ~Q(Exact(F(field), expression))
+
+    stamp = stamp or timezone.now()
+    normalized = 0
+    for start in range(bounds['low'], bounds['high'] + 1, batch_size):
+        normalized += transactions.filter(
+            needs_change, id__gte=start, id__lt=start + batch_size
+        ).update(updated_at=stamp, **NORMALIZED_FIELDS)
+    return normalized
+
 
-    # Normalize currency amounts
-    if 'amount' in df.columns:
-        df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
-        df['amount'] = df['amount'].round(2)
+def canonicalize_merchants(transactions, batch_size=CANONICALIZE_BATCH_SIZE):
+    """
+    ATC-02: Fill canonical_merchant for rows where it is missing or stale
+    Canonical ids are computed once per distinct merchant string (cached), then
+    written with one CASE UPDATE per batch of merchants.
+    Returns the number of rows updated.
+    """
+    merchants = list(transactions.order_by().values_list('merchant', flat=True).distinct())
+    updated = 0
+    for start in range(0, len(merchants), batch_size):
+        mapping = {merchant: canonicalize_merchant(merchant) for merchant in merchants[start:start + batch_size]}
+        stale = Q()
+        for merchant, canonical in mapping.items():
+            stale |= Q(merchant=merchant) & (~Q(canonical_merchant=canonical) | Q(canonical_merchant__isnull=True))
+        updated += transactions.filter(stale).update(
+            canonical_merchant=Case(
+                *[When(merchant=merchant, then=Value(canonical)) for merchant, canonical in mapping.items()],
+                default=F('canonical_merchant'),
+            )
+        )
+    return updated
+
+
+def near_duplicate_pairs(rows, window_seconds=NEAR_DUPLICATE_WINDOW_SECONDS):
+    """
+    ATC-02: Near-duplicate detection with blocking keys
+    rows: (id, card_number, amount, merchant, date) tuples.
+    Rows are bucketed by (card, whole amount, time bucket of window_seconds) and
+    only compared with rows in their own and the previous time bucket, so the
+    cost is linear in rows times bucket size rather than O(n^2).
+    A match needs the exact amount, the same merchant (case/space-insensitive)
+    and at most window_seconds to the original: each row is compared only with
+    earlier originals (rows that aren't duplicates themselves), never with other
+    duplicates, so evenly spaced repeat purchases don't chain onto the first one.
+    Returns (original_id, duplicate_id, seconds_apart), seconds_apart measured
+    to the original.
+    """
+    buckets = defaultdict(list)
+    pairs = []
+
+    for txn_id, card, amount, merchant, date in sorted(rows, key=lambda r: (r[4], r[0])):
+        if not card or card == 'N/A':
+            continue
+        timestamp = date.timestamp()
+        time_bucket = int(timestamp // window_seconds)
+        merchant_key = (merchant or '').strip().upper()
 
-    # Normalize country codes
-    if 'country' in df.columns:
-        df['country'] = df['country'].str.upper().str.strip()
+        match = None
+        for bucket in (time_bucket, time_bucket - 1):
+            for other_id, other_amount, other_merchant, other_timestamp in buckets.get(
+                (card, round(amount), bucket), ()
+            ):
+                if (other_amount == amount and other_merchant == merchant_key
+                        and timestamp - other_timestamp <= window_seconds
+                        and (match is None or other_timestamp > match[1])):
+                    match = (other_id, other_timestamp)
+
+        if match:
+            pairs.append((match[0], txn_id, round(timestamp - match[1], 3)))
+        else:
+            buckets[(card, round(amount), time_bucket)].append((txn_id, amount, merchant_key, timestamp))
+
+    return pairs
+
+
+def find_near_duplicates(transactions, changed=None, window_seconds=NEAR_DUPLICATE_WINDOW_SECONDS):
+    """
+    Near-duplicate pairs among transactions involving at least one changed row
+    Older rows are only loaded for the cards and time span the changed rows cover, plus
+    one extra window so rows just before the span are themselves classified as
+    originals or duplicates before the changed rows are compared with them.
+    """
+    changed = transactions if changed is None else changed
+    span = changed.aggregate(first=Min('date'), last=Max('date'))
+    if span['first'] is None:
+        return []
 
-    # Normalize currency codes
-    if 'currency' in df.columns:
-        df['currency'] = df['currency'].str.upper().str.strip()
+    window = timedelta(seconds=window_seconds)
+    candidates = transactions.filter(
+        card_number__in=changed.order_by().values('card_number').distinct(),
+        date__gte=span['first'] - 2 * window,
+        date__lte=span['last'] + window,
+    )
+    changed_ids = set(changed.values_list('id', flat=True))
+    # Canonical merchant ids, so "AMAZON MKTPLACE" and "Amazon.com*2K4" still match
+    merchant = Coalesce('canonical_merchant', 'merchant')
+    rows = candidates.order_by().values_list(
+        'id', 'card_number', 'amount', merchant, 'date'
+    ).iterator(chunk_size=5000)
 
-    return df
\ No newline at end of file
+    return [
+        pair for pair in near_duplicate_pairs(rows, window_seconds)
+        if pair[0] in changed_ids or pair[1] in changed_ids
+    ]
+
+
+def commit_lag():
+    """How far incremental runs look back past the watermark for late-committed rows"""
+    return timedelta(seconds=getattr(settings, 'CLEANSING_COMMIT_LAG_SECONDS', 60))
+
+
+def cleanse_user_transactions(user, full=False, merge_near_duplicates=False):
+    """
+    ATC-02: Incremental cleansing for one user
+    Only rows created or updated since the user's watermark are examined. The
+    watermark is backed off by CLEANSING_COMMIT_LAG_SECONDS so rows stamped before
+    a run but committed after its scan are still picked up; rows the previous run
+    rewrote itself (its write stamp) are left out.
+    Duplicate checks pull in older rows through the (user, transaction_id)
+    index instead of rescanning the whole history. full=True ignores the watermark.
+    Merchants are canonicalized after normalization. Near-duplicates (same
+    purchase under another id) are reported, and deleted in favour of the
+    earliest row when merge_near_duplicates is set.
+    """
+    run_started = timezone.now()
+    state, _ = CleansingState.objects.get_or_create(user=user)
+
+    transactions = Transaction.objects.filter(user=user)
+    changed = transactions
+    if state.watermark and not full:
+        # updated_at is set on insert too, so it covers new and edited rows
+        changed = transactions.filter(updated_at__gte=state.watermark - commit_lag())
+        if state.last_write_stamp:
+            changed = changed.exclude(updated_at=state.last_write_stamp)
+    write_stamp = timezone.now()
+
+    examined = changed.count()
+    duplicates_removed = 0
+    records_normalized = 0
+    merchants_canonicalized = 0
+    duplicate_groups_cleared = 0
+    near_duplicates = []
+    near_duplicates_merged = 0
+
+    if examined:
+        # Whole duplicate groups for the changed ids, old rows included
+        groups = transactions.filter(transaction_id__in=changed.order_by().values('transaction_id'))
+        duplicate_groups_cleared = groups.values('transaction_id').annotate(
+            count=Count('transaction_id')
+        ).filter(count__gt=1).count()
+        duplicates_removed = remove_duplicate_transactions(groups)
+        records_normalized = normalize_transactions(changed, stamp=write_stamp)
+        merchants_canonicalized = canonicalize_merchants(changed)
+        near_duplicates = find_near_duplicates(transactions, changed)
+        if merge_near_duplicates and near_duplicates:
+            duplicate_ids = [duplicate_id for _, duplicate_id, _ in near_duplicates]
+            mark_summaries_stale(Transaction.objects.filter(id__in=duplicate_ids))
+            for start in range(0, len(duplicate_ids), DEDUPE_BATCH_SIZE):
+                deleted, _ = Transaction.objects.filter(
+                    id__in=duplicate_ids[start:start + DEDUPE_BATCH_SIZE]
+                ).delete()
+                near_duplicates_merged += deleted
+
+    state.watermark = run_started
+    state.last_write_stamp = write_stamp if records_normalized else None
+    state.last_cleansed = timezone.now()
+    state.save(update_fields=['watermark', 'last_write_stamp', 'last_cleansed', 'updated_at'])
+
+    if examined:
+        bump_stats_version(user)
+
+    if full:
+        # A full run has touched every row anyway, so take an exact recount
+        refresh_cleansing_stats(user)
+    else:
+        # Deleted rows leave the total; duplicate groups outside the changed
+        # ids are untouched, so duplicates_count only drops by the groups cleared
+        CleansingState.objects.filter(user=user).update(
+            total_transactions=Greatest(F('total_transactions') - duplicates_removed - near_duplicates_merged, 0),
+            duplicates_count=Greatest(F('duplicates_count') - duplicate_groups_cleared, 0),
+        )
+
+    return {
+        "examined": examined,
+        "duplicates_removed": duplicates_removed,
+        "records_normalized": records_normalized,
+        "merchants_canonicalized": merchants_canonicalized,
+        "near_duplicates": near_duplicates,
+        "near_duplicates_merged": near_duplicates_merged,
+    }
+
+
+def refresh_cleansing_stats(user):
+    """Recount a user's cleansing statistics into their CleansingState row"""
+    transactions = Transaction.objects.filter(user=user)
+    state, _ = CleansingState.objects.get_or_create(user=user)
+    state.total_transactions = transactions.count()
+    state.duplicates_count = transactions.values('transaction_id').annotate(
+        count=Count('transaction_id')
+    ).filter(count__gt=1).count()
+    if state.last_cleansed is None:
+        last_cleansing = AuditLog.objects.filter(
+            user=user, action__icontains='cleansing'
+        ).order_by('-timestamp').first()
+        state.last_cleansed = last_cleansing.timestamp if last_cleansing else None
+    state.stats_refreshed_at = timezone.now()
+    state.stats_stale = False
+    state.save()
+    return state
+
+
+def get_cleansing_stats(user):
+    """
+    Cleansing statistics from the user's materialized stats row
+    Constant time once the row exists; recounts only if it was never built. A row marked
+    stale is still served as-is, flagged stale, until the background recount catches up.
+    """
+    state = CleansingState.objects.filter(user=user).first()
+    if state is None or state.stats_refreshed_at is None:
+        state = refresh_cleansing_stats(user)
+    return {
+        "total_transactions": state.total_transactions,
+        "duplicates_count": state.duplicates_count,
+        "last_cleansed": state.last_cleansed.isoformat() if state.last_cleansed else None,
+        "stale": state.stats_stale,
+    }
+
+
+def record_transactions_added(user, count):
+    """Add newly inserted rows to the user's materialized total"""
+    if user is not None and count:
+        CleansingState.objects.filter(user=user).update(total_transactions=F('total_transactions') + count)
+
+
+def invalidate_cleansing_stats(user):
+    """
+    Mark stats stale after writes whose effect isn't known (e.g. bulk_create ignoring conflicts)
+    The refresh_cleansing_stats task recounts them off the request path.
+    """
+    if user is not None:
+        CleansingState.objects.filter(user=user).update(stats_stale=True)
@@ -0,0 +1,600 @@
+# api/exports.py
+import csv
+import datetime
+import itertools
+import queue
+import threading
+import time
+import zlib
+
+from django.db import connection, connections
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .fx import base_currency, BASE_AMOUNT
+
+# Rows fetched per server-side cursor round trip / rows per yielded block
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_WRITE_BATCH = 500
+
+# Rows per Parquet row group / Arrow record batch
+ARROW_BATCH_ROWS = 50000
+
+# Content type and file extension of the columnar formats
+ARROW_FORMATS = {
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+}
+
+# Streaming compression: codec -> (level, file suffix, content type when sent as a file)
+COMPRESSION_CODECS = {
+    'zstd': (3, '.zst', 'application/zstd'),
+    'gzip': (6, '.gz', 'application/gzip'),
+}
+
+# PDF listing: rows per page table (the first page also carries the summary) and
+# (header, Transaction field, column width in points)
+PDF_FIRST_PAGE_ROWS = 36
+PDF_ROWS_PER_PAGE = 48
+PDF_COLUMNS = [
+    ('Date', 'date', 75),
+    ('Transaction ID', 'transaction_id', 110),
+    ('Merchant', 'merchant', 135),
+    ('Amount', 'amount', 70),
+    ('Risk', 'risk_score', 45),
+    ('Status', 'status', 60),
+]
+
+# (header, field) of scheduled summary reports: one row per day
+SUMMARY_COLUMNS = [
+    ('Date', 'day'),
+    ('Transactions', 'total'),
+    ('Fraud', 'fraud'),
+    ('Pending', 'pending'),
+    ('Approved', 'approved'),
+    ('Rejected', 'rejected'),
+    ('Amount (base)', 'amount'),
+]
+
+# Risk bands over risk_score (0-100): band -> [lower, upper)
+RISK_BANDS = {
+    'low': (None, 40),
+    'medium': (40, 70),
+    'high': (70, None),
+}
+
+# Blocks buffered between the COPY thread and the response (bounds memory on slow clients)
+COPY_QUEUE_BLOCKS = 64
+
+# (CSV header, Transaction field) for ATC-07 exports, in column order
+EXPORT_COLUMNS = [
+    ('Transaction ID', 'transaction_id'),
+    ('Date', 'date'),
+    ('Merchant', 'merchant'),
+    ('Amount', 'amount'),
+    ('Amount (base)', 'amount_base'),
+    ('Status', 'status'),
+    ('Risk Score', 'risk_score'),
+    ('Fraud Score', 'fraud_score'),
+    ('Is Fraud', 'is_fraud'),
+    ('Country', 'country'),
+    ('Currency', 'currency'),
+]
+EXPORT_FIELDS = [field for _, field in EXPORT_COLUMNS]
+
+
+class _Echo:
+    """File-like object whose write() returns the value, so csv.writer formats without buffering"""
+
+    def write(self, value):
+        return value
+
+
+def csv_header():
+    return [f'Amount ({base_currency()})' if field == 'amount_base' else header for header, field in EXPORT_COLUMNS]
+
+
+def summary_header(header):
+    return f'Amount ({base_currency()})' if header == 'Amount (base)' else header
+
+
+def format_csv_row(row):
+    """One values_list row (EXPORT_FIELDS order) as CSV cells"""
+    txn_id, date, merchant, amount, amount_base, status, risk_score, fraud_score, is_fraud, country, currency = row
+    return [
+        txn_id or '',
+        date.strftime('%Y-%m-%d %H:%M:%S') if date else '',
+        merchant or 'Unknown',
+        float(amount) if amount else 0.0,
+        float(amount_base) if amount_base is not None else '',
+        status or 'pending',
+        float(risk_score) if risk_score else 0.0,
+        float(fraud_score) if fraud_score else 0.0,
+        'YES' if is_fraud else 'NO',
+        country or 'US',
+        currency or 'USD',
+    ]
+
+
+def export_rows(transactions, chunk_size=EXPORT_CHUNK_SIZE):
+    """Exported columns only, newest first, read through a chunked (server-side on PostgreSQL) cursor"""
+    return transactions.order_by('-date', '-id').values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+
+
+def stream_csv(transactions, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    ATC-07: CSV export as a generator of text blocks
+    Memory stays at one cursor chunk; the header goes out before any row is read.
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(csv_header())
+    block = []
+    for row in export_rows(transactions, chunk_size):
+        block.append(writer.writerow(format_csv_row(row)))
+        if len(block) >= EXPORT_WRITE_BATCH:
+            yield ''.join(block)
+            block = []
+    if block:
+        yield ''.join(block)
+
+
+def arrow_schema():
+    """Typed export columns: exact decimals, UTC timestamps, dictionary-encoded low-cardinality strings"""
+    import pyarrow as pa
+
+    category = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ('transaction_id', pa.string()),
+        ('date', pa.timestamp('us', tz='UTC')),
+        ('merchant', pa.string()),
+        ('amount', pa.decimal128(12, 2)),
+        ('amount_base', pa.decimal128(14, 2)),
+        ('status', category),
+        ('risk_score', pa.decimal128(5, 2)),
+        ('fraud_score', pa.decimal128(5, 4)),
+        ('is_fraud', pa.bool_()),
+        ('country', category),
+        ('currency', category),
+    ])
+
+
+def iter_record_batches(transactions, batch_rows=ARROW_BATCH_ROWS):
+    """Arrow record batches of the export rows, built from chunked cursor reads"""
+    import pyarrow as pa
+
+    schema = arrow_schema()
+    rows = export_rows(transactions)
+    while True:
+        batch = list(itertools.islice(rows, batch_rows))
+        if not batch:
+            return
+        columns = []
+        for field, values in zip(schema, zip(*batch)):
+            if pa.types.is_dictionary(field.type):
+                columns.append(pa.array(values, pa.string()).dictionary_encode())
+            else:
+                columns.append(pa.array(values, field.type))
+        yield pa.record_batch(columns, schema=schema)
+
+
+class _ByteSink:
+    """Write-only file object whose contents are drained after each batch"""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def stream_arrow(transactions, file_format, batch_rows=ARROW_BATCH_ROWS):
+    """
+    ATC-07: Parquet or Arrow IPC stream export
+    Each chunk of rows becomes one row group / record batch and its bytes are
+    yielded as soon as they are written, so memory stays at one batch.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _ByteSink()
+    target = pa.PythonFile(sink, mode='w')
+    schema = arrow_schema()
+    if file_format == 'parquet':
+        writer = pq.ParquetWriter(target, schema, compression='zstd')
+    else:
+        writer = pa.ipc.new_stream(target, schema)
+
+    for batch in iter_record_batches(transactions, batch_rows):
+        writer.write_batch(batch)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def parse_export_filters(start_date=None, end_date=None, status=None, risk_band=None, is_fraud=None):
+    """
+    Validated export filters (JSON-serializable, so they can key cached reports)
+    Dates are inclusive YYYY-MM-DD days; raises ValueError on bad input.
+    """
+    filters = {}
+    for name, value in (('start_date', start_date), ('end_date', end_date)):
+        if value:
+            try:
+                filters[name] = datetime.date.fromisoformat(str(value)).isoformat()
+            except ValueError:
+                raise ValueError(f"{name} must be a YYYY-MM-DD date")
+    if filters.get('start_date') and filters.get('end_date') and filters['start_date'] > filters['end_date']:
+        raise ValueError("start_date must not be after end_date")
+    if status:
+        if status not in ('pending', 'approved', 'rejected'):
+            raise ValueError("status must be one of: pending, approved, rejected")
+        filters['status'] = status
+    if risk_band:
+        if risk_band not in RISK_BANDS:
+            raise ValueError(f"risk_band must be one of: {', '.join(RISK_BANDS)}")
+        filters['risk_band'] = risk_band
+    if is_fraud is not None:
+        filters['is_fraud'] = bool(is_fraud)
+    return filters
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.datetime.combine(datetime.date.fromisoformat(day), datetime.time.min))
+
+
+def filter_transactions(transactions, filters):
+    """
+    Apply parse_export_filters() output as plain range/equality predicates
+    The date bounds are half-open datetime ranges so the (user, date) index is used;
+    status and is_fraud match the (user, status) / (user, is_fraud) indexes.
+    """
+    filters = filters or {}
+    if filters.get('start_date'):
+        transactions = transactions.filter(date__gte=_day_start(filters['start_date']))
+    if filters.get('end_date'):
+        transactions = transactions.filter(date__lt=_day_start(filters['end_date']) + datetime.timedelta(days=1))
+    if filters.get('status'):
+        transactions = transactions.filter(status=filters['status'])
+    if filters.get('is_fraud') is not None:
+        transactions = transactions.filter(is_fraud=filters['is_fraud'])
+    if filters.get('risk_band'):
+        lower, upper = RISK_BANDS[filters['risk_band']]
+        if lower is not None:
+            transactions = transactions.filter(risk_score__gte=lower)
+        if upper is not None:
+            transactions = transactions.filter(risk_score__lt=upper)
+    return transactions
+
+
+def export_summary(transactions):
+    """Report summary counts and base-currency amount in one conditional aggregate query"""
+    summary = transactions.order_by().aggregate(
+        total=Count('pk'),
+        fraud=Count('pk', filter=Q(is_fraud=True)),
+        pending=Count('pk', filter=Q(status='pending')),
+        approved=Count('pk', filter=Q(status='approved')),
+        rejected=Count('pk', filter=Q(status='rejected')),
+        amount=Sum(BASE_AMOUNT),
+    )
+    summary['amount'] = summary['amount'] or 0
+    return summary
+
+
+def _pdf_rows(transactions, chunk_size=EXPORT_CHUNK_SIZE):
+    """Formatted table rows for the PDF listing, newest first, from a chunked cursor"""
+    rows = transactions.order_by('-date', '-id').values_list(*[field for _, field, _ in PDF_COLUMNS])
+    for date, transaction_id, merchant, amount, risk_score, status in rows.iterator(chunk_size=chunk_size):
+        yield [
+            date.strftime('%Y-%m-%d %H:%M') if date else '',
+            (transaction_id or '')[:22],
+            (merchant or '')[:28],
+            f"{float(amount):,.2f}" if amount is not None else '',
+            f"{float(risk_score):.1f}" if risk_score is not None else 'N/A',
+            status,
+        ]
+
+
+def write_pdf(transactions, target, page_timings=None):
+    """
+    ATC-07: PDF summary and the full transaction listing drawn onto target (a response or file)
+    Each page's table is built from its own bounded batch of rows and drawn straight onto
+    the canvas, so render cost grows linearly with the row count. Returns the row count;
+    seconds spent on each page are appended to page_timings when given.
+    """
+    from reportlab.pdfgen import canvas
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import Table, TableStyle
+
+    p = canvas.Canvas(target, pagesize=letter, pageCompression=1)
+    width, height = letter
+    table_style = TableStyle([
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 7),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (3, 0), (4, -1), 'RIGHT'),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f2f2f2')]),
+        ('TOPPADDING', (0, 0), (-1, -1), 2),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+    ])
+    header = [title for title, _, _ in PDF_COLUMNS]
+    col_widths = [col_width for _, _, col_width in PDF_COLUMNS]
+
+    started = time.perf_counter()
+
+    # Title
+    p.setFont("Helvetica-Bold", 16)
+    p.drawString(50, height - 50, "SecurePath Fraud Detection Report")
+
+    # Report info - user-specific
+    p.setFont("Helvetica", 12)
+    summary = export_summary(transactions)
+
+    y_pos = height - 80
+    for line in (
+        f"Report Generated: {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}",
+        f"Total Transactions: {summary['total']}",
+        f"Fraud Detected: {summary['fraud']}",
+        f"Pending Review: {summary['pending']}",
+    ):
+        p.drawString(50, y_pos, line)
+        y_pos -= 20
+
+    rows = _pdf_rows(transactions)
+    batch = list(itertools.islice(rows, PDF_FIRST_PAGE_ROWS))
+    table_top = y_pos - 10
+    row_count = 0
+    page = 1
+    while True:
+        if batch:
+            table = Table([header] + batch, colWidths=col_widths)
+            table.setStyle(table_style)
+            _, table_height = table.wrapOn(p, width, height)
+            table.drawOn(p, 50, table_top - table_height)
+            row_count += len(batch)
+        p.setFont("Helvetica", 8)
+        p.drawRightString(width - 50, 30, f"Page {page}")
+        p.showPage()
+        if page_timings is not None:
+            page_timings.append(time.perf_counter() - started)
+
+        batch = list(itertools.islice(rows, PDF_ROWS_PER_PAGE))
+        if not batch:
+            break
+        started = time.perf_counter()
+        table_top = height - 50
+        page += 1
+
+    p.save()
+    return row_count
+
+
+def write_summary_csv(rows, target):
+    """ATC-07: Per-day summary rows (SUMMARY_COLUMNS fields) as CSV text written to target"""
+    writer = csv.writer(target)
+    writer.writerow([summary_header(header) for header, _ in SUMMARY_COLUMNS])
+    for row in rows:
+        writer.writerow([row[field] for _, field in SUMMARY_COLUMNS])
+    return len(rows)
+
+
+def write_summary_pdf(rows, totals, title, target):
+    """ATC-07: Period totals and the per-day breakdown drawn onto target; returns the day count"""
+    from reportlab.pdfgen import canvas
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import Table, TableStyle
+
+    p = canvas.Canvas(target, pagesize=letter, pageCompression=1)
+    width, height = letter
+
+    p.setFont("Helvetica-Bold", 16)
+    p.drawString(50, height - 50, title)
+
+    p.setFont("Helvetica", 12)
+    y_pos = height - 80
+    for line in (
+        f"Report Generated: {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}",
+        f"Total Transactions: {totals['total']}",
+        f"Fraud Detected: {totals['fraud']}",
+        f"Pending Review: {totals['pending']} | Approved: {totals['approved']} | Rejected: {totals['rejected']}",
+        f"Total Amount ({base_currency()}): {float(totals['amount']):,.2f}",
+    ):
+        p.drawString(50, y_pos, line)
+        y_pos -= 20
+
+    # At most 31 days, so the breakdown always fits one table
+    if rows:
+        table = Table(
+            [[summary_header(header) for header, _ in SUMMARY_COLUMNS]]
+            + [[row[field] if field != 'amount' else f"{float(row[field]):,.2f}" for _, field in SUMMARY_COLUMNS] for row in rows]
+        )
+        table.setStyle(TableStyle([
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+            ('TOPPADDING', (0, 0), (-1, -1), 2),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+        ]))
+        _, table_height = table.wrapOn(p, width, height)
+        table.drawOn(p, 50, y_pos - 10 - table_height)
+
+    p.showPage()
+    p.save()
+    return len(rows)
+
+
+def supports_copy_export():
+    return connection.vendor == 'postgresql'
+
+
+def copy_export_sql(transactions, cursor):
+    """
+    COPY ... TO STDOUT statement for the export rows
+    The outer SELECT reproduces format_csv_row in SQL (numerics keep their stored scale).
+    """
+    inner = transactions.order_by('-date', '-id').values_list(*EXPORT_FIELDS)
+    sql, params = inner.query.sql_with_params()
+    inner_sql = cursor.mogrify(sql, params).decode()
+    header = dict(zip(EXPORT_FIELDS, csv_header()))
+    quote = connection.ops.quote_name
+    formats = {
+        'transaction_id': "COALESCE({}, '')",
+        'date': "to_char({} AT TIME ZONE 'UTC', 'YYYY-MM-DD HH24:MI:SS')",
+        'merchant': "COALESCE(NULLIF({}, ''), 'Unknown')",
+        'amount': "COALESCE({}, 0)",
+        'amount_base': "{}",
+        'status': "COALESCE(NULLIF({}, ''), 'pending')",
+        'risk_score': "COALESCE({}, 0)",
+        'fraud_score': "COALESCE({}, 0)",
+        'is_fraud': "CASE WHEN {} THEN 'YES' ELSE 'NO' END",
+        'country': "COALESCE(NULLIF({}, ''), 'US')",
+        'currency': "COALESCE(NULLIF({}, ''), 'USD')",
+    }
+    columns = [f"{formats[field].format(quote(field))} AS {quote(header[field])}" for field in EXPORT_FIELDS]
+    return f"COPY (SELECT {', '.join(columns)} FROM ({inner_sql}) AS export_rows) TO STDOUT WITH CSV HEADER"
+
+
+class _ExportCancelled(Exception):
+    pass
+
+
+class _QueueWriter:
+    """File-like target for copy_expert that hands each block to the response generator"""
+
+    def __init__(self, blocks, cancelled):
+        self.blocks = blocks
+        self.cancelled = cancelled
+
+    def put(self, block):
+        """Queue a block, giving up once the response has been closed"""
+        while not self.cancelled.is_set():
+            try:
+                self.blocks.put(block, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def write(self, data):
+        if not self.put(bytes(data)):
+            raise _ExportCancelled()
+        return len(data)
+
+
+def stream_csv_copy(transactions):
+    """
+    ATC-07: PostgreSQL fast path - COPY TO STDOUT bytes piped to the response
+    COPY runs on its own connection in a worker thread and feeds a bounded queue;
+    if the client goes away the COPY is aborted.
+    """
+    blocks = queue.Queue(maxsize=COPY_QUEUE_BLOCKS)
+    cancelled = threading.Event()
+    writer = _QueueWriter(blocks, cancelled)
+    done = object()
+
+    def run_copy():
+        result = done
+        try:
+            with connections['default'].cursor() as cursor:
+                cursor.copy_expert(copy_export_sql(transactions, cursor), writer)
+        except _ExportCancelled:
+            pass
+        except Exception as e:
+            result = e
+        finally:
+            connections['default'].close()
+            writer.put(result)
+
+    worker = threading.Thread(target=run_copy, name='export-copy', daemon=True)
+    worker.start()
+    try:
+        while True:
+            block = blocks.get()
+            if block is done:
+                return
+            if isinstance(block, Exception):
+                raise block
+            yield block
+    finally:
+        cancelled.set()
+
+
+def stream_export_csv(transactions, fast=False):
+    """CSV export stream: COPY on PostgreSQL when fast is requested, the Python writer otherwise"""
+    if fast and supports_copy_export():
+        return stream_csv_copy(transactions)
+    return stream_csv(transactions)
+
+
+def zstd_available():
+    try:
+        import zstandard  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def available_codecs():
+    return [codec for codec in COMPRESSION_CODECS if codec != 'zstd' or zstd_available()]
+
+
+def negotiate_compression(requested=None, accept_encoding=''):
+    """
+    Pick a codec for an export: the ?compression= value if given, otherwise the
+    best codec the client lists in Accept-Encoding (zstd before gzip), or None
+    """
+    if requested:
+        if requested not in available_codecs():
+            raise ValueError(f"Unsupported compression: {requested}. Supported: {', '.join(available_codecs())}")
+        return requested
+    accepted = set()
+    for token in accept_encoding.split(','):
+        name, _, params = token.strip().partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(name.strip().lower())
+    for codec in available_codecs():
+        if codec in accepted:
+            return codec
+    return None
+
+
+def compress_stream(blocks, codec):
+    """
+    Compress a stream of str/bytes blocks on the fly
+    Each block is fed to an incremental compressor and whatever output it has
+    ready is yielded, so memory stays at one block regardless of export size.
+    """
+    level = COMPRESSION_CODECS[codec][0]
+    if codec == 'zstd':
+        import zstandard
+        compressor = zstandard.ZstdCompressor(level=level).compressobj()
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for block in blocks:
+        data = compressor.compress(block.encode('utf-8') if isinstance(block, str) else block)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -1,13 +1,39 @@
 # api/fraud_detection.py
 import numpy as np
 import joblib
+import hashlib
 import os
+from django.conf import settings
 from .models import Transaction
+from .fx import base_amount
+from .ip_utils import populate_ip_fields
+from .score_cache import ScoreCache
+from .stats_cache import bump_stats_version
+
+# Velocity thresholds (transactions seen from the same IP / subnet)
+IP_VELOCITY_THRESHOLD = 10
+SUBNET_VELOCITY_THRESHOLD = 50
+
+# Score combination (60% rules, 40% ML) and flag threshold
+RULE_WEIGHT = 0.6
+ML_WEIGHT = 0.4
+FLAG_THRESHOLD = 70
+ML_ANOMALY_THRESHOLD = 70
+
+# Bump whenever calculate_rule_score changes so stored scores can be rescored
+RULES_VERSION = "r3"
+
+MODEL_PATH = "fraud_model.pkl"
+
+_model_version_cache = {}
+
+# Repeat feature vectors (e.g. recurring subscriptions) skip inference
+score_cache = ScoreCache(max_size=getattr(settings, 'SCORE_CACHE_SIZE', 10000))
 
 
 def load_ml_model():
     """Load ML model if exists, otherwise return None"""
-    model_path = "fraud_model.pkl"
+    model_path = MODEL_PATH
     if os.path.exists(model_path):
         try:
             return joblib.load(model_path)
@@ -17,13 +43,46 @@ def load_ml_model():
     return None
 
 
+def get_model_version():
+    """Short content hash of the ML model file, or 'none' when no model is deployed"""
+    if not os.path.exists(MODEL_PATH):
+        return "none"
+    stat = os.stat(MODEL_PATH)
+    key = (stat.st_mtime, stat.st_size)
+    if key not in _model_version_cache:
+        digest = hashlib.sha1()
+        with open(MODEL_PATH, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        _model_version_cache.clear()
+        _model_version_cache[key] = digest.hexdigest()[:12]
+    return _model_version_cache[key]
+
+
+def get_score_version():
+    """Version stamp stored on each scored transaction (rules + model)"""
+    return f"{RULES_VERSION}/{get_model_version()}"
+
+
+def ip_velocity(txn, by_subnet=False):
+    """Count transactions sharing this transaction's IP, or its /24 (IPv4) or /48 (IPv6) subnet"""
+    if txn.ip_int is None and txn.ip_address:
+        populate_ip_fields(txn)
+    if txn.ip_int is None:
+        return 0
+    if by_subnet:
+        return Transaction.objects.filter(ip_subnet=txn.ip_subnet).count()
+    return Transaction.objects.filter(ip_int=txn.ip_int).count()
+
+
 def calculate_rule_score(txn):
     """ATC-03: Rule-based fraud detection"""
     reasons = []
     score = 0
 
-    # Rule 1: High amount (>$5,000)
-    if txn.amount and txn.amount > 5000:
+    # Rule 1: High amount (>$5,000, in the base currency)
+    amount = base_amount(txn)
+    if amount and amount > 5000:
         reasons.append("R1: High Amount (>$5,000)")
         score += 30
 
@@ -34,10 +93,14 @@ def calculate_rule_score(txn):
 
     # Rule 3: High velocity IP
     if txn.ip_address:
-        ip_count = Transaction.objects.filter(ip_address=txn.ip_address).count()
-        if ip_count > 10:
+        ip_count = ip_velocity(txn)
+        if ip_count > IP_VELOCITY_THRESHOLD:
             reasons.append("R3: High Velocity IP")
             score += 20
+        elif ip_velocity(txn, by_subnet=True) > SUBNET_VELOCITY_THRESHOLD:
+            # Rotating addresses inside one network still count as velocity
+            reasons.append("R3: High Velocity Subnet")
+            score += 10
 
     # Rule 4: New device
     if "new" in str(txn.device_id).lower():
@@ -45,9 +108,9 @@ def calculate_rule_score(txn):
         score += 15
 
     # Rule 5: New IP Address (ATC-03)
-    if txn.ip_address:
+    if txn.ip_int is not None:
         # Check if this IP has been seen before (excluding current transaction)
-        ip_exists = Transaction.objects.filter(ip_address=txn.ip_address).exclude(id=txn.id).exists()
+        ip_exists = Transaction.objects.filter(ip_int=txn.ip_int).exclude(id=txn.id).exists()
         if not ip_exists:
             reasons.append("R5: New IP Address")
             score += 10
@@ -55,80 +118,148 @@ def calculate_rule_score(txn):
     return score, reasons
 
 
+# Column order of the ML feature matrix (stored with trained model artifacts)
+FEATURE_SCHEMA = ['amount', 'high_amount', 'foreign_country', 'new_device', 'ip_velocity']
+
+
 def prepare_ml_features(transactions):
     """Prepare feature matrix for ML model"""
     features = []
     for t in transactions:
+        amount = base_amount(t)
         feature = [
-            float(t.amount or 0),
-            1 if t.amount and t.amount > 5000 else 0,
+            float(amount or 0),
+            1 if amount and amount > 5000 else 0,
             1 if t.country and t.country != "US" else 0,
             1 if "new" in str(t.device_id).lower() else 0,
-            Transaction.objects.filter(ip_address=t.ip_address).count() if t.ip_address else 1
+            ip_velocity(t) if t.ip_address else 1
         ]
         features.append(feature)
     return np.array(features)
 
 
 def calculate_ml_scores(model, features):
-    """ATC-04: ML-based scoring"""
+    """
+    ATC-04: ML-based scoring
+    Trained artifacts (see train_fraud_model) carry a calibration range so scores are
+    comparable across batches; bare estimators fall back to per-batch min-max scaling.
+    """
+    calibration = None
+    if isinstance(model, dict):
+        calibration = model.get('calibration')
+        model = model['model']
     try:
         ml_scores = model.decision_function(features) * -1
+        if calibration:
+            low, high = calibration['low'], calibration['high']
+            return np.clip((ml_scores - low) / (high - low + 1e-10) * 100, 0, 100)
         ml_scores = (ml_scores - ml_scores.min()) / (ml_scores.max() - ml_scores.min() + 1e-10) * 100
         return ml_scores
     except:
         return np.zeros(len(features))
 
 
-def detect_fraud(transactions):
+def ml_reasons(ml_score):
+    """Reasons contributed by the ML score"""
+    return ("ML: Anomaly Detected",) if ml_score > ML_ANOMALY_THRESHOLD else ()
+
+
+def cached_ml_scores(model, features):
     """
-    Main fraud detection function
-    Combines rule-based (ATC-03) and ML-based (ATC-04) detection
+    ML scores and reasons per feature row, served from the fingerprint cache where possible
+    Only calibrated artifacts are cached: min-max scaled scores depend on the rest of the batch.
+    """
+    if len(features) == 0:
+        return []
+    if not (isinstance(model, dict) and model.get('calibration')):
+        return [(float(s), ml_reasons(s)) for s in calculate_ml_scores(model, features)]
+
+    score_cache.use_version(get_model_version())
+    results = [None] * len(features)
+    miss_idx = []
+    for i, row in enumerate(features):
+        cached = score_cache.get(ScoreCache.fingerprint(row))
+        if cached is None:
+            miss_idx.append(i)
+        else:
+            results[i] = cached
+
+    if miss_idx:
+        # Identical vectors within the batch are scored once
+        unique_rows, inverse = np.unique(features[miss_idx], axis=0, return_inverse=True)
+        unique_scores = calculate_ml_scores(model, unique_rows)
+        for i, u in zip(miss_idx, inverse.reshape(-1)):
+            score = float(unique_scores[u])
+            results[i] = (score, ml_reasons(score))
+            score_cache.put(ScoreCache.fingerprint(features[i]), results[i])
+
+    return results
+
+
+def score_transactions(transactions, model=None):
+    """
+    Score transactions without saving them
+    Returns a list of (final_score, reason_text) in input order
     """
-    model = load_ml_model()
     use_ml = model is not None
 
     # Prepare ML features
     if use_ml:
         features = prepare_ml_features(transactions)
-        ml_scores = calculate_ml_scores(model, features)
+        ml_results = cached_ml_scores(model, features)
     else:
-        ml_scores = np.zeros(len(transactions))
-
-    results = []
-    flagged_count = 0
+        ml_results = [(0, ())] * len(transactions)
 
+    scores = []
     for i, txn in enumerate(transactions):
         # Calculate rule-based score
         rule_score, reasons = calculate_rule_score(txn)
 
-        # Get ML score
-        ml_score = ml_scores[i] if use_ml else 0
+        # Get ML score and reasons
+        ml_score, ml_reason_list = ml_results[i]
 
         # Combine scores (60% rules, 40% ML)
-        final_score = min(100, (rule_score * 0.6 + ml_score * 0.4))
+        final_score = min(100, (rule_score * RULE_WEIGHT + ml_score * ML_WEIGHT))
 
         # Add ML reason if high score
-        if use_ml and ml_score > 70:
-            reasons.append("ML: Anomaly Detected")
+        reasons.extend(ml_reason_list)
 
         reason_text = " | ".join(reasons) if reasons else "No risk flags detected"
+        scores.append((round(final_score, 1), reason_text))
+
+    return scores
+
+
+def detect_fraud(transactions):
+    """
+    Main fraud detection function
+    Combines rule-based (ATC-03) and ML-based (ATC-04) detection
+    """
+    model = load_ml_model()
+    score_version = get_score_version()
+    scores = score_transactions(transactions, model)
+
+    results = []
+    flagged_count = 0
 
+    for txn, (final_score, reason_text) in zip(transactions, scores):
         # Save to database
-        txn.risk_score = round(final_score, 1)
+        txn.risk_score = final_score
         txn.reason_code = reason_text
+        txn.score_version = score_version
         txn.save()
 
-        is_flagged = final_score >= 70
+        is_flagged = final_score >= FLAG_THRESHOLD
         if is_flagged:
             flagged_count += 1
 
         results.append({
             "id": txn.id,
             "transaction_id": txn.transaction_id,
-            "risk_score": round(final_score, 1),
+            "risk_score": final_score,
             "reason_code": reason_text,
             "flagged": is_flagged
         })
 
-    return results, flagged_count
\ No newline at end of file
+    bump_stats_version(*{txn.user_id for txn in transactions})
+    return results, flagged_count
@@ -0,0 +1,99 @@
+# api/fx.py
+import logging
+import os
+from decimal import Decimal
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db.models.functions import Coalesce
+
+logger = logging.getLogger('api')
+
+_fx_table_cache = {}
+
+# SQL form of base_amount(): for aggregates and filters
+BASE_AMOUNT = Coalesce('amount_base', 'amount')
+
+
+def base_currency():
+    return getattr(settings, 'BASE_CURRENCY', 'USD')
+
+
+class FxTable:
+    """
+    Date-indexed FX rates held in memory: currency -> (sorted dates, rates)
+    A rate is base-currency units per one unit of the currency; each amount is
+    converted at the latest rate on or before its date (the earliest rate for
+    dates before the table starts, the latest rate for missing dates).
+    """
+
+    def __init__(self, rates: pd.DataFrame):
+        self.rates = {}
+        for currency, rows in rates.groupby('currency'):
+            rows = rows.sort_values('date')
+            self.rates[currency] = (rows['date'].to_numpy(dtype='datetime64[ns]'), rows['rate'].to_numpy(dtype=float))
+
+    @classmethod
+    def from_csv(cls, path):
+        rates = pd.read_csv(path, dtype={'currency': str})
+        rates['currency'] = rates['currency'].str.upper().str.strip()
+        rates['date'] = pd.to_datetime(rates['date'])
+        return cls(rates)
+
+    def convert(self, amounts, currencies, dates):
+        """
+        Vectorized conversion to the base currency
+        One searchsorted per distinct currency; unknown currencies give NaN.
+        """
+        amounts = np.asarray(amounts, dtype=float)
+        currencies = pd.Series(currencies, dtype=object).fillna('').astype(str).str.upper().str.strip().to_numpy()
+        dates = pd.to_datetime(pd.Series(dates), utc=True).dt.tz_localize(None).to_numpy(dtype='datetime64[ns]')
+
+        result = np.full(len(amounts), np.nan)
+        is_base = (currencies == base_currency()) | (currencies == '')
+        result[is_base] = amounts[is_base]
+
+        for currency in np.unique(currencies[~is_base]):
+            if currency not in self.rates:
+                continue
+            mask = currencies == currency
+            rate_dates, rates = self.rates[currency]
+            position = np.clip(np.searchsorted(rate_dates, dates[mask], side='right') - 1, 0, len(rates) - 1)
+            position[np.isnat(dates[mask])] = len(rates) - 1
+            result[mask] = amounts[mask] * rates[position]
+
+        return np.round(result, 2)
+
+
+def get_fx_table():
+    """FX table loaded from FX_RATES_PATH, reloaded only when the file changes"""
+    path = getattr(settings, 'FX_RATES_PATH', None)
+    if not path or not os.path.exists(path):
+        return FxTable(pd.DataFrame({'date': pd.Series(dtype='datetime64[ns]'), 'currency': [], 'rate': []}))
+    stat = os.stat(path)
+    key = (path, stat.st_mtime, stat.st_size)
+    if key not in _fx_table_cache:
+        _fx_table_cache.clear()
+        _fx_table_cache[key] = FxTable.from_csv(path)
+        logger.info(f"Loaded FX rates for {len(_fx_table_cache[key].rates)} currencies from {path}")
+    return _fx_table_cache[key]
+
+
+def to_base_amounts(amounts, currencies, dates):
+    """Amounts in the base currency as a float array (NaN where no rate is known)"""
+    return get_fx_table().convert(amounts, currencies, dates)
+
+
+def populate_amount_base(txn):
+    """Fill txn.amount_base from amount/currency/date; left empty when no rate is known"""
+    if txn.amount is None or txn.date is None:
+        txn.amount_base = None
+        return txn
+    converted = to_base_amounts([float(txn.amount)], [txn.currency], [txn.date])[0]
+    txn.amount_base = None if np.isnan(converted) else Decimal(str(converted)).quantize(Decimal('0.01'))
+    return txn
+
+
+def base_amount(txn):
+    """Amount used by rules: base-currency amount, or the raw amount when it couldn't be converted"""
+    return txn.amount_base if txn.amount_base is not None else txn.amount
@@ -0,0 +1,249 @@
+# api/ingest.py
+import logging
+from decimal import Decimal
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Transaction
+from .fx import base_currency, to_base_amounts
+from .ip_utils import parse_ip, populate_ip_fields
+from .merchants import canonicalize_merchant, canonicalize_series
+from .stats_cache import bump_stats_version
+from .cleansing import (
+    CleansingStage, ExternalDedupe, coalesce_columns, normalize_columns, record_transactions_added,
+    CHUNK_SIZE, MERCHANT_COLUMNS, CARD_COLUMNS, IP_COLUMNS,
+)
+
+logger = logging.getLogger('api')
+
+# Rows parsed by an upload preview (only the head of the file is read)
+PREVIEW_ROWS = 20
+MAX_PREVIEW_ROWS = 200
+
+# Transaction field -> upload columns it is read from, in fallback order
+FIELD_COLUMNS = {
+    'transaction_id': ['transaction_id'],
+    'date': ['date'],
+    'amount': ['amount'],
+    'currency': ['currency'],
+    'merchant': MERCHANT_COLUMNS,
+    'card_number': CARD_COLUMNS,
+    'ip_address': IP_COLUMNS,
+}
+
+
+def iter_csv_chunks(source, chunk_size=CHUNK_SIZE):
+    """Read a CSV as string columns, chunk_size rows at a time"""
+    return pd.read_csv(source, dtype=str, keep_default_na=False, chunksize=chunk_size)
+
+
+def _aware(value):
+    """Naive CSV timestamps are taken to be in the default time zone"""
+    return timezone.make_aware(value) if timezone.is_naive(value) else value
+
+
+def chunk_to_transactions(chunk, user=None):
+    """Build unsaved Transaction objects from a cleansed chunk (index = row number in the file)"""
+    now = timezone.now()
+    base_timestamp = now.timestamp()
+    columns = chunk.columns
+
+    dates = chunk['date'] if 'date' in columns else pd.Series(pd.NaT, index=chunk.index)
+    amounts = chunk['amount'] if 'amount' in columns else pd.Series(float('nan'), index=chunk.index)
+    currencies = (
+        chunk['currency'].str[:3].replace('', base_currency())
+        if 'currency' in columns else pd.Series(base_currency(), index=chunk.index)
+    )
+    # One vectorized FX conversion per chunk (missing dates use the latest rate, like date=now below)
+    base_amounts = to_base_amounts(amounts.fillna(0), currencies, dates)
+    csv_ids = (
+        chunk['transaction_id'].astype(str).str.strip().str[:80]  # Leave room for user suffix
+        if 'transaction_id' in columns else pd.Series('', index=chunk.index)
+    )
+    merchants = coalesce_columns(chunk, MERCHANT_COLUMNS).str[:200]
+    canonical_merchants = canonicalize_series(merchants)
+    cards = coalesce_columns(chunk, CARD_COLUMNS).str[:20]
+    ips = coalesce_columns(chunk, IP_COLUMNS)
+
+    user_suffix = f"-U{user.id}" if user else ""
+    transactions = []
+    for index, date_val, amount_val, base_amount, currency, csv_id, merchant, canonical_merchant, card, ip in zip(
+        chunk.index, dates, amounts, base_amounts, currencies, csv_ids, merchants, canonical_merchants, cards, ips
+    ):
+        if csv_id:
+            # Use CSV transaction_id but append user ID to make it user-specific
+            transaction_id = f"{csv_id}{user_suffix}"
+        else:
+            # Generate a unique ID that includes timestamp and row index to ensure uniqueness
+            transaction_id = f"AUTO-{base_timestamp}-{index}-{user.id if user else 0}"
+
+        parsed_ip = parse_ip(ip)
+        txn = Transaction(
+            user=user,
+            transaction_id=transaction_id,
+            amount=Decimal('0.00') if pd.isna(amount_val) else Decimal(str(float(amount_val))),
+            amount_base=None if np.isnan(base_amount) else Decimal(str(base_amount)),
+            currency=currency,
+            date=now if pd.isna(date_val) else _aware(date_val.to_pydatetime()),
+            merchant=merchant or 'Unknown Merchant',
+            canonical_merchant=canonical_merchant,
+            card_number=card or 'N/A',
+            ip_address=str(parsed_ip) if parsed_ip is not None else None,
+            status='pending',
+            is_fraud=False,
+        )
+        # bulk_create skips save(), so fill the normalized IP columns here
+        populate_ip_fields(txn)
+        transactions.append(txn)
+    return transactions
+
+
+def plaid_to_transactions(records, user=None):
+    """Build unsaved Transaction objects from Plaid transaction records, one FX conversion per batch"""
+    currencies = [
+        (record['iso_currency_code'] or record['unofficial_currency_code'] or base_currency())[:3].upper()
+        for record in records
+    ]
+    # Plaid dates are calendar days: take them as midnight in the default time zone
+    dates = [_aware(pd.Timestamp(record['date']).to_pydatetime()) for record in records]
+    base_amounts = to_base_amounts([float(record['amount']) for record in records], currencies, dates)
+    return [
+        Transaction(
+            user=user,
+            transaction_id=record['transaction_id'],
+            amount=Decimal(str(record['amount'])),
+            amount_base=None if np.isnan(base_amount) else Decimal(str(base_amount)),
+            currency=currency,
+            date=date,
+            merchant=record['name'],
+            canonical_merchant=canonicalize_merchant(record['name']),
+            status='pending',
+        )
+        for record, currency, date, base_amount in zip(records, currencies, dates, base_amounts)
+    ]
+
+
+def insert_new_transactions(transactions, user=None):
+    """Bulk insert transactions whose ids the user doesn't already have; returns rows inserted"""
+    if not transactions:
+        return 0
+    existing_ids = set(
+        Transaction.objects.filter(
+            user=user,
+            transaction_id__in=[t.transaction_id for t in transactions]
+        ).values_list('transaction_id', flat=True)
+    )
+    new_transactions = [t for t in transactions if t.transaction_id not in existing_ids]
+    if new_transactions:
+        Transaction.objects.bulk_create(new_transactions, ignore_conflicts=True)
+    return len(new_transactions)
+
+
+def should_spill(size_bytes):
+    """Whether an upload of this size should be deduped on disk instead of in memory"""
+    threshold = getattr(settings, 'DEDUPE_SPILL_THRESHOLD_BYTES', 512 * 1024 * 1024)
+    return size_bytes is not None and size_bytes > threshold
+
+
+def ingest_csv(source, user=None, chunk_size=CHUNK_SIZE, spill_to_disk=False):
+    """
+    ATC-02: Stream a CSV into the Transaction table
+    Each chunk is cleansed (deduped across chunks, normalized) as it is read,
+    then inserted, so memory stays at one chunk regardless of file size.
+    With spill_to_disk, dedupe runs through hash-partitioned temp files
+    (ExternalDedupe) so even the id hash set doesn't have to fit in memory.
+    """
+    if spill_to_disk:
+        stage = CleansingStage(dedupe=False)
+        with ExternalDedupe(chunk_size=chunk_size) as dedupe:
+            for raw_chunk in iter_csv_chunks(source, chunk_size):
+                dedupe.add(raw_chunk)
+            rows_added = _insert_chunks(dedupe.unique_chunks(), stage, user)
+            total_rows, duplicates_removed = dedupe.rows_in, dedupe.duplicates_removed
+    else:
+        stage = CleansingStage()
+        rows_added = _insert_chunks(iter_csv_chunks(source, chunk_size), stage, user)
+        total_rows, duplicates_removed = stage.rows_in, stage.duplicates_removed
+
+    record_transactions_added(user, rows_added)
+    if rows_added:
+        bump_stats_version(user)
+    logger.info(
+        f"Ingested {total_rows} rows: {duplicates_removed} duplicates dropped, {rows_added} inserted"
+    )
+    return {
+        "total_rows": total_rows,
+        "duplicates_removed": duplicates_removed,
+        "rows_added": rows_added,
+    }
+
+
+def _insert_chunks(chunks, stage, user):
+    """Cleanse and insert each chunk; returns rows inserted"""
+    rows_added = 0
+    for chunk_number, raw_chunk in enumerate(chunks):
+        chunk = stage.process(raw_chunk)
+        if chunk_number == 0:
+            logger.info(f"CSV columns detected: {list(chunk.columns)}")
+        rows_added += insert_new_transactions(chunk_to_transactions(chunk, user), user)
+    return rows_added
+
+
+def preview_csv(source, user=None, rows=PREVIEW_ROWS):
+    """
+    Infer the column mapping and parse sample rows from the head of a CSV
+    Uses the same header normalization, fallback columns and cleansing as
+    ingest_csv, but reads only the first rows and writes nothing.
+    """
+    head = pd.read_csv(source, dtype=str, keep_default_na=False, nrows=min(rows, MAX_PREVIEW_ROWS))
+    original_headers = [str(col) for col in head.columns]
+    normalized = normalize_columns(head.copy())
+    header_of = dict(zip(normalized.columns, original_headers))
+
+    mapping = {}
+    for field, candidates in FIELD_COLUMNS.items():
+        present = [col_name for col_name in candidates if col_name in normalized.columns]
+        mapping[field] = {
+            "column": header_of[present[0]] if present else None,
+            "fallbacks": [header_of[col_name] for col_name in present[1:]],
+        }
+    used = {col_name for candidates in FIELD_COLUMNS.values() for col_name in candidates}
+    unmapped = [header_of[col_name] for col_name in normalized.columns if col_name not in used]
+
+    warnings = []
+    if mapping['transaction_id']['column'] is None:
+        warnings.append("No transaction_id column: ids will be generated, so re-uploads are not deduplicated")
+    if mapping['amount']['column'] is None:
+        warnings.append("No amount column: amounts will be 0.00")
+    if mapping['date']['column'] is None:
+        warnings.append("No date column: the upload time will be used")
+
+    chunk = CleansingStage().process(head)
+    transactions = chunk_to_transactions(chunk, user)
+    if 'date' in chunk.columns and len(chunk) and chunk['date'].isna().any():
+        warnings.append(f"{int(chunk['date'].isna().sum())} sample rows have unparseable dates")
+    if 'amount' in chunk.columns and len(chunk) and chunk['amount'].isna().any():
+        warnings.append(f"{int(chunk['amount'].isna().sum())} sample rows have unparseable amounts")
+
+    return {
+        "columns": original_headers,
+        "mapping": mapping,
+        "unmapped_columns": unmapped,
+        "warnings": warnings,
+        "sample": [
+            {
+                "transaction_id": txn.transaction_id,
+                "date": txn.date.isoformat(),
+                "amount": float(txn.amount),
+                "currency": txn.currency,
+                "amount_base": float(txn.amount_base) if txn.amount_base is not None else None,
+                "merchant": txn.merchant,
+                "canonical_merchant": txn.canonical_merchant,
+                "card_number": f"****{txn.card_number[-4:]}" if txn.card_number != 'N/A' else 'N/A',
+                "ip_address": txn.ip_address,
+            }
+            for txn in transactions
+        ],
+    }
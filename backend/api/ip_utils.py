@@ -0,0 +1,89 @@
+# api/ip_utils.py
+import ipaddress
+
+# Subnet granularity used for velocity aggregation
+IPV4_SUBNET_PREFIX = 24
+IPV6_SUBNET_PREFIX = 48
+
+# Stored IP keys: the 128-bit integer as zero-padded hex, so keys compare (and
+# range-scan) in numeric order on every database without losing precision
+IP_KEY_LENGTH = 32
+
+
+def parse_ip(value):
+    """Parse an IP string into an ipaddress object, or None if invalid"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    if not value:
+        return None
+    try:
+        ip = ipaddress.ip_address(value)
+    except ValueError:
+        return None
+    # Treat IPv4-mapped IPv6 (::ffff:1.2.3.4) as the IPv4 address it wraps
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip
+
+
+def ip_to_int(value):
+    """Return the integer form of an IP address (IPv4 or IPv6), or None"""
+    ip = parse_ip(value)
+    return int(ip) if ip is not None else None
+
+
+def subnet_of(value):
+    """Return the /24 (IPv4) or /48 (IPv6) network address as an integer, or None"""
+    ip = parse_ip(value)
+    if ip is None:
+        return None
+    prefix = IPV4_SUBNET_PREFIX if ip.version == 4 else IPV6_SUBNET_PREFIX
+    host_bits = ip.max_prefixlen - prefix
+    return (int(ip) >> host_bits) << host_bits
+
+
+def subnet_range(value):
+    """Return the (first, last) integer bounds of the subnet containing an IP, or None"""
+    ip = parse_ip(value)
+    if ip is None:
+        return None
+    prefix = IPV4_SUBNET_PREFIX if ip.version == 4 else IPV6_SUBNET_PREFIX
+    network = subnet_of(ip)
+    return network, network + (1 << (ip.max_prefixlen - prefix)) - 1
+
+
+def int_to_ip(value):
+    """Convert an integer back into its IP string"""
+    if value is None:
+        return None
+    return str(ipaddress.ip_address(int(value)))
+
+
+def ip_key(value):
+    """Stored ip_int / ip_subnet key for an integer IP"""
+    return None if value is None else format(value, f'0{IP_KEY_LENGTH}x')
+
+
+def key_to_ip(key):
+    """Convert a stored key back into its IP string"""
+    return None if key is None else int_to_ip(int(key, 16))
+
+
+def subnet_key_range(value):
+    """Return the (first, last) stored keys of the subnet containing an IP, or None"""
+    bounds = subnet_range(value)
+    return None if bounds is None else (ip_key(bounds[0]), ip_key(bounds[1]))
+
+
+def populate_ip_fields(txn):
+    """Fill a transaction's normalized ip_int / ip_subnet key columns from ip_address"""
+    ip = parse_ip(txn.ip_address)
+    if ip is None:
+        txn.ip_int = None
+        txn.ip_subnet = None
+    else:
+        txn.ip_address = str(ip)
+        txn.ip_int = ip_key(int(ip))
+        txn.ip_subnet = ip_key(subnet_of(ip))
+    return txn
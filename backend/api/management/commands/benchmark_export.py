@@ -0,0 +1,64 @@
+# api/management/commands/benchmark_export.py
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.exports import stream_csv, stream_csv_copy, supports_copy_export, write_pdf
+from api.models import Transaction, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure CSV export throughput (rows/s) for the Python writer and, on PostgreSQL, COPY; "
+        "--pdf also times the paged PDF report per page"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', default=None, help="Export this user's transactions (default: all users)")
+        parser.add_argument('--repeat', type=int, default=3, help="Runs per mode; the best run is reported")
+        parser.add_argument('--pdf', action='store_true', help="Also render the PDF report once and report page timings")
+
+    def handle(self, *args, **options):
+        transactions = Transaction.objects.all()
+        if options['email']:
+            user = User.objects.filter(email=options['email']).first()
+            if user is None:
+                raise CommandError(f"No user with email {options['email']}")
+            transactions = transactions.filter(user=user)
+
+        rows = transactions.count()
+        if rows == 0:
+            raise CommandError("No transactions to export")
+
+        modes = [('python', stream_csv)]
+        if supports_copy_export():
+            modes.append(('copy', stream_csv_copy))
+        else:
+            self.stdout.write("COPY export needs PostgreSQL; benchmarking the Python writer only")
+
+        results = {}
+        for name, stream in modes:
+            best = None
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                size = sum(len(block) for block in stream(transactions))
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            results[name] = rows / best
+            self.stdout.write(f"{name:>6}: {rows} rows, {size / 1e6:.1f} MB in {best:.2f}s ({rows / best:,.0f} rows/s)")
+
+        if 'copy' in results:
+            self.stdout.write(self.style.SUCCESS(f"COPY is {results['copy'] / results['python']:.1f}x the Python writer"))
+
+        if options['pdf']:
+            page_timings = []
+            start = time.perf_counter()
+            with open(os.devnull, 'wb') as target:
+                write_pdf(transactions, target, page_timings=page_timings)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"   pdf: {rows} rows, {len(page_timings)} pages in {elapsed:.2f}s "
+                f"(mean {1000 * sum(page_timings) / len(page_timings):.1f} ms/page, "
+                f"max {1000 * max(page_timings):.1f} ms/page)"
+            )
@@ -0,0 +1,28 @@
+# api/management/commands/rescore_transactions.py
+from django.core.management.base import BaseCommand
+
+from api.rescoring import rescore_history
+
+
+class Command(BaseCommand):
+    help = "Rescore transaction history after a rule or model change (resumable, throttled)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Rows per batch")
+        parser.add_argument('--rate', type=float, default=None, help="Max rows per second (default: unthrottled)")
+
+    def handle(self, *args, **options):
+        def report(progress):
+            self.stdout.write(
+                f"[job {progress['job_id']}] {progress['processed']}/{progress['total']} rows, "
+                f"ETA {progress['eta_seconds']}s"
+            )
+
+        job = rescore_history(
+            batch_size=options['batch_size'],
+            rows_per_second=options['rate'],
+            progress=report,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Rescored {job.processed_rows} transactions to {job.score_version}"
+        ))
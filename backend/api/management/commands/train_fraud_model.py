@@ -0,0 +1,31 @@
+# api/management/commands/train_fraud_model.py
+from django.core.management.base import BaseCommand, CommandError
+
+from api.model_training import train_model
+
+
+class Command(BaseCommand):
+    help = "Train the anomaly model from the Transaction table and install it as fraud_model.pkl"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help="Rows read per keyset batch")
+        parser.add_argument('--sample-size', type=int, default=200000, help="Max rows kept in memory for fitting")
+        parser.add_argument('--n-estimators', type=int, default=100, help="Trees in the IsolationForest")
+        parser.add_argument('--output-dir', default='models', help="Directory for versioned artifacts")
+
+    def handle(self, *args, **options):
+        try:
+            artifact = train_model(
+                batch_size=options['batch_size'],
+                sample_size=options['sample_size'],
+                n_estimators=options['n_estimators'],
+                output_dir=options['output_dir'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Model {artifact['version']} written to {artifact['path']}: "
+            f"{artifact['training_rows']} rows read, {artifact['sample_rows']} sampled, "
+            f"{artifact['duration_seconds']}s ({artifact['rows_per_second']} rows/s)"
+        ))
@@ -0,0 +1,83 @@
+# api/merchants.py
+import re
+from functools import lru_cache
+
+# Distinct merchant strings kept in the canonicalization cache (vocabulary << rows)
+MERCHANT_CACHE_SIZE = 50000
+
+# Canonical merchant id -> patterns matched against the cleaned, uppercased name
+MERCHANT_ALIASES = {
+    'amazon': [r'AMAZON', r'AMZN', r'AMZ\b'],
+    'apple': [r'APPLE\b', r'ITUNES'],
+    'google': [r'GOOGLE\b', r'GOOGLE\*'],
+    'netflix': [r'NETFLIX'],
+    'paypal': [r'PAYPAL'],
+    'spotify': [r'SPOTIFY'],
+    'starbucks': [r'STARBUCKS', r'SBUX'],
+    'uber': [r'UBER\b', r'UBER\s?EATS'],
+    'lyft': [r'LYFT'],
+    'walmart': [r'WAL-?MART', r'WM SUPERCENTER'],
+    'target': [r'TARGET\b'],
+    'costco': [r'COSTCO'],
+    'mcdonalds': [r"MC\s?DONALD'?S?"],
+    'shell': [r'SHELL\b'],
+}
+
+# Noise stripped before matching / slugging: payment-processor prefixes (SQ *JOES),
+# reference suffixes (AMAZON.COM*2K4), store numbers (#1234), long digit runs
+# and payment words
+_PROCESSOR_PREFIX = re.compile(r'^(SQ|TST|SP|PY|IC)\s?\*\s*')
+_REFERENCE_SUFFIX = re.compile(r'\*.*$')
+_STORE_NUMBER = re.compile(r'#\s*\w+|\b\d{3,}\b')
+_DOMAIN = re.compile(r'\.(COM|NET|ORG|CO\.UK|CO)\b')
+_NOISE_WORDS = re.compile(r'\b(MKTPLACE|MKTP|MARKETPLACE|PMTS?|PAYMENTS?|INC|LLC|LTD|CORP|CO|STORE|ONLINE|US|USA)\b')
+_NON_WORD = re.compile(r'[^A-Z0-9&]+')
+
+# All alias patterns compiled once into a single alternation; the named group
+# that matched identifies the canonical id
+_ALIAS_IDS = list(MERCHANT_ALIASES)
+_ALIAS_MATCHER = re.compile('|'.join(
+    f"(?P<m{index}>^(?:{'|'.join(MERCHANT_ALIASES[canonical])}))"
+    for index, canonical in enumerate(_ALIAS_IDS)
+))
+
+UNKNOWN_MERCHANT = 'unknown'
+
+
+def _clean(name):
+    """Uppercase and strip noise; returns (cleaned name, canonical id if an alias matched first)"""
+    cleaned = _PROCESSOR_PREFIX.sub('', str(name).upper().strip())
+    alias_match = _ALIAS_MATCHER.match(cleaned)
+    if alias_match:
+        return cleaned, _ALIAS_IDS[int(alias_match.lastgroup[1:])]
+    cleaned = _REFERENCE_SUFFIX.sub('', cleaned)
+    cleaned = _DOMAIN.sub(' ', cleaned)
+    cleaned = _STORE_NUMBER.sub(' ', cleaned)
+    cleaned = _NOISE_WORDS.sub(' ', cleaned)
+    return ' '.join(_NON_WORD.sub(' ', cleaned).split()), None
+
+
+@lru_cache(maxsize=MERCHANT_CACHE_SIZE)
+def canonicalize_merchant(name):
+    """
+    Canonical merchant id for a raw merchant string
+    "AMAZON MKTPLACE PMTS" and "Amazon.com*2K4" -> "amazon"; names without a
+    dictionary entry become a slug of their cleaned form ("Joe's Cafe #12" -> "joe-s-cafe").
+    """
+    if name is None or not str(name).strip() or str(name).strip() == 'Unknown Merchant':
+        return UNKNOWN_MERCHANT
+    cleaned, canonical = _clean(name)
+    if canonical:
+        return canonical
+    if not cleaned:
+        return UNKNOWN_MERCHANT
+    # Second pass: the cleaned name may now start with a known alias
+    alias_match = _ALIAS_MATCHER.match(cleaned)
+    if alias_match:
+        return _ALIAS_IDS[int(alias_match.lastgroup[1:])]
+    return cleaned.lower().replace(' ', '-').replace('&', 'and')[:100]
+
+
+def canonicalize_series(merchants):
+    """Canonical ids for a pandas Series of merchant names (each distinct name computed once)"""
+    return merchants.map(canonicalize_merchant)
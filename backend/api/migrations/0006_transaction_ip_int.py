@@ -0,0 +1,59 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:03
+
+import ipaddress
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+# Frozen copy of the IP normalization as of this migration (api.ip_utils has since changed)
+def populate_ip_fields(txn):
+    try:
+        ip = ipaddress.ip_address(str(txn.ip_address).strip())
+    except ValueError:
+        txn.ip_int = txn.ip_subnet = None
+        return txn
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    host_bits = ip.max_prefixlen - (24 if ip.version == 4 else 48)
+    txn.ip_int = Decimal(int(ip))
+    txn.ip_subnet = Decimal((int(ip) >> host_bits) << host_bits)
+    return txn
+
+
+def backfill_ip_fields(apps, schema_editor):
+    """Populate ip_int / ip_subnet for existing transactions in batches"""
+    Transaction = apps.get_model("api", "Transaction")
+    batch = []
+    rows = Transaction.objects.filter(ip_address__isnull=False).only("id", "ip_address")
+    for txn in rows.iterator(chunk_size=2000):
+        batch.append(populate_ip_fields(txn))
+        if len(batch) >= 2000:
+            Transaction.objects.bulk_update(batch, ["ip_int", "ip_subnet"])
+            batch = []
+    if batch:
+        Transaction.objects.bulk_update(batch, ["ip_int", "ip_subnet"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_convert_auditlog_user_field'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='ip_int',
+            field=models.DecimalField(blank=True, db_index=True, decimal_places=0, max_digits=39, null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='ip_subnet',
+            field=models.DecimalField(blank=True, db_index=True, decimal_places=0, max_digits=39, null=True),
+        ),
+        migrations.RunPython(
+            code=backfill_ip_fields,
+            reverse_code=migrations.RunPython.noop,
+        ),
+    ]
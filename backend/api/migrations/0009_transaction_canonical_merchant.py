@@ -0,0 +1,97 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:17
+
+import re
+from functools import lru_cache
+
+from django.db import migrations, models
+
+# Frozen copy of api.merchants.canonicalize_merchant as of this migration, so later
+# dictionary or rule changes don't alter what this backfill writes
+MERCHANT_ALIASES = {
+    'amazon': [r'AMAZON', r'AMZN', r'AMZ\b'],
+    'apple': [r'APPLE\b', r'ITUNES'],
+    'google': [r'GOOGLE\b', r'GOOGLE\*'],
+    'netflix': [r'NETFLIX'],
+    'paypal': [r'PAYPAL'],
+    'spotify': [r'SPOTIFY'],
+    'starbucks': [r'STARBUCKS', r'SBUX'],
+    'uber': [r'UBER\b', r'UBER\s?EATS'],
+    'lyft': [r'LYFT'],
+    'walmart': [r'WAL-?MART', r'WM SUPERCENTER'],
+    'target': [r'TARGET\b'],
+    'costco': [r'COSTCO'],
+    'mcdonalds': [r"MC\s?DONALD'?S?"],
+    'shell': [r'SHELL\b'],
+}
+_PROCESSOR_PREFIX = re.compile(r'^(SQ|TST|SP|PY|IC)\s?\*\s*')
+_REFERENCE_SUFFIX = re.compile(r'\*.*$')
+_STORE_NUMBER = re.compile(r'#\s*\w+|\b\d{3,}\b')
+_DOMAIN = re.compile(r'\.(COM|NET|ORG|CO\.UK|CO)\b')
+_NOISE_WORDS = re.compile(r'\b(MKTPLACE|MKTP|MARKETPLACE|PMTS?|PAYMENTS?|INC|LLC|LTD|CORP|CO|STORE|ONLINE|US|USA)\b')
+_NON_WORD = re.compile(r'[^A-Z0-9&]+')
+_ALIAS_IDS = list(MERCHANT_ALIASES)
+_ALIAS_MATCHER = re.compile('|'.join(
+    f"(?P<m{index}>^(?:{'|'.join(MERCHANT_ALIASES[canonical])}))"
+    for index, canonical in enumerate(_ALIAS_IDS)
+))
+
+
+@lru_cache(maxsize=50000)
+def canonicalize_merchant(name):
+    if name is None or not str(name).strip() or str(name).strip() == 'Unknown Merchant':
+        return 'unknown'
+    cleaned = _PROCESSOR_PREFIX.sub('', str(name).upper().strip())
+    alias_match = _ALIAS_MATCHER.match(cleaned)
+    if alias_match:
+        return _ALIAS_IDS[int(alias_match.lastgroup[1:])]
+    cleaned = _REFERENCE_SUFFIX.sub('', cleaned)
+    cleaned = _DOMAIN.sub(' ', cleaned)
+    cleaned = _STORE_NUMBER.sub(' ', cleaned)
+    cleaned = _NOISE_WORDS.sub(' ', cleaned)
+    cleaned = ' '.join(_NON_WORD.sub(' ', cleaned).split())
+    if not cleaned:
+        return 'unknown'
+    alias_match = _ALIAS_MATCHER.match(cleaned)
+    if alias_match:
+        return _ALIAS_IDS[int(alias_match.lastgroup[1:])]
+    return cleaned.lower().replace(' ', '-').replace('&', 'and')[:100]
+
+
+def backfill_canonical_merchant(apps, schema_editor):
+    """
+    Fill canonical_merchant in id-ordered batches with one bulk UPDATE per batch
+    (canonicalize_merchant is cached per distinct string, so repeats cost nothing)
+    """
+    Transaction = apps.get_model("api", "Transaction")
+    last_id = 0
+    while True:
+        batch = list(Transaction.objects.filter(id__gt=last_id).order_by("id").only("id", "merchant")[:2000])
+        if not batch:
+            return
+        last_id = batch[-1].id
+        for txn in batch:
+            txn.canonical_merchant = canonicalize_merchant(txn.merchant)
+        Transaction.objects.bulk_update(batch, ["canonical_merchant"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_cleansingstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='canonical_merchant',
+            field=models.CharField(blank=True, db_index=True, max_length=100, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'canonical_merchant'], name='api_transac_user_id_a493a9_idx'),
+        ),
+        migrations.RunPython(
+            code=backfill_canonical_merchant,
+            reverse_code=migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_transaction_canonical_merchant'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cleansingstate',
+            name='duplicates_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cleansingstate',
+            name='last_cleansed',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='cleansingstate',
+            name='stats_refreshed_at',
+            field=models.DateTimeField(blank=True, help_text='Last exact recount; empty when stale', null=True),
+        ),
+        migrations.AddField(
+            model_name='cleansingstate',
+            name='total_transactions',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:20
+
+import math
+import os
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Frozen copy of api.fx conversion as of this migration: latest rate on or before
+# each date (earliest rate before the table starts), NaN for unknown currencies
+def load_rates():
+    path = getattr(settings, 'FX_RATES_PATH', None)
+    if not path or not os.path.exists(path):
+        return {}
+    rates = pd.read_csv(path, dtype={'currency': str})
+    rates['currency'] = rates['currency'].str.upper().str.strip()
+    rates['date'] = pd.to_datetime(rates['date'])
+    table = {}
+    for currency, rows in rates.groupby('currency'):
+        rows = rows.sort_values('date')
+        table[currency] = (rows['date'].to_numpy(dtype='datetime64[ns]'), rows['rate'].to_numpy(dtype=float))
+    return table
+
+
+def to_base_amounts(rates, amounts, currencies, dates):
+    amounts = np.asarray(amounts, dtype=float)
+    currencies = pd.Series(currencies, dtype=object).fillna('').astype(str).str.upper().str.strip().to_numpy()
+    dates = pd.to_datetime(pd.Series(dates), utc=True).dt.tz_localize(None).to_numpy(dtype='datetime64[ns]')
+    result = np.full(len(amounts), np.nan)
+    is_base = (currencies == getattr(settings, 'BASE_CURRENCY', 'USD')) | (currencies == '')
+    result[is_base] = amounts[is_base]
+    for currency in np.unique(currencies[~is_base]):
+        if currency not in rates:
+            continue
+        mask = currencies == currency
+        rate_dates, currency_rates = rates[currency]
+        position = np.clip(np.searchsorted(rate_dates, dates[mask], side='right') - 1, 0, len(currency_rates) - 1)
+        position[np.isnat(dates[mask])] = len(currency_rates) - 1
+        result[mask] = amounts[mask] * currency_rates[position]
+    return np.round(result, 2)
+
+
+def backfill_amount_base(apps, schema_editor):
+    """Convert existing amounts in batches, one vectorized conversion per batch"""
+    Transaction = apps.get_model("api", "Transaction")
+    rates = load_rates()
+    last_id = 0
+    while True:
+        batch = list(Transaction.objects.filter(id__gt=last_id).order_by("id").only("id", "amount", "currency", "date")[:2000])
+        if not batch:
+            return
+        last_id = batch[-1].id
+        converted = to_base_amounts(
+            rates, [float(t.amount) for t in batch], [t.currency for t in batch], [t.date for t in batch]
+        )
+        for txn, value in zip(batch, converted):
+            txn.amount_base = None if math.isnan(value) else Decimal(str(value)).quantize(Decimal("0.01"))
+        Transaction.objects.bulk_update(batch, ["amount_base"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_cleansingstate_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='amount_base',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True),
+        ),
+        migrations.RunPython(
+            code=backfill_amount_base,
+            reverse_code=migrations.RunPython.noop,
+        ),
+    ]
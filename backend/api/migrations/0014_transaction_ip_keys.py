@@ -0,0 +1,69 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:52
+
+import ipaddress
+
+from django.db import migrations, models
+
+
+# Frozen copy of the key format as of this migration (see api.ip_utils.populate_ip_fields)
+def ip_keys(value):
+    """(ip_int, ip_subnet) 32-char hex keys for an IP string, or (None, None)"""
+    try:
+        ip = ipaddress.ip_address(str(value).strip())
+    except ValueError:
+        return None, None
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    host_bits = ip.max_prefixlen - (24 if ip.version == 4 else 48)
+    return format(int(ip), '032x'), format((int(ip) >> host_bits) << host_bits, '032x')
+
+
+def backfill_ip_keys(apps, schema_editor):
+    """Recompute the hex IP keys from ip_address in id-ordered batches"""
+    Transaction = apps.get_model("api", "Transaction")
+    last_id = 0
+    while True:
+        batch = list(
+            Transaction.objects.filter(id__gt=last_id, ip_address__isnull=False)
+            .order_by("id").only("id", "ip_address")[:2000]
+        )
+        if not batch:
+            return
+        last_id = batch[-1].id
+        for txn in batch:
+            txn.ip_int, txn.ip_subnet = ip_keys(txn.ip_address)
+        Transaction.objects.bulk_update(batch, ["ip_int", "ip_subnet"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_dailysummary'),
+    ]
+
+    # The old numeric values can't be cast to keys (and lost precision on SQLite),
+    # so the columns are recreated and refilled from ip_address
+    operations = [
+        migrations.RemoveField(
+            model_name='transaction',
+            name='ip_int',
+        ),
+        migrations.RemoveField(
+            model_name='transaction',
+            name='ip_subnet',
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='ip_int',
+            field=models.CharField(blank=True, db_index=True, max_length=32, null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='ip_subnet',
+            field=models.CharField(blank=True, db_index=True, max_length=32, null=True),
+        ),
+        migrations.RunPython(
+            code=backfill_ip_keys,
+            reverse_code=migrations.RunPython.noop,
+        ),
+    ]
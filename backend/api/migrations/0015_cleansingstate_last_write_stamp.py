@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_transaction_ip_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cleansingstate',
+            name='last_write_stamp',
+            field=models.DateTimeField(blank=True, help_text='updated_at given to rows the last run rewrote', null=True),
+        ),
+    ]
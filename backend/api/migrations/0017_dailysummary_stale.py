@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_reportartifact_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailysummary',
+            name='stale',
+            field=models.BooleanField(default=False),
+        ),
+    ]
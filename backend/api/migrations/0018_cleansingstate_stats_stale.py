@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_dailysummary_stale'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cleansingstate',
+            name='stats_stale',
+            field=models.BooleanField(default=False, help_text="Set by writes whose effect isn't known; cleared by the next recount"),
+        ),
+        migrations.AlterField(
+            model_name='cleansingstate',
+            name='stats_refreshed_at',
+            field=models.DateTimeField(blank=True, help_text='Last exact recount; empty until first built', null=True),
+        ),
+    ]
@@ -1,6 +1,10 @@
 from django.db import models
 from django.utils import timezone
 
+from .ip_utils import populate_ip_fields
+from .fx import populate_amount_base
+from .merchants import canonicalize_merchant
+
 
 class Transaction(models.Model):
     """Main transaction model with all required fields"""
@@ -12,12 +16,20 @@ class Transaction(models.Model):
     # Core transaction fields
     transaction_id = models.CharField(max_length=100, db_index=True)
     amount = models.DecimalField(max_digits=12, decimal_places=2)
+    # Amount converted to settings.BASE_CURRENCY at the transaction date (empty when no rate is known)
+    amount_base = models.DecimalField(max_digits=14, decimal_places=2, null=True, blank=True)
     date = models.DateTimeField(db_index=True)
     merchant = models.CharField(max_length=200)
+    # Canonical merchant id ("amazon" for "AMAZON MKTPLACE PMTS"), for per-merchant aggregation
+    canonical_merchant = models.CharField(max_length=100, null=True, blank=True, db_index=True)
     card_number = models.CharField(max_length=20)
 
     # Additional context fields
     ip_address = models.GenericIPAddressField(null=True, blank=True)
+    # Normalized IP (IPv4 or IPv6) and its /24 or /48 network as zero-padded 128-bit hex
+    # (ip_utils.ip_key), exact on every database and range-scannable in numeric order
+    ip_int = models.CharField(max_length=32, null=True, blank=True, db_index=True)
+    ip_subnet = models.CharField(max_length=32, null=True, blank=True, db_index=True)
     device_id = models.CharField(max_length=100, null=True, blank=True)
     country = models.CharField(max_length=2, default='US')
     currency = models.CharField(max_length=3, default='USD')
@@ -28,6 +40,7 @@ class Transaction(models.Model):
     is_fraud = models.BooleanField(default=False, db_index=True)
     fraud_reasons = models.TextField(null=True, blank=True)
     reason_code = models.TextField(null=True, blank=True, help_text="Detailed fraud detection reasons")
+    score_version = models.CharField(max_length=64, null=True, blank=True, help_text="Rules/model version that produced risk_score")
 
     # Status tracking
     STATUS_CHOICES = [
@@ -48,10 +61,19 @@ class Transaction(models.Model):
             models.Index(fields=['user', 'date']),
             models.Index(fields=['user', 'status']),
             models.Index(fields=['user', 'is_fraud']),
+            models.Index(fields=['user', 'updated_at']),
+            models.Index(fields=['user', 'canonical_merchant']),
         ]
         # Unique constraint: transaction_id should be unique per user
         unique_together = [['user', 'transaction_id']]
 
+    def save(self, *args, **kwargs):
+        # Keep normalized IP, amount and merchant columns in sync with their raw values
+        populate_ip_fields(self)
+        populate_amount_base(self)
+        self.canonical_merchant = canonicalize_merchant(self.merchant)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.transaction_id} - ${self.amount} - {self.status}"
 
@@ -114,6 +136,39 @@ class SystemMetrics(models.Model):
         return f"Metrics - {self.timestamp.strftime('%Y-%m-%d %H:%M:%S')}"
 
 
+class RescoreJob(models.Model):
+    """Checkpoint for a full-history rescoring run (resumable after restarts)"""
+
+    STATUS_CHOICES = [
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    # Scoring version this job rescores transactions to
+    score_version = models.CharField(max_length=64, db_index=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='running')
+
+    # Keyset checkpoint - highest Transaction.id already processed
+    last_id = models.BigIntegerField(default=0)
+
+    # Progress
+    total_rows = models.IntegerField(default=0)
+    processed_rows = models.IntegerField(default=0)
+    rows_per_second = models.FloatField(null=True, blank=True, help_text="Throttle limit, empty for unthrottled")
+    error = models.TextField(null=True, blank=True)
+
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-started_at']
+
+    def __str__(self):
+        return f"Rescore {self.score_version} - {self.processed_rows}/{self.total_rows} - {self.status}"
+
+
 class User(models.Model):
     """User model for authentication"""
     email = models.EmailField(unique=True, db_index=True)
@@ -166,4 +221,92 @@ class RefreshToken(models.Model):
         ]
 
     def __str__(self):
-        return f"Refresh token for {self.user.email}"
\ No newline at end of file
+        return f"Refresh token for {self.user.email}"
+
+
+class CleansingState(models.Model):
+    """
+    Per-user cleansing watermark - rows changed before it have already been cleansed
+    Also holds the materialized cleansing statistics served by /cleansing/stats.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cleansing_state')
+    watermark = models.DateTimeField(null=True, blank=True, help_text="Start time of the last completed cleansing run")
+    last_write_stamp = models.DateTimeField(null=True, blank=True, help_text="updated_at given to rows the last run rewrote")
+
+    # Materialized statistics, maintained by uploads and cleansing runs
+    total_transactions = models.IntegerField(default=0)
+    duplicates_count = models.IntegerField(default=0)
+    last_cleansed = models.DateTimeField(null=True, blank=True)
+    stats_refreshed_at = models.DateTimeField(null=True, blank=True, help_text="Last exact recount; empty until first built")
+    stats_stale = models.BooleanField(default=False, help_text="Set by writes whose effect isn't known; cleared by the next recount")
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Cleansing state for {self.user.email}"
+
+
+class ReportArtifact(models.Model):
+    """
+    A rendered report file, reused for identical requests
+    Keyed by user, format, filter parameters and the user's data version, so
+    any change to the user's transactions produces a new artifact.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='report_artifacts')
+    report_format = models.CharField(max_length=10)
+    params = models.JSONField(default=dict, blank=True)
+    params_hash = models.CharField(max_length=40)
+    data_version = models.CharField(max_length=64)
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+    file_path = models.CharField(max_length=500, null=True, blank=True)
+    size_bytes = models.BigIntegerField(null=True, blank=True)
+    row_count = models.IntegerField(null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Last status change; pending/running artifacts not touched for too long are stale
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        unique_together = [['user', 'report_format', 'params_hash', 'data_version']]
+
+    def __str__(self):
+        return f"{self.report_format} report for {self.user.email} - {self.status}"
+
+
+class DailySummary(models.Model):
+    """
+    Per-user, per-day transaction aggregates backing the scheduled summary reports
+    Monthly figures are sums of these rows, so a month is never rescanned.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_summaries')
+    day = models.DateField()
+
+    total = models.IntegerField(default=0)
+    fraud = models.IntegerField(default=0)
+    pending = models.IntegerField(default=0)
+    approved = models.IntegerField(default=0)
+    rejected = models.IntegerField(default=0)
+    # Sum of amounts in settings.BASE_CURRENCY
+    amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    computed_at = models.DateTimeField()
+    # Set when rows of this day are deleted; the next refresh recomputes the day
+    stale = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ['day']
+        unique_together = [['user', 'day']]
+
+    def __str__(self):
+        return f"{self.user.email} {self.day}: {self.total} transactions"
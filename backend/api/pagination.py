@@ -0,0 +1,64 @@
+# api/pagination.py
+import base64
+import datetime
+import json
+
+from django.db.models import Q
+
+
+def encode_cursor(position, direction):
+    """Opaque cursor for a (timestamp, id) position; direction is 'next' or 'prev'"""
+    value, pk = position
+    payload = json.dumps({'v': value.isoformat(), 'id': pk, 'd': direction}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """((timestamp, id), direction) from encode_cursor(); raises ValueError for a malformed cursor"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        position = (datetime.datetime.fromisoformat(payload['v']), int(payload['id']))
+        direction = payload['d']
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+    if direction not in ('next', 'prev'):
+        raise ValueError("Invalid cursor")
+    return position, direction
+
+
+def keyset_page(queryset, field, page_size, cursor=None):
+    """
+    One page of queryset, newest first, ordered by (field, id)
+    Seeks from the cursor position with a range predicate instead of OFFSET, so
+    every page costs the same on the (user, field) index however deep it is.
+    Returns (items, next_cursor, prev_cursor); a cursor is None at either end.
+    """
+    position, direction = decode_cursor(cursor) if cursor else (None, 'next')
+
+    if position is None:
+        page = queryset.order_by(f'-{field}', '-id')
+    elif direction == 'next':
+        value, pk = position
+        page = queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': pk})).order_by(f'-{field}', '-id')
+    else:
+        value, pk = position
+        page = queryset.filter(Q(**{f'{field}__gt': value}) | Q(**{field: value, 'id__gt': pk})).order_by(field, 'id')
+
+    # One extra row tells whether another page exists in the direction of travel
+    items = list(page[:page_size + 1])
+    has_more = len(items) > page_size
+    items = items[:page_size]
+    if direction == 'prev':
+        items.reverse()
+
+    if not items:
+        return items, None, None
+    first = (getattr(items[0], field), items[0].id)
+    last = (getattr(items[-1], field), items[-1].id)
+    if direction == 'next':
+        next_cursor = encode_cursor(last, 'next') if has_more else None
+        prev_cursor = encode_cursor(first, 'prev') if position is not None else None
+    else:
+        next_cursor = encode_cursor(last, 'next')
+        prev_cursor = encode_cursor(first, 'prev') if has_more else None
+    return items, next_cursor, prev_cursor
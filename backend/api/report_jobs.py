@@ -0,0 +1,279 @@
+# api/report_jobs.py
+import calendar
+import datetime
+import hashlib
+import json
+import logging
+import os
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import Count, Exists, Max, OuterRef
+from django.utils import timezone
+
+from .models import Transaction, ReportArtifact, DailySummary
+from .exports import (
+    export_summary, filter_transactions, stream_arrow, stream_csv, write_pdf, write_summary_csv,
+    write_summary_pdf, ARROW_FORMATS, SUMMARY_COLUMNS,
+)
+
+logger = logging.getLogger('api')
+
+REPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'pdf': ('application/pdf', 'pdf'),
+    **ARROW_FORMATS,
+}
+
+# Scheduled summary reports: periods and the formats pre-rendered for each
+SUMMARY_PERIODS = ('daily', 'monthly')
+SUMMARY_FORMATS = ('csv', 'pdf')
+
+
+def storage_dir():
+    return getattr(settings, 'REPORT_STORAGE_DIR', os.path.join(settings.BASE_DIR, 'reports'))
+
+
+def data_version(user):
+    """
+    Version of a user's transaction data: row count plus latest updated_at
+    Any insert, update or delete changes it (one aggregate on the (user, updated_at) index).
+    """
+    latest = Transaction.objects.filter(user=user).aggregate(rows=Count('pk'), updated=Max('updated_at'))
+    updated = latest['updated'].timestamp() if latest['updated'] else 0
+    return f"{latest['rows']}-{updated:.6f}"
+
+
+def params_hash(params):
+    return hashlib.sha1(json.dumps(params or {}, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def report_transactions(user, params):
+    """The transactions a report covers (params are parse_export_filters() output)"""
+    return filter_transactions(Transaction.objects.filter(user=user), params)
+
+
+def is_stale(artifact):
+    """
+    A pending artifact never picked up (enqueue failed, broker down) or a running one
+    whose worker died: untouched for longer than its status allows
+    """
+    if artifact.status == 'pending':
+        timeout = getattr(settings, 'REPORT_PENDING_TIMEOUT_SECONDS', 300)
+    elif artifact.status == 'running':
+        timeout = getattr(settings, 'CELERY_TASK_TIME_LIMIT', 3600)
+    else:
+        return False
+    return artifact.updated_at < timezone.now() - datetime.timedelta(seconds=timeout)
+
+
+def find_or_create_report(user, report_format, params=None, version=None):
+    """
+    Artifact for this (user, format, params, data version), creating a pending one if needed
+    Returns (artifact, created). Failed and stale artifacts (see is_stale) are reset to
+    pending with created=True, so the caller queues them again.
+    version overrides the user's data version (summary reports version their own rows).
+    """
+    if report_format not in REPORT_FORMATS:
+        raise ValueError(f"Unsupported report format: {report_format}")
+    params = params or {}
+    key = dict(
+        user=user, report_format=report_format, params_hash=params_hash(params),
+        data_version=version or data_version(user),
+    )
+
+    artifact = ReportArtifact.objects.filter(**key).first()
+    if artifact is not None:
+        if artifact.status == 'failed' or is_stale(artifact):
+            # Conditional reset: of several concurrent requests only one re-queues it
+            reset = ReportArtifact.objects.filter(
+                pk=artifact.pk, status=artifact.status, updated_at=artifact.updated_at
+            ).update(status='pending', error=None, updated_at=timezone.now())
+            artifact.refresh_from_db()
+            return artifact, bool(reset)
+        return artifact, False
+    try:
+        return ReportArtifact.objects.create(params=params, **key), True
+    except IntegrityError:
+        # Another request created the same artifact first
+        return ReportArtifact.objects.get(**key), False
+
+
+def render_report(artifact):
+    """
+    ATC-07: Render an artifact to local storage
+    Writes to a temp file and renames it, so a half-written report is never served.
+    Superseded artifacts (same user, format and params, older data) are deleted.
+    """
+    artifact.status = 'running'
+    artifact.save(update_fields=['status', 'updated_at'])
+
+    directory = os.path.join(storage_dir(), str(artifact.user_id))
+    os.makedirs(directory, exist_ok=True)
+    extension = REPORT_FORMATS[artifact.report_format][1]
+    path = os.path.join(directory, f"{artifact.params_hash}-{artifact.id}.{extension}")
+    tmp_path = f"{path}.tmp"
+
+    try:
+        transactions = report_transactions(artifact.user, artifact.params)
+        if artifact.params.get('period'):
+            row_count = _write_summary_report(artifact, tmp_path)
+        elif artifact.report_format == 'csv':
+            with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+                for block in stream_csv(transactions):
+                    f.write(block)
+            row_count = transactions.count()
+        elif artifact.report_format in ARROW_FORMATS:
+            with open(tmp_path, 'wb') as f:
+                for block in stream_arrow(transactions, artifact.report_format):
+                    f.write(block)
+            row_count = transactions.count()
+        else:
+            with open(tmp_path, 'wb') as f:
+                row_count = write_pdf(transactions, f)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        artifact.status = 'failed'
+        artifact.error = str(e)
+        artifact.finished_at = timezone.now()
+        artifact.save(update_fields=['status', 'error', 'finished_at', 'updated_at'])
+        logger.error(f"Report {artifact.id} failed: {str(e)}")
+        raise
+
+    artifact.status = 'ready'
+    artifact.file_path = path
+    artifact.size_bytes = os.path.getsize(path)
+    artifact.row_count = row_count
+    artifact.finished_at = timezone.now()
+    artifact.save(update_fields=['status', 'file_path', 'size_bytes', 'row_count', 'finished_at', 'updated_at'])
+
+    delete_superseded_reports(artifact)
+    return artifact
+
+
+def delete_superseded_reports(artifact):
+    """Remove older artifacts (and files) for the same user, format and params"""
+    superseded = ReportArtifact.objects.filter(
+        user_id=artifact.user_id,
+        report_format=artifact.report_format,
+        params_hash=artifact.params_hash,
+        created_at__lt=artifact.created_at,
+    ).exclude(status__in=['pending', 'running'])
+    for old in superseded:
+        if old.file_path and os.path.exists(old.file_path):
+            os.remove(old.file_path)
+    superseded.delete()
+
+
+def period_bounds(period, day):
+    """Inclusive (start, end) dates of the daily or monthly period containing day"""
+    if period == 'daily':
+        return day, day
+    if period == 'monthly':
+        return day.replace(day=1), day.replace(day=calendar.monthrange(day.year, day.month)[1])
+    raise ValueError(f"Unsupported period: {period}. Supported periods: {', '.join(SUMMARY_PERIODS)}")
+
+
+def summary_params(period, day):
+    start, end = period_bounds(period, day)
+    return {'period': period, 'start_date': start.isoformat(), 'end_date': end.isoformat()}
+
+
+def summarize_day(user, day, computed_at=None):
+    """Store one day's aggregates for a user (one conditional aggregate on the (user, date) index)"""
+    day_filter = {'start_date': day.isoformat(), 'end_date': day.isoformat()}
+    summary = export_summary(filter_transactions(Transaction.objects.filter(user=user), day_filter))
+    if summary['total'] == 0:
+        DailySummary.objects.filter(user=user, day=day).delete()
+        return None
+    summary, _ = DailySummary.objects.update_or_create(
+        user=user, day=day, defaults=dict(computed_at=computed_at or timezone.now(), stale=False, **summary)
+    )
+    return summary
+
+
+def mark_summaries_stale(transactions):
+    """
+    Flag the daily summaries covering these transactions for the next refresh
+    Call before deleting rows: a deleted row leaves no updated_at for refresh_daily_summaries to find.
+    """
+    return DailySummary.objects.filter(
+        Exists(transactions.filter(user=OuterRef('user'), date__date=OuterRef('day')))
+    ).update(stale=True)
+
+
+def refresh_daily_summaries(user):
+    """
+    Recompute the daily summaries whose transactions changed since the last refresh
+    Changed days come from the (user, updated_at) index, so a refresh costs one
+    aggregate per touched day rather than a rescan of the history. Returns the day count.
+    updated_at is stamped before commit, so the scan reaches SUMMARY_COMMIT_LAG_SECONDS
+    behind the last refresh for rows committed after it; re-summarizing those days is idempotent.
+    Days that lost rows to deletes are recomputed from their stale flag (see mark_summaries_stale).
+    """
+    started = timezone.now()
+    last_refresh = DailySummary.objects.filter(user=user).aggregate(last=Max('computed_at'))['last']
+    changed = Transaction.objects.filter(user=user)
+    if last_refresh is not None:
+        lag = datetime.timedelta(seconds=getattr(settings, 'SUMMARY_COMMIT_LAG_SECONDS', 60))
+        changed = changed.filter(updated_at__gte=last_refresh - lag)
+    days = set(changed.order_by().dates('date', 'day'))
+    days.update(DailySummary.objects.filter(user=user, stale=True).values_list('day', flat=True))
+    for day in sorted(days):
+        summarize_day(user, day, computed_at=started)
+    return len(days)
+
+
+def period_summary(user, period, day):
+    """
+    Per-day rows and totals for a period, built from stored daily summaries only
+    (monthly totals are the sum of the month's days)
+    """
+    start, end = period_bounds(period, day)
+    days = DailySummary.objects.filter(user=user, day__gte=start, day__lte=end)
+    rows = list(days.values(*[field for _, field in SUMMARY_COLUMNS]))
+    totals = {field: sum(row[field] for row in rows) for _, field in SUMMARY_COLUMNS if field != 'day'}
+    return rows, totals
+
+
+def summary_version(rows):
+    """Version of a summary report: identical figures reuse the rendered file"""
+    return 'summary-' + hashlib.sha1(json.dumps(rows, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _write_summary_report(artifact, path):
+    day = datetime.date.fromisoformat(artifact.params['start_date'])
+    period = artifact.params['period']
+    rows, totals = period_summary(artifact.user, period, day)
+    if artifact.report_format == 'csv':
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            return write_summary_csv(rows, f)
+    label = day.strftime('%B %Y') if period == 'monthly' else day.isoformat()
+    title = f"SecurePath {period.capitalize()} Summary: {label}"
+    with open(path, 'wb') as f:
+        return write_summary_pdf(rows, totals, title, f)
+
+
+def prerender_summary(user, period, day, report_format):
+    """
+    Render (or reuse) a user's summary report for the period containing day
+    Returns (artifact, rendered).
+    """
+    rows, _ = period_summary(user, period, day)
+    artifact, created = find_or_create_report(user, report_format, summary_params(period, day), version=summary_version(rows))
+    if created or artifact.status == 'pending':
+        render_report(artifact)
+        return artifact, True
+    return artifact, False
+
+
+def latest_summary_report(user, period, day, report_format):
+    """Most recent ready summary artifact for a period (an indexed lookup, no transaction queries)"""
+    return ReportArtifact.objects.filter(
+        user=user,
+        report_format=report_format,
+        params_hash=params_hash(summary_params(period, day)),
+        status='ready',
+    ).order_by('-created_at').first()
@@ -7,6 +7,7 @@ from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from .models import Transaction
+from .fx import base_currency
 
 
 def generate_csv_report(transactions):
@@ -19,6 +20,7 @@ def generate_csv_report(transactions):
             "Date": t.date.strftime('%Y-%m-%d %H:%M:%S') if t.date else "",
             "Merchant": t.merchant,
             "Amount": float(t.amount) if t.amount else 0,
+            f"Amount ({base_currency()})": float(t.amount_base) if t.amount_base is not None else None,
             "Risk Score": t.risk_score or 0,
             "Risk Level": t.risk_level,
             "Status": t.status,
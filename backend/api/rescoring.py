@@ -0,0 +1,114 @@
+# api/rescoring.py
+import logging
+import time
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Transaction, RescoreJob
+from .fraud_detection import load_ml_model, get_score_version, score_transactions
+from .stats_cache import bump_stats_version
+
+logger = logging.getLogger('api')
+
+
+def get_or_resume_job(score_version, rows_per_second=None):
+    """Resume the last unfinished job for this scoring version, or start a new one"""
+    job = RescoreJob.objects.filter(
+        score_version=score_version,
+        status__in=['running', 'failed'],
+    ).order_by('-started_at').first()
+
+    if job:
+        job.status = 'running'
+        job.error = None
+        job.rows_per_second = rows_per_second
+        job.save(update_fields=['status', 'error', 'rows_per_second', 'updated_at'])
+        logger.info(f"Resuming rescore job {job.id} from id {job.last_id}")
+        return job
+
+    total = Transaction.objects.exclude(score_version=score_version).count()
+    job = RescoreJob.objects.create(
+        score_version=score_version,
+        total_rows=total,
+        rows_per_second=rows_per_second,
+    )
+    logger.info(f"Started rescore job {job.id}: {total} transactions to rescore to {score_version}")
+    return job
+
+
+def rescore_history(batch_size=500, rows_per_second=None, progress=None, sleep=time.sleep):
+    """
+    Rescore every transaction whose score_version is out of date
+    - Walks history in id (keyset) order in bounded batches
+    - Checkpoints the last processed id after every batch
+    - Sleeps between batches to stay under rows_per_second
+    """
+    score_version = get_score_version()
+    model = load_ml_model()
+    job = get_or_resume_job(score_version, rows_per_second)
+
+    run_start = time.monotonic()
+    run_processed = 0
+
+    try:
+        while True:
+            batch = list(
+                Transaction.objects.filter(id__gt=job.last_id)
+                .exclude(score_version=score_version)
+                .order_by('id')[:batch_size]
+            )
+            if not batch:
+                break
+
+            now = timezone.now()
+            for txn, (final_score, reason_text) in zip(batch, score_transactions(batch, model)):
+                txn.risk_score = final_score
+                txn.reason_code = reason_text
+                txn.score_version = score_version
+                txn.updated_at = now  # bulk_update skips auto_now; report data versions key on it
+
+            # Scores and checkpoint commit together so a restart never skips rows
+            with transaction.atomic():
+                Transaction.objects.bulk_update(batch, ['risk_score', 'reason_code', 'score_version', 'updated_at'])
+                job.last_id = batch[-1].id
+                job.processed_rows += len(batch)
+                job.save(update_fields=['last_id', 'processed_rows', 'updated_at'])
+                bump_stats_version(*{txn.user_id for txn in batch})
+
+            run_processed += len(batch)
+            elapsed = time.monotonic() - run_start
+            rate = run_processed / elapsed if elapsed > 0 else None
+            remaining = max(0, job.total_rows - job.processed_rows)
+            eta = round(remaining / rate, 1) if rate else None
+
+            logger.info(
+                f"Rescore job {job.id}: {job.processed_rows}/{job.total_rows} rows "
+                f"({rate or 0:.0f} rows/s, ETA {eta}s)"
+            )
+            if progress:
+                progress({
+                    "job_id": job.id,
+                    "processed": job.processed_rows,
+                    "total": job.total_rows,
+                    "rows_per_second": rate,
+                    "eta_seconds": eta,
+                })
+
+            # Throttle: don't run ahead of the configured rate
+            if rows_per_second:
+                ahead = run_processed / rows_per_second - elapsed
+                if ahead > 0:
+                    sleep(ahead)
+
+    except Exception as e:
+        job.status = 'failed'
+        job.error = str(e)
+        job.save(update_fields=['status', 'error', 'updated_at'])
+        logger.error(f"Rescore job {job.id} failed at id {job.last_id}: {str(e)}")
+        raise
+
+    job.status = 'completed'
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'finished_at', 'updated_at'])
+    logger.info(f"Rescore job {job.id} completed: {job.processed_rows} rows rescored to {score_version}")
+    return job
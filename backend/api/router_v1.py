@@ -1,18 +1,31 @@
 # api/router_v1.py
 from ninja import Router, File, UploadedFile
 from django_ratelimit.decorators import ratelimit
-from django.views.decorators.cache import cache_page
 from api.auth import auth_bearer, token_query_auth
-import pandas as pd
-import io
-import csv
-from django.db.models import Sum, Count, Q
-from django.http import HttpResponse
+import os
+from django.db.models import Count, Q
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from django.utils import timezone
 from decimal import Decimal
 import logging
 
-from api.models import Transaction, SystemMetrics, AuditLog, User, OAuthAccount, RefreshToken
+from api.models import Transaction, SystemMetrics, AuditLog, User, OAuthAccount, RefreshToken, ReportArtifact
+from api.exports import (
+    stream_export_csv, stream_arrow, write_pdf, negotiate_compression, compress_stream,
+    parse_export_filters, filter_transactions,
+    ARROW_FORMATS, COMPRESSION_CODECS,
+)
+from api.report_jobs import (
+    REPORT_FORMATS, SUMMARY_FORMATS, SUMMARY_PERIODS, find_or_create_report, latest_summary_report, render_report,
+)
+from api.tasks import generate_report, refresh_cleansing_stats
+from api.fx import BASE_AMOUNT
+from api.pagination import keyset_page
+from api.stats_cache import bump_stats_version, get_dashboard_stats
+from api.ip_utils import subnet_key_range, key_to_ip
+from api.backtest import load_backtest_data, run_backtest
+from api.fraud_detection import score_cache
+from api.ingest import ingest_csv, plaid_to_transactions, preview_csv, should_spill, PREVIEW_ROWS
 from api.jwt_auth import (
     verify_password, get_password_hash, create_access_token, 
     create_refresh_token, verify_token
@@ -37,31 +50,23 @@ def status(request):
     }
 
 
+@router.get("/metrics/score-cache", auth=auth_bearer)
+def score_cache_metrics(request):
+    """ML score cache size and hit rate for this worker process"""
+    return score_cache.stats()
+
+
 @router.get("/dashboard/stats", auth=auth_bearer)
 def stats(request):
-    """Returns high-level statistics with caching - user-specific"""
+    """Returns high-level statistics, cached between writes - user-specific"""
     try:
         # Get current user from request (set by auth_bearer)
         current_user = request.auth if isinstance(request.auth, User) else None
         if not current_user:
             return JsonResponse({"error": "Authentication required"}, status=401)
         
-        # Filter transactions by user
-        user_transactions = Transaction.objects.filter(user=current_user)
-        total_txns = user_transactions.count()
-
-        aggregation = user_transactions.aggregate(
-            total_amount=Sum('amount'),
-            fraud_count=Count('pk', filter=Q(is_fraud=True)),
-            pending_count=Count('pk', filter=Q(status='pending'))
-        )
-
-        return {
-            "total_transactions": total_txns,
-            "fraud_detected": aggregation['fraud_count'] or 0,
-            "pending_review": aggregation['pending_count'] or 0,
-            "total_amount": float(aggregation['total_amount'] or 0)
-        }
+        # Cached per user; recomputed only after a write bumps the user's stats version
+        return get_dashboard_stats(current_user)
     except Exception as e:
         logger.error(f"Error fetching stats: {str(e)}")
         return JsonResponse({"error": "Failed to fetch statistics"}, status=500)
@@ -69,8 +74,16 @@ def stats(request):
 
 @router.get("/dashboard/transactions", auth=auth_bearer)
 @ratelimit(key='user', rate='100/m', method='GET')
-def transactions(request, page: int = 1, page_size: int = 10, status_filter: str = None):
-    """Returns paginated transactions with optional filtering - user-specific"""
+def transactions(
+    request, page: int = 1, page_size: int = 10, status_filter: str = None,
+    cursor: str = None, include_total: bool = None,
+):
+    """
+    Returns paginated transactions with optional filtering - user-specific
+    Pass next_cursor/prev_cursor back as cursor to page by (date, id) without OFFSET;
+    page > 1 without a cursor keeps the legacy OFFSET paging. The total is counted on
+    request (include_total), by default only for non-cursor requests.
+    """
     try:
         # Get current user from request
         current_user = request.auth if isinstance(request.auth, User) else None
@@ -92,15 +105,25 @@ def transactions(request, page: int = 1, page_size: int = 10, status_filter: str
             query = query.filter(status=status_filter)
 
         # Get total count for pagination
-        total_count = query.count()
+        if include_total is None:
+            include_total = cursor is None
+        total_count = query.count() if include_total else None
         
         # Get paginated results
-        txns = query.order_by('-date')[offset:offset + limit]
+        next_cursor = prev_cursor = None
+        if cursor or page == 1:
+            try:
+                txns, next_cursor, prev_cursor = keyset_page(query, 'date', page_size, cursor)
+            except ValueError as e:
+                return JsonResponse({"error": str(e)}, status=400)
+        else:
+            txns = query.order_by('-date', '-id')[offset:offset + limit]
 
         txn_list = [{
             "transaction_id": txn.transaction_id,
             "amount": float(txn.amount),
             "merchant": txn.merchant,
+            "canonical_merchant": txn.canonical_merchant,
             "status": txn.status,
             "fraud_score": float(txn.fraud_score or 0.0),
             "risk_score": float(txn.risk_score or 0.0),
@@ -113,17 +136,55 @@ def transactions(request, page: int = 1, page_size: int = 10, status_filter: str
             "total": total_count,
             "page": page,
             "page_size": page_size,
-            "total_pages": (total_count + page_size - 1) // page_size
+            "total_pages": (total_count + page_size - 1) // page_size if total_count is not None else None,
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor,
         }
     except Exception as e:
         logger.error(f"Error fetching transactions: {str(e)}")
         return JsonResponse({"error": "Failed to fetch transactions"}, status=500)
 
 
+@router.get("/dashboard/ip-velocity", auth=auth_bearer)
+def ip_velocity(request, group: str = 'ip', subnet: str = None, limit: int = 10):
+    """Top source IPs or /24 (IPv4) / /48 (IPv6) subnets by transaction count - user-specific"""
+    try:
+        current_user = request.auth if isinstance(request.auth, User) else None
+        if not current_user:
+            return JsonResponse({"error": "Authentication required"}, status=401)
+
+        limit = min(max(1, limit), 100)
+        column = 'ip_subnet' if group == 'subnet' else 'ip_int'
+        query = Transaction.objects.filter(user=current_user, ip_int__isnull=False)
+
+        # Drill into one subnet with a range scan on the IP key column
+        if subnet:
+            bounds = subnet_key_range(subnet)
+            if bounds is None:
+                return JsonResponse({"error": f"Invalid subnet address: {subnet}"}, status=400)
+            query = query.filter(ip_int__range=bounds)
+
+        rows = query.values(column).annotate(count=Count('pk')).order_by('-count')[:limit]
+
+        return {
+            "group": 'subnet' if column == 'ip_subnet' else 'ip',
+            "results": [{
+                "address": key_to_ip(row[column]),
+                "count": row['count'],
+            } for row in rows]
+        }
+    except Exception as e:
+        logger.error(f"Error fetching IP velocity: {str(e)}")
+        return JsonResponse({"error": "Failed to fetch IP velocity"}, status=500)
+
+
 @router.get("/audit-log", auth=auth_bearer)
 @ratelimit(key='user', rate='50/m', method='GET')
-def audit_log(request, page: int = 1, page_size: int = 20):
-    """Returns paginated audit logs - user-specific"""
+def audit_log(request, page: int = 1, page_size: int = 20, cursor: str = None, include_total: bool = None):
+    """
+    Returns paginated audit logs - user-specific
+    Cursor paging by (timestamp, id) works as in /dashboard/transactions.
+    """
     try:
         # Get current user from request
         current_user = request.auth if isinstance(request.auth, User) else None
@@ -138,8 +199,18 @@ def audit_log(request, page: int = 1, page_size: int = 20):
 
         # Filter audit logs by user
         user_logs = AuditLog.objects.filter(user=current_user)
-        total_count = user_logs.count()
-        logs = user_logs.order_by('-timestamp')[offset:offset + limit]
+        if include_total is None:
+            include_total = cursor is None
+        total_count = user_logs.count() if include_total else None
+
+        next_cursor = prev_cursor = None
+        if cursor or page == 1:
+            try:
+                logs, next_cursor, prev_cursor = keyset_page(user_logs.select_related('user'), 'timestamp', page_size, cursor)
+            except ValueError as e:
+                return JsonResponse({"error": str(e)}, status=400)
+        else:
+            logs = user_logs.select_related('user').order_by('-timestamp', '-id')[offset:offset + limit]
 
         log_list = [{
             "action": log.action,
@@ -154,6 +225,8 @@ def audit_log(request, page: int = 1, page_size: int = 20):
             "total": total_count,
             "page": page,
             "page_size": page_size,
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor,
         }
     except Exception as e:
         logger.error(f"Error fetching audit logs: {str(e)}")
@@ -198,8 +271,8 @@ def detect_fraud(request):
                 "duration_seconds": 0
             }
 
-        # Bulk update high-risk transactions (amount >= $5000)
-        high_risk_txns = transactions_to_process.filter(amount__gte=HIGH_RISK_AMOUNT)
+        # Bulk update high-risk transactions (amount >= $5000, in the base currency)
+        high_risk_txns = transactions_to_process.alias(base_amount=BASE_AMOUNT).filter(base_amount__gte=HIGH_RISK_AMOUNT)
         fraud_count = high_risk_txns.count()
 
         if fraud_count > 0:
@@ -209,7 +282,8 @@ def detect_fraud(request):
                 risk_score=Decimal('80.0'),
                 fraud_reasons='High transaction amount (>= $5000).',
                 reason_code='R1: High Amount',
-                status='rejected'
+                status='rejected',
+                updated_at=timezone.now(),  # update() skips auto_now; reports key on updated_at
             )
 
         # Approve remaining transactions (those not flagged as fraud)
@@ -225,9 +299,12 @@ def detect_fraud(request):
                 risk_score=Decimal('10.0'),
                 fraud_reasons='',
                 reason_code='',
-                status='approved'
+                status='approved',
+                updated_at=timezone.now(),
             )
 
+        bump_stats_version(current_user)
+
         # Log the action
         try:
             AuditLog.objects.create(
@@ -260,6 +337,64 @@ def detect_fraud(request):
 
 
 
+@router.get("/fraud/backtest", auth=auth_bearer)
+@ratelimit(key='user', rate='10/m', method='GET')
+def backtest(request, rule_weights: str = None, thresholds: str = None):
+    """
+    Backtest rule/ML weights and flag thresholds against the user's labelled history.
+    Read-only: nothing is written to the database.
+    Optional comma-separated rule_weights (0-1) and thresholds (0-100) override the default grid.
+    """
+    try:
+        current_user = request.auth if isinstance(request.auth, User) else None
+        if not current_user:
+            return JsonResponse({"error": "Authentication required"}, status=401)
+
+        try:
+            weight_list = [float(w) for w in rule_weights.split(',')] if rule_weights else None
+            threshold_list = [float(t) for t in thresholds.split(',')] if thresholds else None
+        except ValueError:
+            return JsonResponse({"error": "rule_weights and thresholds must be comma-separated numbers"}, status=400)
+        if weight_list and any(w < 0 or w > 1 for w in weight_list):
+            return JsonResponse({"error": "rule_weights must be between 0 and 1"}, status=400)
+
+        start_time = timezone.now()
+        data = load_backtest_data(current_user)
+        results = run_backtest(data, weight_list, threshold_list)
+        duration = (timezone.now() - start_time).total_seconds()
+
+        return {
+            "transactions": len(data["label"]),
+            "labelled_fraud": int(data["label"].sum()),
+            "combinations": len(results),
+            "results": results,
+            "duration_seconds": round(duration, 3)
+        }
+    except Exception as e:
+        logger.error(f"Backtest error: {str(e)}")
+        return JsonResponse({"error": "Backtest failed", "message": str(e)}, status=500)
+
+
+@router.post("/upload/preview", auth=auth_bearer)
+@ratelimit(key='user', rate='60/h', method='POST')
+def upload_preview(request, file: UploadedFile = File(...), rows: int = PREVIEW_ROWS):
+    """
+    Preview an upload: inferred column mapping and sample parsed rows
+    Only the first rows of the file are read, so this is fast even for very large files.
+    """
+    try:
+        current_user = request.auth if isinstance(request.auth, User) else None
+        if not current_user:
+            return JsonResponse({"error": "Authentication required"}, status=401)
+        if rows < 1:
+            return JsonResponse({"error": "rows must be at least 1"}, status=400)
+
+        return preview_csv(file, current_user, rows=rows)
+
+    except Exception as e:
+        logger.error(f"Upload preview failed: {str(e)}")
+        return JsonResponse({"error": f"Could not read file: {str(e)}"}, status=400)
+
 
 @router.post("/upload", auth=auth_bearer)
 @ratelimit(key='user', rate='10/h', method='POST')
@@ -274,154 +409,16 @@ def upload_file(request, file: UploadedFile = File(...)):
             return JsonResponse({"error": "Authentication required"}, status=401)
         
         file_name = file.name
-        file_data = file.read()
+        logger.info(f"Processing CSV file: {file_name}")
 
-        # Read CSV without automatic type conversion to preserve original values
-        df = pd.read_csv(io.BytesIO(file_data), dtype=str, keep_default_na=False)
-        initial_rows = len(df)
+        # Stream the file through the shared cleansing stage and insert chunk by chunk
+        # (files above DEDUPE_SPILL_THRESHOLD_BYTES are deduped on disk)
+        result = ingest_csv(file, current_user, spill_to_disk=should_spill(file.size))
+        initial_rows = result['total_rows']
+        new_rows_added = result['rows_added']
 
-        # Clean column names
-        df.columns = [col.lower().strip().replace(' ', '_') for col in df.columns]
-        df.rename(columns={'txn_id': 'transaction_id', 'txn_date': 'date'}, inplace=True)
-        
-        # Log column names for debugging
-        logger.info(f"CSV columns detected: {list(df.columns)}")
-        if len(df) > 0:
-            logger.info(f"First row sample: {df.iloc[0].to_dict()}")
-
-        # Prepare bulk insert
-        transactions_to_create = []
-        logger.info(f"Processing {initial_rows} rows from CSV file: {file_name}")
-        
-        for index, row in df.iterrows():
-            try:
-                if 'date' in df.columns:
-                    date_raw = row['date']
-                    if date_raw and str(date_raw).strip():
-                        date_val = pd.to_datetime(date_raw, errors='coerce').to_pydatetime()
-                        if pd.isna(date_val):
-                            date_val = timezone.now()
-                    else:
-                        date_val = timezone.now()
-                else:
-                    date_val = timezone.now()
-            except (KeyError, AttributeError, TypeError):
-                date_val = timezone.now()
-
-            # Parse amount - handle various formats
-            amount_val = Decimal('0.00')
-            try:
-                if 'amount' in df.columns:
-                    amount_raw = row['amount']
-                    # Since we read as string, check if it's not empty
-                    if amount_raw and str(amount_raw).strip():
-                        # Remove currency symbols, commas, and whitespace
-                        amount_str = str(amount_raw).replace('$', '').replace(',', '').strip()
-                        # Remove all whitespace
-                        amount_str = ''.join(amount_str.split())
-                        if amount_str:
-                            try:
-                                amount_val = Decimal(str(float(amount_str)))
-                            except (ValueError, TypeError, OverflowError):
-                                logger.warning(f"Could not convert amount '{amount_str}' to number for row {index}")
-                                amount_val = Decimal('0.00')
-                else:
-                    logger.warning(f"'amount' column not found in CSV")
-            except (ValueError, TypeError, AttributeError, KeyError) as e:
-                logger.warning(f"Could not parse amount for row {index}: {e}")
-                amount_val = Decimal('0.00')
-
-            # Parse merchant - handle various column names
-            merchant_val = 'Unknown Merchant'
-            try:
-                # Try different possible column names
-                merchant_raw = None
-                for col_name in ['merchant', 'description', 'merchant_name', 'vendor', 'store']:
-                    if col_name in df.columns:
-                        raw_value = row[col_name]
-                        # Since we read as string, just check if it's not empty
-                        if raw_value and str(raw_value).strip():
-                            merchant_str = str(raw_value).strip()
-                            if merchant_str.lower() not in ['nan', 'none', 'null', '']:
-                                merchant_raw = merchant_str
-                                break
-                
-                if merchant_raw:
-                    merchant_val = merchant_raw[:200]  # Limit to 200 chars
-            except (KeyError, AttributeError, TypeError) as e:
-                logger.warning(f"Could not parse merchant for row {index}: {e}")
-
-            # Parse transaction_id
-            # Generate a unique ID that includes timestamp and row index to ensure uniqueness
-            base_timestamp = timezone.now().timestamp()
-            transaction_id = f"AUTO-{base_timestamp}-{index}-{current_user.id}"
-            try:
-                if 'transaction_id' in df.columns:
-                    txn_id_raw = row['transaction_id']
-                    if txn_id_raw and str(txn_id_raw).strip():
-                        # Use CSV transaction_id but append user ID to make it user-specific
-                        csv_txn_id = str(txn_id_raw).strip()[:80]  # Leave room for user suffix
-                        transaction_id = f"{csv_txn_id}-U{current_user.id}"
-            except (KeyError, AttributeError, TypeError):
-                pass
-            
-            logger.debug(f"Row {index}: transaction_id={transaction_id}, amount={amount_val}, merchant={merchant_val}")
-
-            # Parse card_number
-            card_number = 'N/A'
-            try:
-                for col_name in ['card_number', 'card', 'card_num', 'card_id']:
-                    if col_name in df.columns:
-                        card_raw = row[col_name]
-                        if pd.notna(card_raw) and str(card_raw).strip() and str(card_raw).lower() != 'nan':
-                            card_number = str(card_raw).strip()[:20]
-                            break
-            except (KeyError, AttributeError, TypeError):
-                pass
-
-            transactions_to_create.append(
-                Transaction(
-                    user=current_user,  # Associate transaction with current user
-                    transaction_id=transaction_id,
-                    amount=amount_val,
-                    date=date_val,
-                    merchant=merchant_val,
-                    card_number=card_number,
-                    status='pending',  # Explicitly set status to pending
-                    is_fraud=False,
-                )
-            )
-        
-        logger.info(f"Created {len(transactions_to_create)} transaction objects from CSV")
-
-        # Bulk insert - check for duplicates within user's transactions
-        # Get list of transaction IDs to check
-        transaction_ids_to_check = [t.transaction_id for t in transactions_to_create]
-        
-        # Query existing transactions for this user with these IDs
-        existing_ids = set(
-            Transaction.objects.filter(
-                user=current_user,
-                transaction_id__in=transaction_ids_to_check
-        ).values_list('transaction_id', flat=True)
-        )
-
-        # Filter out duplicates
-        new_transactions = [
-            t for t in transactions_to_create if t.transaction_id not in existing_ids
-        ]
-
-        # Log for debugging
-        logger.info(f"Total transactions to create: {len(transactions_to_create)}")
-        logger.info(f"Existing transaction IDs found: {len(existing_ids)}")
-        logger.info(f"New transactions to insert: {len(new_transactions)}")
-
-        if new_transactions:
-            Transaction.objects.bulk_create(new_transactions, ignore_conflicts=True)
-            new_rows_added = len(new_transactions)
-        else:
-            new_rows_added = 0
-            logger.warning(f"No new transactions to insert. All {len(transactions_to_create)} transactions already exist for user {current_user.email}")
+        if new_rows_added == 0:
+            logger.warning(f"No new transactions to insert. All {initial_rows} rows already exist for user {current_user.email}")
 
         # Log success
         AuditLog.objects.create(
@@ -435,7 +432,8 @@ def upload_file(request, file: UploadedFile = File(...)):
         return {
             "message": f"File processed. {new_rows_added} new records added!",
             "rows": new_rows_added,
-            "total_rows": initial_rows
+            "total_rows": initial_rows,
+            "duplicates_removed": result['duplicates_removed']
         }
 
     except Exception as e:
@@ -472,7 +470,9 @@ from django.conf import settings
 import datetime
 from api.schemas import PlaidExchangeRequest
 from api.reports import generate_csv_report, generate_pdf_report
-from api.cleansing import cleanse_data
+from api.cleansing import (
+    cleanse_data, cleanse_user_transactions, get_cleansing_stats, invalidate_cleansing_stats,
+)
 
 def get_plaid_client():
     """Get Plaid client, raising an error if credentials are missing"""
@@ -559,22 +559,17 @@ def get_plaid_transactions(request, access_token: str):
         response = client.transactions_get(request_data)
         transactions = response['transactions']
         
-        # Convert to our format and save - associate with user
-        saved_count = 0
-        txns_to_create = []
-        
-        for t in transactions:
-            txns_to_create.append(Transaction(
-                user=current_user,  # Associate transaction with current user
-                transaction_id=t['transaction_id'],
-                amount=Decimal(str(t['amount'])),
-                date=t['date'],
-                merchant=t['name'],
-                status='pending'
-            ))
-            
+        # Convert to our format (base-currency amounts included) and save - associate with user
+        txns_to_create = plaid_to_transactions(transactions, current_user)
         Transaction.objects.bulk_create(txns_to_create, ignore_conflicts=True)
         saved_count = len(txns_to_create)
+        invalidate_cleansing_stats(current_user)
+        try:
+            refresh_cleansing_stats.delay()
+        except Exception as e:
+            # No broker available - beat picks the stale stats up on its next run
+            logger.warning(f"Stats queue unavailable ({str(e)}), cleansing stats left stale")
+        bump_stats_version(current_user)
         
         return {
             "message": "Transactions synced",
@@ -588,81 +583,104 @@ def get_plaid_transactions(request, access_token: str):
 
 # EXPORT REPORTS
 # ==========================================
-@router.get("/export/{type}", auth=None)  # We'll handle auth manually to support query string token
-def export_report(request, type: str):
+def get_download_user(request):
     """
-    Generates and returns a report (CSV or PDF) of all transactions - user-specific.
-    Supports both Authorization header and token query parameter for browser downloads.
+    Resolve the user for browser downloads: Authorization header, then ?token=
+    query parameter, then the httpOnly access_token cookie
     """
-    try:
-        # Try to get user from multiple sources
-        current_user = None
-        
-        # 1. Try Authorization header first
-        auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-        if auth_header.startswith('Bearer '):
-            token = auth_header.split(' ')[1]
+    # Try to get user from multiple sources
+    current_user = None
+    
+    # 1. Try Authorization header first
+    auth_header = request.META.get('HTTP_AUTHORIZATION', '')
+    if auth_header.startswith('Bearer '):
+        token = auth_header.split(' ')[1]
+        from api.jwt_auth import verify_token
+        payload = verify_token(token, token_type="access")
+        if payload:
+            user_id = payload.get("sub")
+            current_user = User.objects.filter(id=user_id, is_active=True).first()
+            if current_user:
+                logger.info(f"Export authenticated via Authorization header for user: {current_user.email}")
+    
+    # 2. Try token query parameter (for browser downloads with token in URL)
+    if not current_user:
+        token = request.GET.get('token')
+        if token:
             from api.jwt_auth import verify_token
             payload = verify_token(token, token_type="access")
             if payload:
                 user_id = payload.get("sub")
                 current_user = User.objects.filter(id=user_id, is_active=True).first()
                 if current_user:
-                    logger.info(f"Export authenticated via Authorization header for user: {current_user.email}")
-        
-        # 2. Try token query parameter (for browser downloads with token in URL)
-        if not current_user:
-            token = request.GET.get('token')
-            if token:
-                from api.jwt_auth import verify_token
-                payload = verify_token(token, token_type="access")
-                if payload:
-                    user_id = payload.get("sub")
-                    current_user = User.objects.filter(id=user_id, is_active=True).first()
-                    if current_user:
-                        logger.info(f"Export authenticated via JWT query token for user: {current_user.email}")
-        
-        # 3. Try httpOnly cookie (access_token cookie)
-        if not current_user:
-            token = request.COOKIES.get('access_token')
-            if token:
-                from api.jwt_auth import verify_token
-                payload = verify_token(token, token_type="access")
-                if payload:
-                    user_id = payload.get("sub")
-                    current_user = User.objects.filter(id=user_id, is_active=True).first()
-                    if current_user:
-                        logger.info(f"Export authenticated via httpOnly cookie for user: {current_user.email}")
-        
+                    logger.info(f"Export authenticated via JWT query token for user: {current_user.email}")
+    
+    # 3. Try httpOnly cookie (access_token cookie)
+    if not current_user:
+        token = request.COOKIES.get('access_token')
+        if token:
+            from api.jwt_auth import verify_token
+            payload = verify_token(token, token_type="access")
+            if payload:
+                user_id = payload.get("sub")
+                current_user = User.objects.filter(id=user_id, is_active=True).first()
+                if current_user:
+                    logger.info(f"Export authenticated via httpOnly cookie for user: {current_user.email}")
+
+    return current_user
+
+
+def streaming_export(blocks, content_type, filename, codec=None, as_file=False):
+    """
+    StreamingHttpResponse for an export, compressed chunk by chunk when a codec is given
+    as_file sends a .gz/.zst download; otherwise the codec is a Content-Encoding.
+    """
+    if codec and as_file:
+        _, suffix, content_type = COMPRESSION_CODECS[codec]
+        filename = f"{filename}{suffix}"
+        blocks = compress_stream(blocks, codec)
+    elif codec:
+        blocks = compress_stream(blocks, codec)
+
+    response = StreamingHttpResponse(blocks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    if codec and not as_file:
+        response['Content-Encoding'] = codec
+    response['Vary'] = 'Accept-Encoding'
+    return response
+
+
+@router.get("/export/{type}", auth=None)  # We'll handle auth manually to support query string token
+def export_report(
+    request, type: str, fast: bool = False, compression: str = None,
+    start_date: str = None, end_date: str = None, status: str = None, risk_band: str = None, is_fraud: bool = None,
+):
+    """
+    Generates and returns a report (CSV, PDF, Parquet or Arrow IPC stream) of all transactions - user-specific.
+    Supports both Authorization header and token query parameter for browser downloads.
+    fast=true streams CSV with PostgreSQL COPY (falls back to the Python writer elsewhere).
+    PDFs over PDF_EXPORT_MAX_SYNC_ROWS rows are queued as a background report (202 with its status).
+    Streaming exports are compressed on the fly (gzip/zstd) via ?compression= or Accept-Encoding.
+    start_date/end_date (inclusive YYYY-MM-DD), status, risk_band and is_fraud narrow the export.
+    """
+    try:
+        current_user = get_download_user(request)
+
         if not current_user:
             return JsonResponse({"error": "Authentication required. Please log in to export reports."}, status=401)
+
+        # ?compression=gzip|zstd downloads a compressed file; otherwise compress
+        # transparently (Content-Encoding) when the client accepts it
+        try:
+            codec = negotiate_compression(compression, request.META.get('HTTP_ACCEPT_ENCODING', ''))
+            filters = parse_export_filters(start_date, end_date, status, risk_band, is_fraud)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
         
-        # Filter transactions by user
-        user_transactions = Transaction.objects.filter(user=current_user)
+        # Filter transactions by user, then by the requested range/status/risk
+        user_transactions = filter_transactions(Transaction.objects.filter(user=current_user), filters)
         
         if type == 'csv':
-            response = HttpResponse(content_type='text/csv; charset=utf-8')
-            response['Content-Disposition'] = 'attachment; filename="transactions_report.csv"'
-            
-            writer = csv.writer(response)
-            # Write header
-            writer.writerow(['Transaction ID', 'Date', 'Merchant', 'Amount', 'Status', 'Risk Score', 'Fraud Score', 'Is Fraud', 'Country', 'Currency'])
-            
-            # Write transaction data - only user's transactions
-            for txn in user_transactions.order_by('-date'):
-                writer.writerow([
-                    txn.transaction_id or '',
-                    txn.date.strftime('%Y-%m-%d %H:%M:%S') if txn.date else '',
-                    txn.merchant or 'Unknown',
-                    float(txn.amount) if txn.amount else 0.0,
-                    txn.status or 'pending',
-                    float(txn.risk_score) if txn.risk_score else 0.0,
-                    float(txn.fraud_score) if txn.fraud_score else 0.0,
-                    'YES' if txn.is_fraud else 'NO',
-                    txn.country or 'US',
-                    txn.currency or 'USD',
-                ])
-            
             # Log the export
             AuditLog.objects.create(
                 user=current_user,
@@ -671,62 +689,40 @@ def export_report(request, type: str):
                 user_string=current_user.email,
                 ip_address=request.META.get('REMOTE_ADDR'),
             )
-            
-            return response
+
+            # Stream rows from a chunked cursor so memory stays flat for any history size
+            return streaming_export(
+                stream_export_csv(user_transactions, fast=fast),
+                'text/csv; charset=utf-8', 'transactions_report.csv', codec, as_file=bool(compression),
+            )
 
         elif type == 'pdf':
             try:
-                from reportlab.pdfgen import canvas
-                from reportlab.lib.pagesizes import letter
-                from reportlab.lib.units import inch
+                import reportlab  # noqa: F401
             except ImportError:
                 logger.error("reportlab not installed. Cannot generate PDF.")
                 return JsonResponse({"error": "PDF generation requires reportlab library"}, status=500)
 
+            total_txns = user_transactions.count()
+            if total_txns > getattr(settings, 'PDF_EXPORT_MAX_SYNC_ROWS', 5000):
+                # Too many pages to render within the request: hand off to the background
+                # report job and point the client at its status/download URL
+                artifact, created = find_or_create_report(current_user, 'pdf', filters)
+                if created:
+                    generate_report.delay(artifact.id)
+                    AuditLog.objects.create(
+                        user=current_user,
+                        action="PDF Report Requested",
+                        details=f"Report {artifact.id} queued for {total_txns} transactions",
+                        user_string=current_user.email,
+                        ip_address=request.META.get('REMOTE_ADDR'),
+                    )
+                return JsonResponse({**_report_status(artifact), "cached": not created}, status=202)
+
             response = HttpResponse(content_type='application/pdf')
             response['Content-Disposition'] = 'attachment; filename="transactions_report.pdf"'
-            
-            p = canvas.Canvas(response, pagesize=letter)
-            width, height = letter
-            
-            # Title
-            p.setFont("Helvetica-Bold", 16)
-            p.drawString(100, height - 50, "SecurePath Fraud Detection Report")
-            
-            # Report info - user-specific
-            p.setFont("Helvetica", 12)
-            total_txns = user_transactions.count()
-            fraud_count = user_transactions.filter(is_fraud=True).count()
-            pending_count = user_transactions.filter(status='pending').count()
-            
-            y_pos = height - 100
-            p.drawString(100, y_pos, f"Report Generated: {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}")
-            y_pos -= 20
-            p.drawString(100, y_pos, f"Total Transactions: {total_txns}")
-            y_pos -= 20
-            p.drawString(100, y_pos, f"Fraud Detected: {fraud_count}")
-            y_pos -= 20
-            p.drawString(100, y_pos, f"Pending Review: {pending_count}")
-            
-            # Transaction list (first 30 transactions)
-            y_pos -= 40
-            p.setFont("Helvetica-Bold", 10)
-            p.drawString(100, y_pos, "Recent Transactions:")
-            y_pos -= 20
-            
-            p.setFont("Helvetica", 8)
-            for txn in user_transactions.order_by('-date')[:30]:
-                if y_pos < 50:  # Start new page if needed
-                    p.showPage()
-                    y_pos = height - 50
-                
-                line = f"{txn.transaction_id[:15]:15} | {txn.merchant[:20]:20} | ${float(txn.amount):.2f} | {txn.status}"
-                p.drawString(100, y_pos, line)
-                y_pos -= 15
-            
-            p.showPage()
-            p.save()
-            
+            write_pdf(user_transactions, response)
+
             # Log the export
             AuditLog.objects.create(
                 user=current_user,
@@ -738,46 +734,197 @@ def export_report(request, type: str):
             
             return response
 
+        elif type in ARROW_FORMATS:
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                logger.error("pyarrow not installed. Cannot generate columnar export.")
+                return JsonResponse({"error": f"{type} export requires the pyarrow library"}, status=500)
+
+            AuditLog.objects.create(
+                user=current_user,
+                action=f"{type.upper()} Report Exported",
+                details=f"{type} export downloaded with {user_transactions.count()} transactions",
+                user_string=current_user.email,
+                ip_address=request.META.get('REMOTE_ADDR'),
+            )
+
+            content_type, extension = ARROW_FORMATS[type]
+            # Parquet pages are already zstd-compressed; only compress it again when asked explicitly
+            return streaming_export(
+                stream_arrow(user_transactions, type),
+                content_type, f'transactions_report.{extension}',
+                codec if compression or type != 'parquet' else None, as_file=bool(compression),
+            )
+
         else:
-            return {"error": f"Unsupported export type: {type}. Supported types: csv, pdf"}, 400
+            return {"error": f"Unsupported export type: {type}. Supported types: csv, pdf, parquet, arrow"}, 400
             
     except Exception as e:
         logger.error(f"Export Error: {str(e)}")
         return JsonResponse({"error": f"Failed to generate report: {str(e)}"}, status=500)
 
 
+
+# BACKGROUND REPORTS
+# ==========================================
+def _report_status(artifact):
+    return {
+        "report_id": artifact.id,
+        "type": artifact.report_format,
+        "status": artifact.status,
+        "rows": artifact.row_count,
+        "size_bytes": artifact.size_bytes,
+        "error": artifact.error,
+        "created_at": artifact.created_at.isoformat(),
+        "finished_at": artifact.finished_at.isoformat() if artifact.finished_at else None,
+        "download_url": f"/api/reports/{artifact.id}/download" if artifact.status == 'ready' else None,
+    }
+
+
+@router.post("/reports/{type}", auth=auth_bearer)
+@ratelimit(key='user', rate='30/h', method='POST')
+def request_report(
+    request, type: str,
+    start_date: str = None, end_date: str = None, status: str = None, risk_band: str = None, is_fraud: bool = None,
+):
+    """
+    ATC-07: Queue a report for background rendering - user-specific
+    Accepts the export filters; an identical request against unchanged data returns the existing artifact.
+    """
+    try:
+        current_user = request.auth if isinstance(request.auth, User) else None
+        if not current_user:
+            return JsonResponse({"error": "Authentication required"}, status=401)
+        if type not in REPORT_FORMATS:
+            return JsonResponse({"error": f"Unsupported report type: {type}. Supported types: {', '.join(REPORT_FORMATS)}"}, status=400)
+
+        try:
+            filters = parse_export_filters(start_date, end_date, status, risk_band, is_fraud)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+        artifact, created = find_or_create_report(current_user, type, filters)
+        if created:
+            try:
+                generate_report.delay(artifact.id)
+            except Exception as e:
+                # No broker available - render in the request instead
+                logger.warning(f"Report queue unavailable ({str(e)}), rendering report {artifact.id} inline")
+                render_report(artifact)
+
+            AuditLog.objects.create(
+                user=current_user,
+                action=f"{type.upper()} Report Requested",
+                details=f"Report {artifact.id} queued",
+                user_string=current_user.email,
+                ip_address=request.META.get('REMOTE_ADDR'),
+            )
+
+        return {**_report_status(artifact), "cached": not created}
+    except Exception as e:
+        logger.error(f"Report request error: {str(e)}")
+        return JsonResponse({"error": f"Failed to queue report: {str(e)}"}, status=500)
+
+
+@router.get("/reports/summary/{period}", auth=None)  # Manual auth to support browser downloads
+def download_summary_report(request, period: str, date: str = None, format: str = 'csv'):
+    """
+    ATC-07: Download a pre-rendered daily or monthly summary report - user-specific
+    Served straight from the nightly artifact; defaults to yesterday / last month.
+    """
+    try:
+        current_user = get_download_user(request)
+        if not current_user:
+            return JsonResponse({"error": "Authentication required. Please log in to download reports."}, status=401)
+        if period not in SUMMARY_PERIODS:
+            return JsonResponse({"error": f"Unsupported period: {period}. Supported periods: {', '.join(SUMMARY_PERIODS)}"}, status=400)
+        if format not in SUMMARY_FORMATS:
+            return JsonResponse({"error": f"Unsupported format: {format}. Supported formats: {', '.join(SUMMARY_FORMATS)}"}, status=400)
+        try:
+            day = datetime.date.fromisoformat(date) if date else None
+        except ValueError:
+            return JsonResponse({"error": "date must be a YYYY-MM-DD date"}, status=400)
+        if day is None:
+            day = timezone.localdate() - datetime.timedelta(days=1)
+            if period == 'monthly':
+                day = timezone.localdate().replace(day=1) - datetime.timedelta(days=1)
+
+        artifact = latest_summary_report(current_user, period, day, format)
+        if artifact is None or not artifact.file_path or not os.path.exists(artifact.file_path):
+            return JsonResponse({"error": f"No {period} summary has been rendered for {day.isoformat()}"}, status=404)
+
+        content_type, extension = REPORT_FORMATS[format]
+        return FileResponse(
+            open(artifact.file_path, 'rb'),
+            as_attachment=True,
+            filename=f"{period}_summary_{artifact.params['start_date']}.{extension}",
+            content_type=content_type,
+        )
+    except Exception as e:
+        logger.error(f"Summary report download error: {str(e)}")
+        return JsonResponse({"error": f"Failed to download report: {str(e)}"}, status=500)
+
+
+@router.get("/reports/{report_id}", auth=auth_bearer)
+def report_status(request, report_id: int):
+    """Status and download link of a background report - user-specific"""
+    current_user = request.auth if isinstance(request.auth, User) else None
+    if not current_user:
+        return JsonResponse({"error": "Authentication required"}, status=401)
+    artifact = ReportArtifact.objects.filter(id=report_id, user=current_user).first()
+    if artifact is None:
+        return JsonResponse({"error": "Report not found"}, status=404)
+    return _report_status(artifact)
+
+
+@router.get("/reports/{report_id}/download", auth=None)  # Manual auth to support browser downloads
+def download_report(request, report_id: int):
+    """Download a rendered report artifact - user-specific"""
+    try:
+        current_user = get_download_user(request)
+        if not current_user:
+            return JsonResponse({"error": "Authentication required. Please log in to download reports."}, status=401)
+
+        artifact = ReportArtifact.objects.filter(id=report_id, user=current_user).first()
+        if artifact is None:
+            return JsonResponse({"error": "Report not found"}, status=404)
+        if artifact.status != 'ready' or not artifact.file_path or not os.path.exists(artifact.file_path):
+            return JsonResponse({"error": f"Report is not ready (status: {artifact.status})"}, status=409)
+
+        AuditLog.objects.create(
+            user=current_user,
+            action=f"{artifact.report_format.upper()} Report Exported",
+            details=f"Report {artifact.id} downloaded with {artifact.row_count} transactions",
+            user_string=current_user.email,
+            ip_address=request.META.get('REMOTE_ADDR'),
+        )
+
+        content_type, extension = REPORT_FORMATS[artifact.report_format]
+        return FileResponse(
+            open(artifact.file_path, 'rb'),
+            as_attachment=True,
+            filename=f"transactions_report.{extension}",
+            content_type=content_type,
+        )
+    except Exception as e:
+        logger.error(f"Report download error: {str(e)}")
+        return JsonResponse({"error": f"Failed to download report: {str(e)}"}, status=500)
+
 # DATA CLEANSING
 # ==========================================
 @router.get("/cleansing/stats", auth=auth_bearer)
 def cleansing_stats(request):
-    """Get statistics about data cleansing - user-specific"""
+    """Get statistics about data cleansing - user-specific (constant time)"""
     try:
         # Get current user from request
         current_user = request.auth if isinstance(request.auth, User) else None
         if not current_user:
             return JsonResponse({"error": "Authentication required"}, status=401)
         
-        # Filter transactions by user
-        user_transactions = Transaction.objects.filter(user=current_user)
-        total = user_transactions.count()
-        
-        # Count potential duplicates (same transaction_id) within user's transactions
-        from django.db.models import Count
-        duplicates = user_transactions.values('transaction_id').annotate(
-            count=Count('transaction_id')
-        ).filter(count__gt=1).count()
-        
-        # Get last cleansing time from audit log for this user
-        last_cleansing = AuditLog.objects.filter(
-            user=current_user,
-            action__icontains='cleansing'
-        ).order_by('-timestamp').first()
-        
-        return {
-            "total_transactions": total,
-            "duplicates_count": duplicates,
-            "last_cleansed": last_cleansing.timestamp.isoformat() if last_cleansing else None
-        }
+        # Served from the user's materialized stats row (kept current by uploads, cleansing runs
+        # and the background recount; "stale" is true while a recount is pending)
+        return get_cleansing_stats(current_user)
     except Exception as e:
         logger.error(f"Cleansing stats error: {str(e)}")
         return JsonResponse({"error": str(e)}, status=500)
@@ -785,10 +932,13 @@ def cleansing_stats(request):
 
 @router.post("/cleansing/run", auth=auth_bearer)
 @ratelimit(key='user', rate='5/h', method='POST')
-def run_cleansing(request):
+def run_cleansing(request, full: bool = False, merge_near_duplicates: bool = False):
     """
-    ATC-02: Run data cleansing on all transactions - user-specific
+    ATC-02: Run data cleansing on the user's transactions - user-specific
+    - Only rows added or changed since the last run are examined (full=true rescans everything)
     - Remove duplicates
+    - Report near-duplicates (same card, amount and merchant seconds apart);
+      merge_near_duplicates=true deletes all but the earliest row
     - Normalize data formats
     - Update records in database
     """
@@ -801,11 +951,7 @@ def run_cleansing(request):
         if not current_user:
             return JsonResponse({"error": "Authentication required"}, status=401)
         
-        # Get all transactions for this user
-        transactions = Transaction.objects.filter(user=current_user)
-        total_count = transactions.count()
-        
-        if total_count == 0:
+        if not Transaction.objects.filter(user=current_user).exists():
             return {
                 "message": "No transactions to cleanse",
                 "duplicates_removed": 0,
@@ -813,68 +959,12 @@ def run_cleansing(request):
                 "duration_seconds": 0
             }
         
-        # Step 1: Find and remove duplicates (within user's transactions)
-        from django.db.models import Count
-        duplicate_groups = transactions.values('transaction_id').annotate(
-            count=Count('transaction_id')
-        ).filter(count__gt=1)
-        
-        duplicates_removed = 0
-        for group in duplicate_groups:
-            txn_id = group['transaction_id']
-            # Keep the first one, delete the rest (only within user's transactions)
-            duplicates = transactions.filter(transaction_id=txn_id).order_by('created_at')
-            if duplicates.count() > 1:
-                # Delete all except the first
-                to_delete = duplicates[1:]
-                duplicates_removed += to_delete.count()
-                to_delete.delete()
-        
-        # Step 2: Normalize existing records (user's transactions only)
-        records_normalized = 0
-        updates = []
-        
-        for txn in transactions:
-            updated = False
-            
-            # Normalize country code
-            if txn.country:
-                normalized_country = str(txn.country).upper().strip()[:2]
-                if normalized_country != txn.country:
-                    txn.country = normalized_country
-                    updated = True
-            
-            # Normalize currency code
-            if txn.currency:
-                normalized_currency = str(txn.currency).upper().strip()[:3]
-                if normalized_currency != txn.currency:
-                    txn.currency = normalized_currency
-                    updated = True
-            
-            # Normalize amount (round to 2 decimals)
-            if txn.amount:
-                try:
-                    normalized_amount = Decimal(str(txn.amount)).quantize(Decimal('0.01'))
-                    if normalized_amount != txn.amount:
-                        txn.amount = normalized_amount
-                        updated = True
-                except:
-                    pass
-            
-            # Normalize merchant (trim whitespace)
-            if txn.merchant:
-                normalized_merchant = str(txn.merchant).strip()[:200]
-                if normalized_merchant != txn.merchant:
-                    txn.merchant = normalized_merchant
-                    updated = True
-            
-            if updated:
-                updates.append(txn)
-                records_normalized += 1
-        
-        # Bulk update normalized records
-        if updates:
-            Transaction.objects.bulk_update(updates, ['country', 'currency', 'amount', 'merchant'])
+        # Remove duplicates and normalize rows changed since the user's watermark
+        result = cleanse_user_transactions(current_user, full=full, merge_near_duplicates=merge_near_duplicates)
+        total_count = result['examined']
+        duplicates_removed = result['duplicates_removed']
+        records_normalized = result['records_normalized']
+        near_duplicates = result['near_duplicates']
         
         duration = time.time() - start_time
         
@@ -882,7 +972,11 @@ def run_cleansing(request):
         AuditLog.objects.create(
             user=current_user,
             action="Data Cleansing Run (ATC-02)",
-            details=f"Processed {total_count} transactions. Removed {duplicates_removed} duplicates. Normalized {records_normalized} records.",
+            details=(
+                f"Processed {total_count} transactions. Removed {duplicates_removed} duplicates. "
+                f"Normalized {records_normalized} records. Found {len(near_duplicates)} near-duplicates "
+                f"({result['near_duplicates_merged']} merged)."
+            ),
             user_string=current_user.email,
             ip_address=request.META.get('REMOTE_ADDR'),
         )
@@ -891,6 +985,13 @@ def run_cleansing(request):
             "message": f"Data cleansing completed successfully. Removed {duplicates_removed} duplicates and normalized {records_normalized} records.",
             "duplicates_removed": duplicates_removed,
             "records_normalized": records_normalized,
+            "near_duplicates_found": len(near_duplicates),
+            "near_duplicates_merged": result['near_duplicates_merged'],
+            # First 100 candidate pairs for review
+            "near_duplicates": [
+                {"original_id": original_id, "duplicate_id": duplicate_id, "seconds_apart": seconds}
+                for original_id, duplicate_id, seconds in near_duplicates[:100]
+            ],
             "total_processed": total_count,
             "duration_seconds": round(duration, 2)
         }
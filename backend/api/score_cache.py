@@ -0,0 +1,66 @@
+# api/score_cache.py
+import threading
+from collections import OrderedDict
+
+
+class ScoreCache:
+    """
+    Bounded LRU cache: feature-vector fingerprint -> (ML score, ML reasons)
+    Entries are scoped to one model version; switching version empties the cache.
+    Hit/miss counters are per process.
+    """
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self.model_version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def fingerprint(feature_row):
+        """Exact fingerprint of one numpy feature row"""
+        return feature_row.tobytes()
+
+    def use_version(self, model_version):
+        """Scope the cache to a model version, dropping entries from any other"""
+        with self._lock:
+            if model_version != self.model_version:
+                self._entries.clear()
+                self.model_version = model_version
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "model_version": self.model_version,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
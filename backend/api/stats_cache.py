@@ -0,0 +1,71 @@
+# api/stats_cache.py
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from .fx import BASE_AMOUNT
+from .models import Transaction
+
+
+def _version_key(user_id):
+    return f"dashboard-stats-version:{user_id}"
+
+
+def _user_id(user):
+    return user if isinstance(user, int) else user.pk
+
+
+def stats_version(user):
+    """Current stats version of a user (created on first use)"""
+    key = _version_key(_user_id(user))
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        # add() so concurrent first readers agree on one version
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_stats_version(*users):
+    """
+    Invalidate cached dashboard stats after a write to these users' transactions
+    (inserts, scoring, cleansing, review decisions). Accepts users or user ids.
+    Deferred to commit, so a concurrent read can't cache pre-commit figures under the new version.
+    """
+    keys = [_version_key(_user_id(user)) for user in users if user is not None]
+    if keys:
+        transaction.on_commit(lambda: cache.set_many(dict.fromkeys(keys, time.time_ns()), timeout=None))
+
+
+def compute_dashboard_stats(user):
+    """Dashboard figures in one conditional aggregate over the user's transactions"""
+    aggregation = Transaction.objects.filter(user=user).aggregate(
+        total_transactions=Count('pk'),
+        total_amount=Sum(BASE_AMOUNT),
+        fraud_count=Count('pk', filter=Q(is_fraud=True)),
+        pending_count=Count('pk', filter=Q(status='pending')),
+    )
+    return {
+        "total_transactions": aggregation['total_transactions'],
+        "fraud_detected": aggregation['fraud_count'] or 0,
+        "pending_review": aggregation['pending_count'] or 0,
+        "total_amount": float(aggregation['total_amount'] or 0),
+    }
+
+
+def get_dashboard_stats(user):
+    """
+    Dashboard stats served from cache until the user's stats version is bumped
+    Entries are keyed by version, so a write makes the next poll recompute once;
+    STATS_CACHE_TIMEOUT bounds staleness where the cache isn't shared between processes.
+    """
+    key = f"dashboard-stats:{user.pk}:{stats_version(user)}"
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_dashboard_stats(user)
+        cache.set(key, stats, timeout=getattr(settings, 'STATS_CACHE_TIMEOUT', 300))
+    return stats
@@ -1,8 +1,7 @@
 # api/tasks.py
 from celery import shared_task
-import pandas as pd
+import logging
 import os
-import io
 import gzip
 from django.db import transaction
 from django.utils import timezone
@@ -11,6 +10,9 @@ from django.db.models import F, Q
 
 # Import models
 from api.models import Transaction, AuditLog
+from api.ingest import ingest_csv, should_spill
+
+logger = logging.getLogger('api')
 
 
 @shared_task
@@ -22,74 +24,119 @@ def process_uploaded_csv(file_path: str, file_name: str):
     try:
         start_time = timezone.now()
 
-        # 1. Read file from disk
-        with open(file_path, 'rb') as f:
-            file_data = f.read()
-
-        # 2. Decompression (if needed)
+        # 1. Open file from disk (decompressing on the fly if needed)
         if file_name.endswith('.gz') or file_name.endswith('.gzip'):
-            decompressed_data = gzip.decompress(file_data)
+            source = gzip.open(file_path, 'rb')
         else:
-            decompressed_data = file_data
-
-        # 3. Read into DataFrame (Memory intensive part)
-        df = pd.read_csv(io.BytesIO(decompressed_data))
-        initial_rows = len(df)
-
-        # 4. Clean/Normalize DataFrame column names
-        df.columns = [col.lower().strip().replace(' ', '_') for col in df.columns]
-        df.rename(columns={'txn_id': 'transaction_id', 'txn_date': 'date'}, inplace=True)
-
-        # 5. Prepare data for bulk insert (Same logic as before)
-        transactions_to_create = []
-        for index, row in df.iterrows():
-            try:
-                date_val = pd.to_datetime(row.get('date'), errors='coerce').to_pydatetime()
-                if pd.isna(date_val):
-                    date_val = timezone.now()
-            except Exception:
-                date_val = timezone.now()
-
-            transactions_to_create.append(
-                Transaction(
-                    transaction_id=row.get('transaction_id', f"AUTO-{timezone.now().timestamp()}-{index}"),
-                    amount=row.get('amount', 0),
-                    date=date_val,
-                    merchant=row.get('merchant', 'Unknown Merchant'),
-                    card_number=str(row.get('card_number', 'N/A')),
-                )
-            )
-
-        # 6. Bulk insert (Only new records)
-        existing_ids = Transaction.objects.filter(
-            transaction_id__in=[t.transaction_id for t in transactions_to_create]
-        ).values_list('transaction_id', flat=True)
-
-        new_transactions = [
-            t for t in transactions_to_create if t.transaction_id not in existing_ids
-        ]
-
-        Transaction.objects.bulk_create(new_transactions, ignore_conflicts=True)
-        new_rows_added = len(new_transactions)
-
-        # 7. Success Log
+            source = open(file_path, 'rb')
+
+        # 2. Stream chunks through the shared cleansing stage and bulk insert new records
+        with source:
+            result = ingest_csv(source, spill_to_disk=should_spill(os.path.getsize(file_path)))
+        initial_rows = result['total_rows']
+        new_rows_added = result['rows_added']
+
+        # 3. Success Log
         AuditLog.objects.create(
             action=f"CSV Processed: {file_name}",
             details=f"Processed {initial_rows} rows. Added {new_rows_added} new records.",
-            user="Celery Worker",
+            user_string="Celery Worker",
         )
 
-        # 8. Clean up temporary file
+        # 4. Clean up temporary file
         os.remove(file_path)
 
         return f"Completed: {new_rows_added} new records added."
 
     except Exception as e:
-        # 9. Failure Log
+        # 5. Failure Log
         AuditLog.objects.create(
             action=f"CSV Processing Failed: {file_name}",
             details=f"Worker Error: {str(e)}",
-            user="Celery Worker",
+            user_string="Celery Worker",
         )
         # Re-raise to mark task as failed in Celery
-        raise e
\ No newline at end of file
+        raise e
+
+
+@shared_task
+def rescore_transactions(batch_size: int = 500, rows_per_second: float = None):
+    """
+    Background task to rescore transaction history after a rule or model change.
+    Safe to re-run: resumes from the last checkpoint of the current scoring version.
+    """
+    from api.rescoring import rescore_history
+
+    job = rescore_history(batch_size=batch_size, rows_per_second=rows_per_second)
+    return f"Completed: {job.processed_rows} transactions rescored to {job.score_version}."
+
+
+@shared_task
+def refresh_cleansing_stats():
+    """
+    Background task to recount materialized cleansing stats marked stale
+    (e.g. after a bank sync, where inserted row counts aren't known).
+    Queued after such writes and run periodically by beat as a backstop.
+    """
+    from api.cleansing import refresh_cleansing_stats as refresh_user_stats
+    from api.models import CleansingState
+
+    stale = CleansingState.objects.filter(stats_stale=True).select_related('user')
+    refreshed = 0
+    for state in stale.iterator():
+        refresh_user_stats(state.user)
+        refreshed += 1
+    return f"Completed: cleansing stats refreshed for {refreshed} users."
+
+
+@shared_task
+def generate_report(report_id: int):
+    """
+    Background task to render a report artifact to local storage.
+    """
+    from api.models import ReportArtifact
+    from api.report_jobs import render_report
+
+    artifact = ReportArtifact.objects.select_related('user').get(id=report_id)
+    if artifact.status == 'ready':
+        return f"Report {report_id} already rendered."
+    artifact = render_report(artifact)
+
+    AuditLog.objects.create(
+        user=artifact.user,
+        action=f"{artifact.report_format.upper()} Report Generated",
+        details=f"Report {artifact.id}: {artifact.row_count} transactions, {artifact.size_bytes} bytes.",
+        user_string="Celery Worker",
+    )
+    return f"Completed: report {report_id} ({artifact.size_bytes} bytes)."
+
+
+@shared_task
+def prerender_summary_reports(day: str = None):
+    """
+    Nightly beat task: refresh each active user's daily aggregates, then pre-render
+    yesterday's daily summary (and, on the 1st, last month's) as CSV and PDF.
+    """
+    import datetime
+    from django.db.models import Exists, OuterRef
+    from api.models import User
+    from api.report_jobs import prerender_summary, refresh_daily_summaries, SUMMARY_FORMATS
+
+    day = datetime.date.fromisoformat(day) if day else timezone.localdate() - datetime.timedelta(days=1)
+    periods = ['daily']
+    if (day + datetime.timedelta(days=1)).day == 1:
+        periods.append('monthly')
+
+    users = User.objects.filter(is_active=True).filter(Exists(Transaction.objects.filter(user=OuterRef('pk'))))
+    rendered = 0
+    for user in users.iterator():
+        refresh_daily_summaries(user)
+        for period in periods:
+            for report_format in SUMMARY_FORMATS:
+                try:
+                    _, created = prerender_summary(user, period, day, report_format)
+                    rendered += created
+                except Exception as e:
+                    # One user's failure shouldn't stop the run; the artifact records the error
+                    logger.error(f"Summary report ({period}, {report_format}) failed for user {user.id}: {str(e)}")
+    return f"Completed: {rendered} summary reports rendered for {day} ({', '.join(periods)})."
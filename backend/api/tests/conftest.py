@@ -5,6 +5,12 @@ from decimal import Decimal
 from api.models import Transaction, AuditLog
 
 
+@pytest.fixture(autouse=True)
+def local_cache(settings):
+    """Run tests against an in-process cache instead of the shared Redis cache"""
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
 @pytest.fixture
 def sample_transaction():
     """Fixture to create a sample transaction"""
@@ -56,3 +62,16 @@ def multiple_transactions():
 def api_token():
     """Fixture to provide API authentication token"""
     return "root"
+
+
+@pytest.fixture
+def create_transaction():
+    """Factory fixture: create_transaction(transaction_id, **fields) with defaults for the required fields"""
+    def _create(transaction_id, **kwargs):
+        kwargs.setdefault('amount', Decimal("10.00"))
+        kwargs.setdefault('date', timezone.now())
+        kwargs.setdefault('merchant', "Test Merchant")
+        kwargs.setdefault('card_number', "1234567890123456")
+        kwargs['amount'] = Decimal(kwargs['amount'])
+        return Transaction.objects.create(transaction_id=transaction_id, **kwargs)
+    return _create
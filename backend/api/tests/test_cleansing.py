@@ -0,0 +1,245 @@
+# api/tests/test_cleansing.py
+from datetime import datetime, timedelta, timezone as dt_timezone
+import pandas as pd
+import pytest
+from decimal import Decimal
+from api.models import Transaction, User, CleansingState
+from api.cleansing import (
+    CleansingStage, ExternalDedupe, cleanse_data,
+    remove_duplicate_transactions, normalize_transactions, cleanse_user_transactions,
+    near_duplicate_pairs, get_cleansing_stats, record_transactions_added, invalidate_cleansing_stats,
+)
+from api.tasks import refresh_cleansing_stats as refresh_stale_cleansing_stats
+
+
+@pytest.mark.django_db
+class TestRemoveDuplicates:
+    """Test cases for set-based duplicate removal"""
+
+    def test_keeps_earliest_row_per_transaction_id(self, create_transaction):
+        """Test only the first-created row of each duplicate group survives"""
+        first = create_transaction("DUP-001", merchant="first")
+        create_transaction("DUP-001", merchant="second")
+        create_transaction("DUP-001", merchant="third")
+        other = create_transaction("DUP-002")
+        create_transaction("DUP-002")
+
+        removed = remove_duplicate_transactions(Transaction.objects.all(), batch_size=1)
+
+        assert removed == 3
+        assert set(Transaction.objects.values_list('id', flat=True)) == {first.id, other.id}
+
+    def test_no_duplicates(self, create_transaction):
+        """Test a clean table is left untouched"""
+        create_transaction("DUP-003")
+        assert remove_duplicate_transactions(Transaction.objects.all()) == 0
+        assert Transaction.objects.count() == 1
+
+
+@pytest.mark.django_db
+class TestNormalizeTransactions:
+    """Test cases for in-database normalization"""
+
+    def test_normalizes_only_dirty_rows(self, create_transaction):
+        """Test dirty rows are normalized and counted, clean rows are left alone"""
+        dirty = create_transaction("NORM-001", merchant="  Coffee Shop  ", country=" fr", currency="eur")
+        clean = create_transaction("NORM-002")
+        clean_updated_at = clean.updated_at
+
+        normalized = normalize_transactions(Transaction.objects.all(), batch_size=1)
+
+        dirty.refresh_from_db()
+        clean.refresh_from_db()
+        assert normalized == 1
+        assert dirty.merchant == "Coffee Shop"
+        assert dirty.country == "FR"
+        assert dirty.currency == "EUR"
+        assert clean.updated_at == clean_updated_at
+
+    def test_empty_queryset(self):
+        """Test normalizing no rows reports zero"""
+        assert normalize_transactions(Transaction.objects.none()) == 0
+
+
+@pytest.mark.django_db
+class TestIncrementalCleansing:
+    """Test cases for watermark-based incremental cleansing"""
+
+    def test_repeat_run_only_examines_new_rows(self, settings, create_transaction):
+        """Test a second run skips rows cleansed by the first, including its own rewrites"""
+        settings.CLEANSING_COMMIT_LAG_SECONDS = 0
+        user = User.objects.create(email="cleanse@example.com")
+        create_transaction("INC-001", user=user, country="us")
+        create_transaction("INC-002", user=user)
+
+        first = cleanse_user_transactions(user)
+        assert first["examined"] == 2
+        assert first["records_normalized"] == 1
+
+        assert cleanse_user_transactions(user)["examined"] == 0
+
+        create_transaction("INC-003", user=user, currency="gbp")
+        third = cleanse_user_transactions(user)
+        assert third["examined"] == 1
+        assert third["records_normalized"] == 1
+
+    def test_late_committed_rows_within_lag_are_examined(self, settings, create_transaction):
+        """Test a row stamped before the watermark but committed after the scan is not lost"""
+        settings.CLEANSING_COMMIT_LAG_SECONDS = 60
+        user = User.objects.create(email="latecommit@example.com")
+        create_transaction("INC-005", user=user)
+        cleanse_user_transactions(user)
+        watermark = CleansingState.objects.get(user=user).watermark
+
+        late = create_transaction("INC-006", user=user, country="gb ")
+        Transaction.objects.filter(id=late.id).update(updated_at=watermark - timedelta(seconds=5))
+
+        result = cleanse_user_transactions(user)
+        assert result["records_normalized"] == 1
+        late.refresh_from_db()
+        assert late.country == "GB"
+
+    def test_full_run_ignores_watermark(self, create_transaction):
+        """Test full=True examines the whole history"""
+        user = User.objects.create(email="full@example.com")
+        create_transaction("INC-004", user=user)
+        cleanse_user_transactions(user)
+
+        assert cleanse_user_transactions(user, full=True)["examined"] == 1
+
+
+class TestNearDuplicates:
+    """Test cases for blocking-key near-duplicate detection"""
+
+    def test_pairs_within_window_and_bucket_boundaries(self):
+        """Test matches across a time-bucket edge, each measured to its original"""
+        base = datetime(2025, 1, 1, 0, 1, 59, tzinfo=dt_timezone.utc)  # one second before a 120s bucket edge
+        rows = [
+            (1, "4111", Decimal("10.00"), "Coffee", base),
+            (2, "4111", Decimal("10.00"), " coffee ", base + timedelta(seconds=5)),
+            (3, "4111", Decimal("10.00"), "Coffee", base + timedelta(seconds=100)),
+            (4, "4111", Decimal("10.01"), "Coffee", base + timedelta(seconds=1)),   # different amount
+            (5, "4222", Decimal("10.00"), "Coffee", base + timedelta(seconds=1)),   # different card
+            (6, "4111", Decimal("10.00"), "Tea", base + timedelta(seconds=1)),      # different merchant
+            (7, "4111", Decimal("10.00"), "Coffee", base + timedelta(seconds=400)),  # too late
+            (8, "N/A", Decimal("10.00"), "Coffee", base),
+            (9, "N/A", Decimal("10.00"), "Coffee", base),
+        ]
+
+        pairs = near_duplicate_pairs(rows, window_seconds=120)
+
+        assert pairs == [(1, 2, 5.0), (1, 3, 100.0)]
+
+    def test_evenly_spaced_run_does_not_chain(self):
+        """Test a run longer than the window only pairs rows within the window of an original"""
+        base = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+        rows = [(i, "4111", Decimal("10.00"), "Coffee", base + timedelta(seconds=100 * i)) for i in range(10)]
+
+        pairs = near_duplicate_pairs(rows, window_seconds=120)
+
+        assert pairs == [(0, 1, 100.0), (2, 3, 100.0), (4, 5, 100.0), (6, 7, 100.0), (8, 9, 100.0)]
+
+
+@pytest.mark.django_db
+class TestNearDuplicateCleansing:
+    """Test cases for near-duplicates in cleanse_user_transactions"""
+
+    def test_reports_then_merges(self, create_transaction):
+        """Test near-duplicates are reported by default and deleted when merging"""
+        user = User.objects.create(email="near@example.com")
+        first = create_transaction("ND-001", user=user)
+        second = create_transaction("ND-002", user=user, date=first.date + timedelta(seconds=3))
+
+        result = cleanse_user_transactions(user)
+        assert result["near_duplicates"] == [(first.id, second.id, 3.0)]
+        assert result["near_duplicates_merged"] == 0
+
+        merged = cleanse_user_transactions(user, full=True, merge_near_duplicates=True)
+        assert merged["near_duplicates_merged"] == 1
+        assert list(Transaction.objects.filter(user=user).values_list('id', flat=True)) == [first.id]
+
+
+@pytest.mark.django_db
+class TestCleansingStats:
+    """Test cases for the materialized cleansing stats row"""
+
+    def test_built_once_then_maintained(self, django_assert_num_queries, create_transaction):
+        """Test stats are recounted on first read, then kept current without recounting"""
+        user = User.objects.create(email="stats@example.com")
+        create_transaction("ST-001", user=user)
+
+        assert get_cleansing_stats(user)["total_transactions"] == 1
+
+        create_transaction("ST-002", user=user)
+        record_transactions_added(user, 1)
+        with django_assert_num_queries(1):
+            stats = get_cleansing_stats(user)
+        assert stats == {"total_transactions": 2, "duplicates_count": 0, "last_cleansed": None, "stale": False}
+
+        cleanse_user_transactions(user)
+        assert get_cleansing_stats(user)["last_cleansed"] is not None
+
+    def test_stale_stats_served_until_background_recount(self, django_assert_num_queries, create_transaction):
+        """Test invalidated stats are served flagged stale without recounting, then the task recounts"""
+        user = User.objects.create(email="stalestats@example.com")
+        create_transaction("ST-003", user=user)
+        get_cleansing_stats(user)
+
+        create_transaction("ST-004", user=user)
+        invalidate_cleansing_stats(user)
+        with django_assert_num_queries(1):
+            stats = get_cleansing_stats(user)
+        assert (stats["total_transactions"], stats["stale"]) == (1, True)
+
+        refresh_stale_cleansing_stats()
+        stats = get_cleansing_stats(user)
+        assert (stats["total_transactions"], stats["stale"]) == (2, False)
+
+
+class TestCleansingStage:
+    """Test cases for chunk-at-a-time cleansing"""
+
+    def test_dedupes_across_chunks(self):
+        """Test a transaction_id repeated in a later chunk is dropped"""
+        stage = CleansingStage()
+        first = stage.process(pd.DataFrame({"Txn ID": ["A", "B", "A"], "Amount": ["$1,000.456", "2", "3"]}))
+        second = stage.process(pd.DataFrame({"Txn ID": ["B", "C", ""], "Amount": ["4", "5", "6"]}))
+
+        assert first["transaction_id"].tolist() == ["A", "B"]
+        assert first["amount"].tolist() == [1000.46, 2.0]
+        assert second["transaction_id"].tolist() == ["C", ""]
+        assert stage.duplicates_removed == 2
+
+    def test_cleanse_data_matches_whole_frame_behaviour(self):
+        """Test cleanse_data still dedupes and formats a full DataFrame"""
+        df = pd.DataFrame({
+            "transaction_id": ["A", "A"],
+            "date": ["2025-01-02 03:04:05", "bad"],
+            "country": [" us", "fr"],
+        })
+        cleaned = cleanse_data(df)
+        assert cleaned["date"].tolist() == ["2025-01-02 03:04:05"]
+        assert cleaned["country"].tolist() == ["US"]
+
+
+class TestExternalDedupe:
+    """Test cases for spill-to-disk dedupe"""
+
+    def test_keeps_same_rows_as_in_memory(self, tmp_path):
+        """Test partitioned dedupe keeps exactly the rows CleansingStage keeps"""
+        ids = [f"T{i % 7}" for i in range(40)] + ["", ""]
+        df = pd.DataFrame({"Txn ID": ids, "Amount": [str(i) for i in range(len(ids))]})
+        chunks = [df.iloc[i:i + 5] for i in range(0, len(df), 5)]
+
+        stage = CleansingStage()
+        expected = pd.concat([stage.process(chunk) for chunk in chunks])
+
+        with ExternalDedupe(num_partitions=3, chunk_size=4, temp_dir=tmp_path) as dedupe:
+            for chunk in chunks:
+                dedupe.add(chunk)
+            kept = pd.concat(list(dedupe.unique_chunks()))
+
+        assert sorted(kept.index) == sorted(expected.index)
+        assert dedupe.rows_in == len(df)
+        assert dedupe.duplicates_removed == stage.duplicates_removed == 33
+        assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,174 @@
+# api/tests/test_exports.py
+import csv
+import gzip
+import io
+import re
+import pytest
+from datetime import timedelta
+from django.utils import timezone
+from decimal import Decimal
+from api.models import Transaction, User
+from api.exports import (
+    stream_arrow, stream_csv, stream_export_csv, compress_stream, negotiate_compression,
+    parse_export_filters, filter_transactions, export_summary, write_pdf,
+)
+
+
+def _days_ago(days):
+    return timezone.now() - timedelta(days=days)
+
+
+@pytest.mark.django_db
+class TestStreamCsv:
+    """Test cases for streaming CSV export"""
+
+    def test_streams_header_then_rows_newest_first(self, create_transaction):
+        """Test the header is yielded first and rows follow in date order"""
+        user = User.objects.create(email="export@example.com")
+        create_transaction("EX-OLD", user=user, date=_days_ago(2), is_fraud=True, risk_score=Decimal("80"))
+        create_transaction("EX-NEW", user=user)
+
+        chunks = stream_csv(Transaction.objects.filter(user=user))
+        header = next(chunks)
+        rows = list(csv.reader(io.StringIO(header + "".join(chunks))))
+
+        assert rows[0][:4] == ["Transaction ID", "Date", "Merchant", "Amount"]
+        assert [row[0] for row in rows[1:]] == ["EX-NEW", "EX-OLD"]
+        assert rows[2][4] == "10.0"
+        assert rows[2][6:9] == ["80.0", "0.0", "YES"]
+
+    def test_fast_mode_falls_back_without_postgres(self, create_transaction):
+        """Test fast=True on SQLite produces the Python writer's output"""
+        user = User.objects.create(email="fast@example.com")
+        create_transaction("EX-1", user=user)
+        transactions = Transaction.objects.filter(user=user)
+
+        assert "".join(stream_export_csv(transactions, fast=True)) == "".join(stream_csv(transactions))
+
+
+@pytest.mark.django_db
+class TestStreamArrow:
+    """Test cases for columnar exports"""
+
+    @pytest.mark.parametrize("file_format", ["parquet", "arrow"])
+    def test_typed_columns_across_batches(self, file_format, create_transaction):
+        """Test rows round-trip with decimal, timestamp and dictionary types"""
+        pa = pytest.importorskip("pyarrow")
+        import pyarrow.parquet as pq
+        user = User.objects.create(email=f"{file_format}@example.com")
+        for i in range(5):
+            create_transaction(f"AR-{i}", user=user, date=_days_ago(i), country="FR" if i % 2 else "US")
+
+        data = b"".join(stream_arrow(Transaction.objects.filter(user=user), file_format, batch_rows=2))
+        if file_format == "parquet":
+            table = pq.read_table(io.BytesIO(data))
+            assert pq.ParquetFile(io.BytesIO(data)).num_row_groups == 3
+        else:
+            table = pa.ipc.open_stream(io.BytesIO(data)).read_all()
+
+        assert table.num_rows == 5
+        assert table.schema.field("amount").type == pa.decimal128(12, 2)
+        assert pa.types.is_timestamp(table.schema.field("date").type)
+        assert pa.types.is_dictionary(table.schema.field("country").type)
+        assert table.column("transaction_id").to_pylist() == [f"AR-{i}" for i in range(5)]
+        assert table.column("amount").to_pylist()[0] == Decimal("10.00")
+
+
+class TestCompression:
+    """Test cases for streamed export compression"""
+
+    def test_negotiation(self):
+        """Test the query parameter wins, then Accept-Encoding preference"""
+        assert negotiate_compression("gzip", "zstd") == "gzip"
+        assert negotiate_compression(None, "gzip, deflate") == "gzip"
+        assert negotiate_compression(None, "gzip;q=0, br") is None
+        assert negotiate_compression(None, "") is None
+        with pytest.raises(ValueError):
+            negotiate_compression("lzma")
+
+    def test_gzip_stream_round_trips(self):
+        """Test chunked gzip output decompresses to the original blocks"""
+        blocks = [f"row {i}\n" * 100 for i in range(50)]
+
+        compressed = b"".join(compress_stream(iter(blocks), "gzip"))
+
+        assert gzip.decompress(compressed).decode() == "".join(blocks)
+        assert len(compressed) < len("".join(blocks)) / 10
+
+    def test_zstd_stream_round_trips(self):
+        """Test chunked zstd output decompresses to the original bytes"""
+        zstandard = pytest.importorskip("zstandard")
+        blocks = [b"abc" * 1000, b"def" * 1000]
+
+        compressed = b"".join(compress_stream(iter(blocks), "zstd"))
+
+        assert zstandard.ZstdDecompressor().decompressobj().decompress(compressed) == b"".join(blocks)
+
+
+@pytest.mark.django_db
+class TestExportFilters:
+    """Test cases for filtered exports"""
+
+    def test_date_status_and_risk_filters(self, create_transaction):
+        """Test range, status, risk band and fraud filters combine"""
+        user = User.objects.create(email="filters@example.com")
+        today = timezone.localdate()
+        create_transaction("F-OLD", user=user, date=_days_ago(40), risk_score=Decimal("90"))
+        create_transaction("F-HIGH", user=user, date=_days_ago(1), risk_score=Decimal("75"), is_fraud=True)
+        create_transaction("F-LOW", user=user, date=_days_ago(1), risk_score=Decimal("10"), status="approved")
+        transactions = Transaction.objects.filter(user=user)
+
+        def ids(**kwargs):
+            filters = parse_export_filters(**kwargs)
+            return sorted(filter_transactions(transactions, filters).values_list("transaction_id", flat=True))
+
+        start = (today - timedelta(days=7)).isoformat()
+        assert ids(start_date=start, end_date=today.isoformat()) == ["F-HIGH", "F-LOW"]
+        assert ids(risk_band="high") == ["F-HIGH", "F-OLD"]
+        assert ids(start_date=start, risk_band="high") == ["F-HIGH"]
+        assert ids(status="approved") == ["F-LOW"]
+        assert ids(is_fraud=False) == ["F-LOW", "F-OLD"]
+
+    def test_invalid_filters_rejected(self):
+        """Test malformed dates and unknown values raise ValueError"""
+        with pytest.raises(ValueError):
+            parse_export_filters(start_date="2024-13-01")
+        with pytest.raises(ValueError):
+            parse_export_filters(start_date="2024-02-01", end_date="2024-01-01")
+        with pytest.raises(ValueError):
+            parse_export_filters(risk_band="extreme")
+
+    def test_summary_is_one_query(self, django_assert_num_queries, create_transaction):
+        """Test the report summary comes from a single aggregate"""
+        user = User.objects.create(email="summary@example.com")
+        create_transaction("S-1", user=user, is_fraud=True)
+        create_transaction("S-2", user=user, status="approved")
+
+        with django_assert_num_queries(1):
+            summary = export_summary(Transaction.objects.filter(user=user))
+
+        assert summary == {"total": 2, "fraud": 1, "pending": 1, "approved": 1, "rejected": 0, "amount": Decimal("20.00")}
+
+
+@pytest.mark.django_db
+class TestWritePdf:
+    """Test cases for the paged PDF report"""
+
+    def test_lists_every_row_across_pages(self, monkeypatch, create_transaction):
+        """Test all rows are rendered in page-sized batches with per-page timings"""
+        pytest.importorskip("reportlab")
+        monkeypatch.setattr("api.exports.PDF_FIRST_PAGE_ROWS", 5)
+        monkeypatch.setattr("api.exports.PDF_ROWS_PER_PAGE", 10)
+        user = User.objects.create(email="pdfpages@example.com")
+        for i in range(32):
+            create_transaction(f"PG-{i}", user=user, date=_days_ago(i))
+
+        target = io.BytesIO()
+        timings = []
+        rows = write_pdf(Transaction.objects.filter(user=user), target, page_timings=timings)
+
+        pdf = target.getvalue()
+        assert rows == 32
+        # 5 rows on the summary page, then 10 + 10 + 7
+        assert len(timings) == 4
+        assert len(re.findall(rb"/Type /Page\b(?!s)", pdf)) == 4
@@ -0,0 +1,51 @@
+# api/tests/test_fx.py
+import io
+import numpy as np
+import pandas as pd
+import pytest
+from decimal import Decimal
+from api.models import Transaction, User
+from api.fx import FxTable
+from api.fraud_detection import calculate_rule_score
+from api.ingest import ingest_csv
+
+
+class TestFxTable:
+    """Test cases for vectorized FX conversion"""
+
+    def test_converts_at_rate_in_effect(self):
+        """Test each amount uses the latest rate on or before its date"""
+        table = FxTable(pd.DataFrame({
+            "date": pd.to_datetime(["2024-01-01", "2024-06-01"]),
+            "currency": ["EUR", "EUR"],
+            "rate": [1.10, 1.20],
+        }))
+
+        converted = table.convert(
+            [100, 100, 100, 100, 100],
+            ["EUR", "eur", "EUR", "USD", "XYZ"],
+            ["2023-12-01", "2024-03-01", "2024-07-01", "2024-03-01", "2024-03-01"],
+        )
+
+        assert converted[:4].tolist() == [110.0, 110.0, 120.0, 100.0]
+        assert np.isnan(converted[4])
+
+
+@pytest.mark.django_db
+class TestBaseAmount:
+    """Test cases for base-currency amounts in ingest and rules"""
+
+    def test_yen_purchase_not_flagged_as_high_amount(self):
+        """Test R1 compares the converted amount, not the raw number"""
+        user = User.objects.create(email="fx@example.com")
+        csv = b"transaction_id,amount,currency,date,merchant\nJP-1,6000,jpy,2025-02-01,Shop\nUS-1,6000,,2025-02-01,Shop\n"
+
+        ingest_csv(io.BytesIO(csv), user)
+
+        yen = Transaction.objects.get(transaction_id=f"JP-1-U{user.id}")
+        dollars = Transaction.objects.get(transaction_id=f"US-1-U{user.id}")
+        assert yen.currency == "JPY"
+        assert yen.amount_base < Decimal("100")
+        assert dollars.amount_base == Decimal("6000.00")
+        assert "R1: High Amount (>$5,000)" not in calculate_rule_score(yen)[1]
+        assert "R1: High Amount (>$5,000)" in calculate_rule_score(dollars)[1]
@@ -0,0 +1,125 @@
+# api/tests/test_ingest.py
+import datetime
+import io
+import pytest
+from decimal import Decimal
+from api.models import Transaction, User
+from api.ingest import ingest_csv, plaid_to_transactions, preview_csv
+
+
+CSV = b"""Txn ID,Amount,Description,Card,IP,txn_date
+T1,$6000.00,Coffee,4111,10.0.0.1,2025-01-02
+T2,12.50,,4222,bad-ip,not a date
+T1,1.00,Duplicate,4333,,
+,5,Vendorless,,,
+"""
+
+
+@pytest.mark.django_db
+class TestIngestCsv:
+    """Test cases for the streaming upload pipeline"""
+
+    def test_ingests_in_chunks(self):
+        """Test rows are cleansed, deduped across chunks and inserted"""
+        user = User.objects.create(email="ingest@example.com")
+
+        result = ingest_csv(io.BytesIO(CSV), user, chunk_size=2)
+
+        assert result == {"total_rows": 4, "duplicates_removed": 1, "rows_added": 3}
+        first = Transaction.objects.get(transaction_id=f"T1-U{user.id}")
+        assert first.amount == Decimal("6000.00")
+        assert first.merchant == "Coffee"
+        assert first.card_number == "4111"
+        assert first.ip_int is not None
+        second = Transaction.objects.get(transaction_id=f"T2-U{user.id}")
+        assert second.merchant == "Unknown Merchant"
+        assert second.ip_address is None
+
+    def test_reupload_adds_nothing(self):
+        """Test existing transaction ids are skipped on a second upload"""
+        user = User.objects.create(email="reupload@example.com")
+        ingest_csv(io.BytesIO(CSV), user)
+
+        result = ingest_csv(io.BytesIO(CSV), user)
+
+        assert result["rows_added"] == 1  # only the auto-id row is new
+
+    def test_spill_to_disk_matches_in_memory(self):
+        """Test external (partitioned) dedupe keeps the same rows as in-memory dedupe"""
+        in_memory_user = User.objects.create(email="memory@example.com")
+        spilled_user = User.objects.create(email="spilled@example.com")
+        in_memory = ingest_csv(io.BytesIO(CSV), in_memory_user, chunk_size=2)
+
+        spilled = ingest_csv(io.BytesIO(CSV), spilled_user, chunk_size=2, spill_to_disk=True)
+
+        assert spilled == in_memory
+        kept = Transaction.objects.get(transaction_id=f"T1-U{spilled_user.id}")
+        assert kept.merchant == "Coffee"
+
+    def test_dst_crossing_offsets(self, settings):
+        """Test a chunk mixing UTC offsets (across DST) and naive values is accepted"""
+        settings.TIME_ZONE = "America/New_York"
+        user = User.objects.create(email="dst@example.com")
+        dst_csv = b"""transaction_id,amount,merchant,date
+D1,10.00,Shop,2024-03-09T10:00:00-05:00
+D2,10.00,Shop,2024-03-11T10:00:00-04:00
+D3,10.00,Shop,2024-03-11 10:00:00
+D4,10.00,Shop,2024-03-11T14:00:00Z
+"""
+
+        result = ingest_csv(io.BytesIO(dst_csv), user)
+
+        assert result["rows_added"] == 4
+        dates = {
+            txn.transaction_id.split("-U")[0]: txn.date.astimezone(datetime.timezone.utc).strftime("%Y-%m-%d %H:%M")
+            for txn in Transaction.objects.filter(user=user)
+        }
+        assert dates == {
+            "D1": "2024-03-09 15:00",
+            "D2": "2024-03-11 14:00",
+            "D3": "2024-03-11 14:00",  # naive: local (EDT) time
+            "D4": "2024-03-11 14:00",
+        }
+
+
+@pytest.mark.django_db
+class TestPlaidTransactions:
+    """Test cases for the Plaid sync conversion"""
+
+    def test_sync_rows_carry_base_amounts(self):
+        """Test synced rows get their currency and a base-currency amount before insert"""
+        user = User.objects.create(email="plaid@example.com")
+        records = [
+            {"transaction_id": "PL-1", "amount": 10.0, "date": datetime.date(2024, 1, 5), "name": "Cafe",
+             "iso_currency_code": "EUR", "unofficial_currency_code": None},
+            {"transaction_id": "PL-2", "amount": 5.5, "date": datetime.date(2024, 1, 5), "name": "Shop",
+             "iso_currency_code": None, "unofficial_currency_code": None},
+        ]
+
+        Transaction.objects.bulk_create(plaid_to_transactions(records, user))
+
+        synced = {t.transaction_id: t for t in Transaction.objects.filter(user=user)}
+        assert (synced["PL-1"].currency, synced["PL-1"].amount_base) == ("EUR", Decimal("11.04"))
+        assert (synced["PL-2"].currency, synced["PL-2"].amount_base) == ("USD", Decimal("5.50"))
+
+
+@pytest.mark.django_db
+class TestPreviewCsv:
+    """Test cases for upload previews"""
+
+    def test_infers_mapping_from_head_only(self):
+        """Test mapping and samples come from the first rows and nothing is written"""
+        body = CSV + b"".join(b"X%d,1,,,,\n" % i for i in range(1000))
+
+        preview = preview_csv(io.BytesIO(body), rows=2)
+
+        assert preview["mapping"]["transaction_id"]["column"] == "Txn ID"
+        assert preview["mapping"]["merchant"] == {"column": "Description", "fallbacks": []}
+        assert preview["mapping"]["card_number"]["column"] == "Card"
+        assert preview["mapping"]["ip_address"]["column"] == "IP"
+        assert preview["mapping"]["date"]["column"] == "txn_date"
+        assert [row["transaction_id"] for row in preview["sample"]] == ["T1", "T2"]
+        assert preview["sample"][0]["amount"] == 6000.0
+        assert preview["sample"][0]["card_number"] == "****4111"
+        assert "1 sample rows have unparseable dates" in preview["warnings"]
+        assert Transaction.objects.count() == 0
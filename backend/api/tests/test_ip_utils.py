@@ -0,0 +1,79 @@
+# api/tests/test_ip_utils.py
+import pytest
+from api.ip_utils import ip_to_int, subnet_of, subnet_range, int_to_ip, ip_key, key_to_ip, subnet_key_range
+from api.fraud_detection import ip_velocity
+
+
+class TestIpUtils:
+    """Test cases for IP normalization helpers"""
+
+    def test_ipv4_to_int(self):
+        """Test IPv4 addresses convert to their 32-bit integer"""
+        assert ip_to_int("10.0.0.1") == 167772161
+        assert int_to_ip(167772161) == "10.0.0.1"
+
+    def test_ipv4_mapped_ipv6_is_unwrapped(self):
+        """Test ::ffff:a.b.c.d normalizes to the plain IPv4 integer"""
+        assert ip_to_int("::ffff:10.0.0.1") == ip_to_int("10.0.0.1")
+
+    def test_invalid_ip(self):
+        """Test invalid or empty values return None"""
+        assert ip_to_int("not-an-ip") is None
+        assert ip_to_int("") is None
+        assert subnet_of(None) is None
+
+    def test_subnets(self):
+        """Test /24 and /48 subnet bounds"""
+        assert subnet_of("192.168.1.77") == ip_to_int("192.168.1.0")
+        assert subnet_range("192.168.1.77") == (ip_to_int("192.168.1.0"), ip_to_int("192.168.1.255"))
+        assert subnet_of("2001:db8:abcd:12::1") == ip_to_int("2001:db8:abcd::")
+
+    def test_keys_sort_numerically(self):
+        """Test stored keys are fixed-width and order like the integers"""
+        low, high = subnet_key_range("10.0.0.1")
+        assert len(low) == len(high) == 32
+        assert low <= ip_key(ip_to_int("10.0.0.200")) <= high
+        assert ip_key(ip_to_int("10.0.1.0")) > high
+        assert ip_key(ip_to_int("9.255.255.255")) < low
+
+
+@pytest.mark.django_db
+class TestIpVelocity:
+    """Test cases for integer IP velocity lookups"""
+
+    def test_save_populates_ip_columns(self, create_transaction):
+        """Test saving a transaction fills ip_int and ip_subnet"""
+        txn = create_transaction("IP-001", ip_address="192.168.1.77")
+        txn.refresh_from_db()
+        assert txn.ip_int == ip_key(ip_to_int("192.168.1.77"))
+        assert txn.ip_subnet == ip_key(ip_to_int("192.168.1.0"))
+
+    def test_velocity_by_ip_and_subnet(self, create_transaction):
+        """Test velocity counts by exact IP and by subnet"""
+        first = create_transaction("IP-002", ip_address="192.168.1.10")
+        create_transaction("IP-003", ip_address="192.168.1.10")
+        create_transaction("IP-004", ip_address="192.168.1.20")
+        create_transaction("IP-005", ip_address="192.168.2.10")
+
+        assert ip_velocity(first) == 2
+        assert ip_velocity(first, by_subnet=True) == 3
+
+    def test_ipv6_round_trips_exactly(self, create_transaction):
+        """Test a full 128-bit IPv6 address survives storage (SQLite included)"""
+        txn = create_transaction("IP-006", ip_address="2001:db8:abcd:12:ffff:ffff:ffff:fff1")
+        txn.refresh_from_db()
+
+        assert key_to_ip(txn.ip_int) == "2001:db8:abcd:12:ffff:ffff:ffff:fff1"
+        assert key_to_ip(txn.ip_subnet) == "2001:db8:abcd::"
+
+    def test_ipv6_velocity(self, create_transaction):
+        """Test IPv6 velocity matches exact addresses and /48 subnets"""
+        first = create_transaction("IP-007", ip_address="2001:db8:abcd:12:ffff:ffff:ffff:fff1")
+        create_transaction("IP-008", ip_address="2001:db8:abcd:12:ffff:ffff:ffff:fff1")
+        # Differs only in the low bits a float would round away
+        create_transaction("IP-009", ip_address="2001:db8:abcd:12:ffff:ffff:ffff:fff2")
+        create_transaction("IP-010", ip_address="2001:db8:abce::1")
+
+        first.refresh_from_db()
+        assert ip_velocity(first) == 2
+        assert ip_velocity(first, by_subnet=True) == 3
@@ -0,0 +1,53 @@
+# api/tests/test_merchants.py
+import pytest
+from django.utils import timezone
+from decimal import Decimal
+from api.models import Transaction, User
+from api.merchants import canonicalize_merchant
+from api.cleansing import canonicalize_merchants
+
+
+class TestCanonicalizeMerchant:
+    """Test cases for merchant name canonicalization"""
+
+    @pytest.mark.parametrize("raw, expected", [
+        ("AMAZON MKTPLACE PMTS", "amazon"),
+        ("Amazon.com*2K4", "amazon"),
+        ("AMZN Mktp US", "amazon"),
+        ("SQ *JOES COFFEE", "joes-coffee"),
+        ("Joe's Coffee #1234", "joe-s-coffee"),
+        ("STARBUCKS STORE 01234", "starbucks"),
+        ("", "unknown"),
+        ("Unknown Merchant", "unknown"),
+    ])
+    def test_canonical_ids(self, raw, expected):
+        """Test aliases, noise stripping and slug fallback"""
+        assert canonicalize_merchant(raw) == expected
+
+    def test_cached(self):
+        """Test repeated names are served from the LRU cache"""
+        canonicalize_merchant.cache_clear()
+        canonicalize_merchant("Netflix.com")
+        canonicalize_merchant("Netflix.com")
+        assert canonicalize_merchant.cache_info().hits == 1
+
+
+@pytest.mark.django_db
+class TestCanonicalizeMerchants:
+    """Test cases for filling canonical_merchant in the database"""
+
+    def test_fills_missing_and_stale_rows(self):
+        """Test rows written without save() are canonicalized in bulk"""
+        user = User.objects.create(email="merchants@example.com")
+        Transaction.objects.bulk_create([
+            Transaction(user=user, transaction_id=f"M-{i}", amount=Decimal("1.00"), date=timezone.now(),
+                        merchant=merchant, card_number="4111", canonical_merchant=canonical)
+            for i, (merchant, canonical) in enumerate([
+                ("AMAZON MKTPLACE PMTS", None),
+                ("Amazon.com*2K4", "stale"),
+                ("Starbucks #12", "starbucks"),
+            ])
+        ])
+
+        assert canonicalize_merchants(Transaction.objects.filter(user=user), batch_size=2) == 2
+        assert set(Transaction.objects.values_list('canonical_merchant', flat=True)) == {"amazon", "starbucks"}
@@ -0,0 +1,53 @@
+# api/tests/test_model_training.py
+import numpy as np
+import pytest
+from django.utils import timezone
+from decimal import Decimal
+from api import fraud_detection
+from api.models import Transaction
+from api.model_training import reservoir_sample, train_model
+
+
+class TestReservoirSample:
+    """Test cases for bounded-memory sampling"""
+
+    def test_sample_is_bounded(self):
+        """Test the sample never exceeds sample_size and counts every row"""
+        batches = (np.full((100, 5), i, dtype=float) for i in range(10))
+        sample, seen = reservoir_sample(batches, sample_size=50)
+        assert sample.shape == (50, 5)
+        assert seen == 1000
+
+    def test_small_input_kept_whole(self):
+        """Test inputs smaller than the reservoir are kept entirely"""
+        sample, seen = reservoir_sample([np.ones((3, 5))], sample_size=50)
+        assert sample.shape == (3, 5)
+        assert seen == 3
+
+
+@pytest.mark.django_db
+class TestTrainModel:
+    """Test cases for training from the Transaction table"""
+
+    def test_writes_versioned_artifact(self, tmp_path, monkeypatch):
+        """Test training writes a calibrated artifact that scoring can load"""
+        model_path = str(tmp_path / "fraud_model.pkl")
+        monkeypatch.setattr(fraud_detection, "MODEL_PATH", model_path)
+        monkeypatch.setattr("api.model_training.MODEL_PATH", model_path)
+        for i in range(30):
+            Transaction.objects.create(
+                transaction_id=f"TRAIN-{i}",
+                amount=Decimal(f"{10 + i}.00"),
+                date=timezone.now(),
+                merchant="Test Merchant",
+                card_number="1234567890123456",
+            )
+
+        artifact = train_model(batch_size=7, sample_size=20, n_estimators=10, output_dir=str(tmp_path / "models"))
+
+        assert artifact["training_rows"] == 30
+        assert artifact["sample_rows"] == 20
+        assert artifact["feature_schema"] == fraud_detection.FEATURE_SCHEMA
+        model = fraud_detection.load_ml_model()
+        scores = fraud_detection.calculate_ml_scores(model, np.zeros((2, 5)))
+        assert ((scores >= 0) & (scores <= 100)).all()
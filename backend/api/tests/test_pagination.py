@@ -0,0 +1,72 @@
+# api/tests/test_pagination.py
+import pytest
+from datetime import timedelta
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from decimal import Decimal
+from api.models import AuditLog, Transaction, User
+from api.pagination import decode_cursor, encode_cursor, keyset_page
+
+
+def _walk(queryset, field, page_size):
+    """Follow next cursors to the end, then prev cursors back; returns both id sequences"""
+    forward, pages, cursor = [], [], None
+    while True:
+        items, next_cursor, prev_cursor = keyset_page(queryset, field, page_size, cursor)
+        forward.extend(item.id for item in items)
+        pages.append(prev_cursor)
+        if next_cursor is None:
+            break
+        cursor = next_cursor
+    backward, cursor = [], pages[-1]
+    while cursor:
+        items, _, cursor = keyset_page(queryset, field, page_size, cursor)
+        backward = [item.id for item in items] + backward
+    return forward, backward
+
+
+@pytest.mark.django_db
+class TestKeysetPagination:
+    """Test cases for cursor pagination"""
+
+    def test_walks_transactions_forward_and_back(self):
+        """Test cursors cover every row once, including rows sharing a date"""
+        user = User.objects.create(email="cursor@example.com")
+        now = timezone.now()
+        for i in range(23):
+            Transaction.objects.create(
+                user=user, transaction_id=f"CP-{i}", amount=Decimal("1.00"),
+                # Pairs of rows share a timestamp so the id tie-break matters
+                date=now - timedelta(minutes=i // 2), merchant="Shop", card_number="1",
+            )
+        queryset = Transaction.objects.filter(user=user)
+        expected = list(queryset.order_by('-date', '-id').values_list('id', flat=True))
+
+        forward, backward = _walk(queryset, 'date', 5)
+
+        assert forward == expected
+        assert backward == expected[:20]
+
+    def test_audit_log_pages_without_offset(self):
+        """Test deep audit-log pages seek by (timestamp, id) rather than OFFSET"""
+        user = User.objects.create(email="auditcursor@example.com")
+        for i in range(7):
+            AuditLog.objects.create(user=user, action=f"Action {i}", user_string=user.email)
+        queryset = AuditLog.objects.filter(user=user)
+
+        _, next_cursor, _ = keyset_page(queryset, 'timestamp', 3)
+        with CaptureQueriesContext(connection) as queries:
+            items, next_cursor, prev_cursor = keyset_page(queryset, 'timestamp', 3, next_cursor)
+
+        assert len(queries) == 1
+        assert "OFFSET" not in queries[0]['sql'].upper()
+        assert [item.action for item in items] == ["Action 3", "Action 2", "Action 1"]
+        assert next_cursor is not None and prev_cursor is not None
+
+    def test_invalid_cursor_rejected(self):
+        """Test malformed cursors raise ValueError and valid ones round-trip"""
+        position = (timezone.now(), 42)
+        assert decode_cursor(encode_cursor(position, 'prev')) == (position, 'prev')
+        with pytest.raises(ValueError):
+            decode_cursor("not-a-cursor")
@@ -0,0 +1,166 @@
+# api/tests/test_report_jobs.py
+import csv
+import datetime
+from datetime import timedelta
+import os
+import pytest
+from django.utils import timezone
+from decimal import Decimal
+from api.models import Transaction, User, ReportArtifact, DailySummary
+from api.report_jobs import (
+    find_or_create_report, render_report, refresh_daily_summaries, period_summary, latest_summary_report,
+)
+from api.tasks import prerender_summary_reports
+from api.cleansing import cleanse_user_transactions
+
+
+def _at(day, hour=12):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time(hour)))
+
+
+@pytest.mark.django_db
+class TestReportArtifacts:
+    """Test cases for cached background report artifacts"""
+
+    def test_reused_until_data_changes(self, settings, tmp_path, create_transaction):
+        """Test identical requests share an artifact and new data gets a new one"""
+        settings.REPORT_STORAGE_DIR = str(tmp_path)
+        user = User.objects.create(email="reports@example.com")
+        create_transaction("RP-1", user=user)
+
+        artifact, created = find_or_create_report(user, 'csv')
+        assert created
+        render_report(artifact)
+        assert artifact.status == 'ready'
+        assert artifact.row_count == 1
+        with open(artifact.file_path) as f:
+            assert "RP-1" in f.read()
+
+        again, created = find_or_create_report(user, 'csv')
+        assert (again.id, created) == (artifact.id, False)
+
+        create_transaction("RP-2", user=user)
+        newer, created = find_or_create_report(user, 'csv')
+        assert created and newer.id != artifact.id
+        render_report(newer)
+        assert not os.path.exists(artifact.file_path)
+        assert list(ReportArtifact.objects.values_list('id', flat=True)) == [newer.id]
+
+    def test_stale_pending_and_running_are_requeued(self, settings, create_transaction):
+        """Test an artifact stuck in pending/running past its timeout is handed back for queuing"""
+        settings.REPORT_PENDING_TIMEOUT_SECONDS = 300
+        settings.CELERY_TASK_TIME_LIMIT = 3600
+        user = User.objects.create(email="stale@example.com")
+        create_transaction("RP-4", user=user)
+        artifact, _ = find_or_create_report(user, 'csv')
+
+        # Freshly queued: left alone
+        assert find_or_create_report(user, 'csv') == (artifact, False)
+
+        # Enqueue never happened (broker down)
+        ReportArtifact.objects.filter(id=artifact.id).update(updated_at=timezone.now() - timedelta(minutes=10))
+        again, created = find_or_create_report(user, 'csv')
+        assert (again.id, again.status, created) == (artifact.id, 'pending', True)
+
+        # Worker died mid-render: running is only stale after the task time limit
+        ReportArtifact.objects.filter(id=artifact.id).update(
+            status='running', updated_at=timezone.now() - timedelta(minutes=10)
+        )
+        assert find_or_create_report(user, 'csv')[1] is False
+        ReportArtifact.objects.filter(id=artifact.id).update(updated_at=timezone.now() - timedelta(hours=2))
+        again, created = find_or_create_report(user, 'csv')
+        assert (again.status, created) == ('pending', True)
+
+    def test_pdf_artifact(self, settings, tmp_path, create_transaction):
+        """Test PDF reports render to a file"""
+        settings.REPORT_STORAGE_DIR = str(tmp_path)
+        user = User.objects.create(email="pdf@example.com")
+        create_transaction("RP-3", user=user)
+
+        artifact, _ = find_or_create_report(user, 'pdf')
+        render_report(artifact)
+
+        with open(artifact.file_path, 'rb') as f:
+            assert f.read(4) == b"%PDF"
+
+
+@pytest.mark.django_db
+class TestSummaryReports:
+    """Test cases for scheduled daily/monthly summary reports"""
+
+    def test_daily_summaries_refresh_only_changed_days(self, settings, create_transaction):
+        """Test a refresh recomputes just the days touched since the last one"""
+        settings.SUMMARY_COMMIT_LAG_SECONDS = 0
+        user = User.objects.create(email="daily@example.com")
+        create_transaction("DS-1", user=user, date=_at(datetime.date(2025, 3, 1)), is_fraud=True)
+        create_transaction("DS-2", user=user, date=_at(datetime.date(2025, 3, 2)), status="approved")
+
+        assert refresh_daily_summaries(user) == 2
+        assert refresh_daily_summaries(user) == 0
+
+        create_transaction("DS-3", user=user, date=_at(datetime.date(2025, 3, 2)))
+        assert refresh_daily_summaries(user) == 1
+        assert DailySummary.objects.get(user=user, day=datetime.date(2025, 3, 2)).total == 2
+
+    def test_late_committed_rows_within_lag_are_summarized(self, settings, create_transaction):
+        """Test a row stamped before the last refresh but committed after it is still counted"""
+        settings.SUMMARY_COMMIT_LAG_SECONDS = 60
+        user = User.objects.create(email="dailylate@example.com")
+        create_transaction("DS-4", user=user, date=_at(datetime.date(2025, 3, 1)))
+        refresh_daily_summaries(user)
+        last_refresh = DailySummary.objects.get(user=user).computed_at
+
+        late = create_transaction("DS-5", user=user, date=_at(datetime.date(2025, 3, 1)))
+        Transaction.objects.filter(id=late.id).update(updated_at=last_refresh - timedelta(seconds=5))
+
+        assert refresh_daily_summaries(user) == 1
+        assert DailySummary.objects.get(user=user, day=datetime.date(2025, 3, 1)).total == 2
+
+    def test_deleted_rows_drop_out_of_summaries(self, settings, create_transaction):
+        """Test a day that lost rows to a near-duplicate merge is recomputed on the next refresh"""
+        settings.SUMMARY_COMMIT_LAG_SECONDS = 0
+        user = User.objects.create(email="dailydelete@example.com")
+        first = create_transaction("DS-6", user=user, date=_at(datetime.date(2025, 3, 3)))
+        create_transaction("DS-7", user=user, date=first.date + timedelta(seconds=3))
+        refresh_daily_summaries(user)
+        assert DailySummary.objects.get(user=user).total == 2
+
+        assert cleanse_user_transactions(user, merge_near_duplicates=True)["near_duplicates_merged"] == 1
+
+        assert refresh_daily_summaries(user) == 1
+        summary = DailySummary.objects.get(user=user)
+        assert (summary.total, summary.amount, summary.stale) == (1, Decimal("10.00"), False)
+
+    def test_monthly_totals_are_sums_of_days(self, create_transaction):
+        """Test monthly figures come from the stored daily rows"""
+        user = User.objects.create(email="monthly@example.com")
+        create_transaction("MS-1", user=user, date=_at(datetime.date(2025, 3, 1)), is_fraud=True)
+        create_transaction("MS-2", user=user, date=_at(datetime.date(2025, 3, 31)))
+        create_transaction("MS-3", user=user, date=_at(datetime.date(2025, 4, 1)))
+        refresh_daily_summaries(user)
+
+        rows, totals = period_summary(user, 'monthly', datetime.date(2025, 3, 15))
+
+        assert [row['day'] for row in rows] == [datetime.date(2025, 3, 1), datetime.date(2025, 3, 31)]
+        assert totals['total'] == 2
+        assert totals['fraud'] == 1
+        assert totals['amount'] == Decimal("20.00")
+
+    def test_beat_task_prerenders_daily_and_monthly(self, settings, tmp_path, create_transaction):
+        """Test the nightly task renders CSV/PDF files and reruns reuse them"""
+        settings.REPORT_STORAGE_DIR = str(tmp_path)
+        user = User.objects.create(email="nightly@example.com")
+        create_transaction("NR-1", user=user, date=_at(datetime.date(2025, 3, 31)))
+        create_transaction("NR-2", user=user, date=_at(datetime.date(2025, 3, 10)))
+
+        prerender_summary_reports("2025-03-31")
+        assert ReportArtifact.objects.filter(user=user, status='ready').count() == 4
+
+        monthly = latest_summary_report(user, 'monthly', datetime.date(2025, 3, 1), 'csv')
+        with open(monthly.file_path, newline='') as f:
+            rows = list(csv.reader(f))
+        assert rows[0][:2] == ["Date", "Transactions"]
+        assert [row[0] for row in rows[1:]] == ["2025-03-10", "2025-03-31"]
+
+        prerender_summary_reports("2025-03-31")
+        assert ReportArtifact.objects.filter(user=user).count() == 4
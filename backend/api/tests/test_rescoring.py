@@ -0,0 +1,57 @@
+# api/tests/test_rescoring.py
+import pytest
+from decimal import Decimal
+from api.models import RescoreJob
+from api.fraud_detection import get_score_version
+from api.rescoring import rescore_history
+
+
+@pytest.mark.django_db
+class TestRescoreHistory:
+    """Test cases for the full-history rescoring job"""
+
+    def test_rescores_stale_rows_and_skips_current(self, create_transaction):
+        """Test only out-of-date rows are rescored"""
+        version = get_score_version()
+        stale = create_transaction("RS-001", amount="6000.00", country="FR")
+        current = create_transaction("RS-002", score_version=version, risk_score=Decimal("1.0"))
+
+        job = rescore_history(batch_size=1, sleep=lambda seconds: None)
+
+        stale.refresh_from_db()
+        current.refresh_from_db()
+        assert job.status == 'completed'
+        assert job.total_rows == 1
+        assert stale.score_version == version
+        assert "R1: High Amount" in stale.reason_code
+        assert current.risk_score == Decimal("1.0")
+
+    def test_resumes_from_checkpoint(self, create_transaction):
+        """Test an interrupted job continues after its last checkpoint"""
+        first = create_transaction("RS-003")
+        second = create_transaction("RS-004")
+        RescoreJob.objects.create(
+            score_version=get_score_version(),
+            status='failed',
+            last_id=first.id,
+            total_rows=2,
+            processed_rows=1,
+        )
+
+        job = rescore_history(sleep=lambda seconds: None)
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        assert job.processed_rows == 2
+        assert first.score_version is None
+        assert second.score_version == get_score_version()
+
+    def test_throttle_sleeps(self, create_transaction):
+        """Test the rows-per-second limit pauses between batches"""
+        create_transaction("RS-005")
+        create_transaction("RS-006")
+        pauses = []
+
+        rescore_history(batch_size=1, rows_per_second=1, sleep=pauses.append)
+
+        assert pauses and all(p > 0 for p in pauses)
@@ -0,0 +1,54 @@
+# api/tests/test_score_cache.py
+import numpy as np
+from sklearn.ensemble import IsolationForest
+from api import fraud_detection
+from api.score_cache import ScoreCache
+
+
+class TestScoreCache:
+    """Test cases for the LRU score cache"""
+
+    def test_lru_eviction_and_hit_rate(self):
+        """Test least recently used entries are evicted and hits are counted"""
+        cache = ScoreCache(max_size=2)
+        cache.put(b"a", (1.0, ()))
+        cache.put(b"b", (2.0, ()))
+        assert cache.get(b"a") == (1.0, ())
+        cache.put(b"c", (3.0, ()))
+
+        assert cache.get(b"b") is None
+        assert cache.get(b"c") == (3.0, ())
+        stats = cache.stats()
+        assert stats["size"] == 2
+        assert stats["hits"] == 2
+        assert stats["misses"] == 1
+
+    def test_version_change_clears_entries(self):
+        """Test entries are scoped to one model version"""
+        cache = ScoreCache()
+        cache.use_version("v1")
+        cache.put(b"a", (1.0, ()))
+        cache.use_version("v2")
+        assert cache.get(b"a") is None
+
+
+class TestCachedMlScores:
+    """Test cases for cached ML inference"""
+
+    def test_repeat_vectors_skip_inference(self, monkeypatch):
+        """Test repeated feature vectors are served from the cache with identical scores"""
+        rng = np.random.default_rng(0)
+        model = {
+            "model": IsolationForest(n_estimators=10, random_state=0).fit(rng.random((50, 5))),
+            "calibration": {"low": -0.2, "high": 0.2},
+        }
+        monkeypatch.setattr(fraud_detection, "score_cache", ScoreCache())
+        monkeypatch.setattr(fraud_detection, "get_model_version", lambda: "test")
+        features = np.array([[1.0, 0, 0, 0, 1], [1.0, 0, 0, 0, 1], [9.0, 1, 1, 0, 3]])
+
+        first = fraud_detection.cached_ml_scores(model, features)
+        second = fraud_detection.cached_ml_scores(model, features)
+
+        assert first == second
+        assert first[0] == first[1]
+        assert fraud_detection.score_cache.stats()["hits"] == 3
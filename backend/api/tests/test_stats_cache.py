@@ -0,0 +1,76 @@
+# api/tests/test_stats_cache.py
+from unittest import mock
+import pytest
+from django.core.cache import cache
+from api.models import User
+from api.ingest import ingest_csv
+from api.stats_cache import bump_stats_version, get_dashboard_stats
+from backend import settings_base
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+@pytest.mark.django_db
+class TestDashboardStatsCache:
+    """Test cases for the per-user dashboard stats cache"""
+
+    def test_served_from_cache_until_bumped(self, django_assert_num_queries, django_capture_on_commit_callbacks, create_transaction):
+        """Test polls hit the cache and a version bump recomputes once"""
+        user = User.objects.create(email="statscache@example.com")
+        create_transaction("SC-1", user=user, is_fraud=True)
+
+        with django_assert_num_queries(1):
+            assert get_dashboard_stats(user) == {
+                "total_transactions": 1, "fraud_detected": 1, "pending_review": 1, "total_amount": 10.0,
+            }
+        create_transaction("SC-2", user=user)
+        with django_assert_num_queries(0):
+            assert get_dashboard_stats(user)["total_transactions"] == 1
+
+        with django_capture_on_commit_callbacks(execute=True):
+            bump_stats_version(user)
+        with django_assert_num_queries(1):
+            assert get_dashboard_stats(user)["total_transactions"] == 2
+        with django_assert_num_queries(0):
+            get_dashboard_stats(user)
+
+    def test_versions_are_per_user(self, django_capture_on_commit_callbacks, create_transaction):
+        """Test one user's write leaves another user's cached stats alone"""
+        alice = User.objects.create(email="alice@example.com")
+        bob = User.objects.create(email="bob@example.com")
+        get_dashboard_stats(alice)
+        get_dashboard_stats(bob)
+
+        create_transaction("SC-B", user=bob)
+        with django_capture_on_commit_callbacks(execute=True):
+            bump_stats_version(bob)
+
+        assert get_dashboard_stats(bob)["total_transactions"] == 1
+        assert get_dashboard_stats(alice)["total_transactions"] == 0
+
+    def test_ingest_bumps_version(self, tmp_path, django_capture_on_commit_callbacks):
+        """Test inserting through the CSV ingest path invalidates the cache"""
+        user = User.objects.create(email="ingeststats@example.com")
+        assert get_dashboard_stats(user)["total_transactions"] == 0
+
+        path = tmp_path / "upload.csv"
+        path.write_text("transaction_id,amount,date,merchant\nIN-1,10.00,2025-01-01,Shop\n")
+        with django_capture_on_commit_callbacks(execute=True):
+            ingest_csv(str(path), user)
+
+        assert get_dashboard_stats(user)["total_transactions"] == 1
+
+    def test_bump_lands_in_shared_redis_cache(self, settings, django_capture_on_commit_callbacks):
+        """Test version bumps are written to the Redis cache every web and Celery process shares"""
+        assert settings_base.CACHES['default']['BACKEND'] == 'django.core.cache.backends.redis.RedisCache'
+        settings.CACHES = settings_base.CACHES
+
+        with mock.patch('django.core.cache.backends.redis.RedisCacheClient.set_many') as set_many:
+            with django_capture_on_commit_callbacks(execute=True):
+                bump_stats_version(7)
+
+        written, _ = set_many.call_args.args
+        assert list(written) == [cache.make_key("dashboard-stats-version:7")]
@@ -2,6 +2,7 @@
 import os
 from pathlib import Path
 from dotenv import load_dotenv
+from celery.schedules import crontab
 
 # Load environment variables
 load_dotenv()
@@ -160,6 +161,44 @@ GITHUB_CLIENT_ID = os.getenv('GITHUB_CLIENT_ID', '')
 GITHUB_CLIENT_SECRET = os.getenv('GITHUB_CLIENT_SECRET', '')
 GITHUB_REDIRECT_URI = os.getenv('GITHUB_REDIRECT_URI', 'http://localhost:3000/oauth/callback/github')
 
+# =====================================================
+# FRAUD DETECTION SETTINGS
+# =====================================================
+
+# Max entries in the per-process ML score cache (feature fingerprint -> score)
+SCORE_CACHE_SIZE = int(os.getenv('SCORE_CACHE_SIZE', '10000'))
+
+# Uploads larger than this are deduped via temp-file partitions instead of in memory
+DEDUPE_SPILL_THRESHOLD_BYTES = int(os.getenv('DEDUPE_SPILL_THRESHOLD_BYTES', str(512 * 1024 * 1024)))
+
+# Amounts are normalized to this currency using the local FX table (date,currency,rate CSV)
+BASE_CURRENCY = os.getenv('BASE_CURRENCY', 'USD')
+FX_RATES_PATH = os.getenv('FX_RATES_PATH', str(BASE_DIR / 'api' / 'data' / 'fx_rates.csv'))
+
+# Rendered report artifacts (background report jobs) are written here
+REPORT_STORAGE_DIR = os.getenv('REPORT_STORAGE_DIR', str(BASE_DIR / 'reports'))
+# Queued reports not picked up within this time are re-queued (running ones after CELERY_TASK_TIME_LIMIT)
+REPORT_PENDING_TIMEOUT_SECONDS = int(os.getenv('REPORT_PENDING_TIMEOUT_SECONDS', '300'))
+# Larger /export/pdf requests are rendered by the background report job instead of in the request
+PDF_EXPORT_MAX_SYNC_ROWS = int(os.getenv('PDF_EXPORT_MAX_SYNC_ROWS', '5000'))
+# Daily summary refreshes re-read this far behind the last refresh, for rows committed late
+SUMMARY_COMMIT_LAG_SECONDS = int(os.getenv('SUMMARY_COMMIT_LAG_SECONDS', '60'))
+
+# Shared cache (the Redis instance Celery uses, separate db) so web and Celery processes see
+# the same entries - stats version bumps from workers must reach every web process
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL', 'redis://localhost:6379/1'),
+    }
+}
+
+# Dashboard stats are cached per user until a write bumps their version; this caps staleness
+STATS_CACHE_TIMEOUT = int(os.getenv('STATS_CACHE_TIMEOUT', '300'))
+
+# Incremental cleansing re-reads this far behind its watermark, for rows committed late
+CLEANSING_COMMIT_LAG_SECONDS = int(os.getenv('CLEANSING_COMMIT_LAG_SECONDS', '60'))
+
 # =====================================================
 # FILE UPLOAD SETTINGS (Updated for 400 MB)
 # =====================================================
@@ -180,6 +219,19 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 
+# Off-peak pre-rendering of daily/monthly summary reports (run with `celery -A backend beat`)
+CELERY_BEAT_SCHEDULE = {
+    'prerender-summary-reports': {
+        'task': 'api.tasks.prerender_summary_reports',
+        'schedule': crontab(hour=int(os.getenv('SUMMARY_REPORTS_HOUR', '2')), minute=30),
+    },
+    # Backstop recount of cleansing stats marked stale (the sync endpoints also queue it)
+    'refresh-cleansing-stats': {
+        'task': 'api.tasks.refresh_cleansing_stats',
+        'schedule': int(os.getenv('CLEANSING_STATS_REFRESH_SECONDS', '300')),
+    },
+}
+
 # =====================================================
 # LOGGING (Optional - for debugging)
 # =====================================================
@@ -2,6 +2,7 @@
 import os
 from pathlib import Path
 import environ
+from celery.schedules import crontab
 
 # Initialize environment variables
 env = environ.Env(
@@ -129,9 +130,29 @@ CORS_ALLOW_HEADERS = [
     'dnt', 'origin', 'user-agent', 'x-csrftoken', 'x-requested-with',
 ]
 
+# CACHE: shared by web and Celery processes, so invalidations (stats versions) reach every worker
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': env('REDIS_URL', default='redis://localhost:6379/1'),
+    }
+}
+
 # API SETTINGS
 API_TOKEN = env('API_TOKEN', default='securepath2025')
 
+# FRAUD DETECTION SETTINGS
+SCORE_CACHE_SIZE = env.int('SCORE_CACHE_SIZE', default=10000)
+DEDUPE_SPILL_THRESHOLD_BYTES = env.int('DEDUPE_SPILL_THRESHOLD_BYTES', default=512 * 1024 * 1024)
+BASE_CURRENCY = env('BASE_CURRENCY', default='USD')
+FX_RATES_PATH = env('FX_RATES_PATH', default=str(BASE_DIR / 'api' / 'data' / 'fx_rates.csv'))
+REPORT_STORAGE_DIR = env('REPORT_STORAGE_DIR', default=str(BASE_DIR / 'reports'))
+REPORT_PENDING_TIMEOUT_SECONDS = env.int('REPORT_PENDING_TIMEOUT_SECONDS', default=300)
+PDF_EXPORT_MAX_SYNC_ROWS = env.int('PDF_EXPORT_MAX_SYNC_ROWS', default=5000)
+SUMMARY_COMMIT_LAG_SECONDS = env.int('SUMMARY_COMMIT_LAG_SECONDS', default=60)
+STATS_CACHE_TIMEOUT = env.int('STATS_CACHE_TIMEOUT', default=300)
+CLEANSING_COMMIT_LAG_SECONDS = env.int('CLEANSING_COMMIT_LAG_SECONDS', default=60)
+
 # FILE UPLOAD SETTINGS
 DATA_UPLOAD_MAX_MEMORY_SIZE = env.int('DATA_UPLOAD_MAX_MEMORY_SIZE', default=419430400)
 FILE_UPLOAD_MAX_MEMORY_SIZE = env.int('FILE_UPLOAD_MAX_MEMORY_SIZE', default=419430400)
@@ -149,6 +170,16 @@ CELERY_TASK_SOFT_TIME_LIMIT = 300
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
+CELERY_BEAT_SCHEDULE = {
+    'prerender-summary-reports': {
+        'task': 'api.tasks.prerender_summary_reports',
+        'schedule': crontab(hour=env.int('SUMMARY_REPORTS_HOUR', default=2), minute=30),
+    },
+    'refresh-cleansing-stats': {
+        'task': 'api.tasks.refresh_cleansing_stats',
+        'schedule': env.int('CLEANSING_STATS_REFRESH_SECONDS', default=300),
+    },
+}
 
 # LOGGING
 LOGGING = {